@@ -0,0 +1,149 @@
+"""
+Synthetic project generators used by the benchmarks
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+LABELS_LIST = [f"label_{i}" for i in range(5)]
+
+
+def make_labels_dict(num_imgs, labels_list=LABELS_LIST, labeled_fraction=0.3, seed=0):
+    """
+    This function generates a labels dictionary where a fraction of the images are labeled
+    Args:
+        num_imgs:           Number of images in the project
+        labels_list:        List of label names
+        labeled_fraction:   Fraction of labeled images
+        seed:               Random seed
+    Returns:
+        labels_dict:        Labels information, as stored in the browser cache
+    """
+    rng = np.random.default_rng(seed)
+    num_labeled = int(num_imgs * labeled_fraction)
+    indices = rng.choice(num_imgs, num_labeled, replace=False)
+    label_indices = rng.integers(0, len(labels_list), num_labeled)
+    return {
+        "labels_dict": {
+            str(index): [int(label_index)]
+            for index, label_index in zip(indices, label_indices)
+        },
+        "labels_list": list(labels_list),
+    }
+
+
+def make_feature_parquet(path, num_imgs, num_features=64, seed=0):
+    """
+    This function generates a feature vector file, as produced by Data Clinic
+    Args:
+        path:           Path of the parquet file
+        num_imgs:       Number of images in the project
+        num_features:   Length of the feature vectors
+        seed:           Random seed
+    Returns:
+        path:           Path of the parquet file
+    """
+    rng = np.random.default_rng(seed)
+    features = rng.random((num_imgs, num_features), dtype=np.float32)
+    pd.DataFrame(features, columns=[str(i) for i in range(num_features)]).to_parquet(
+        path, engine="pyarrow"
+    )
+    return path
+
+
+def make_probability_parquet(path, num_imgs, labels_list=LABELS_LIST, seed=0):
+    """
+    This function generates a probability file, as produced by MLCoach
+    Args:
+        path:           Path of the parquet file
+        num_imgs:       Number of images in the project
+        labels_list:    List of label names
+        seed:           Random seed
+    Returns:
+        path:           Path of the parquet file
+    """
+    rng = np.random.default_rng(seed)
+    logits = rng.random((num_imgs, len(labels_list)), dtype=np.float32)
+    probabilities = logits / logits.sum(axis=1, keepdims=True)
+    pd.DataFrame(probabilities, columns=list(labels_list)).to_parquet(
+        path, engine="pyarrow"
+    )
+    return path
+
+
+class SyntheticDataset:
+    def __init__(self, cumulative_data_count):
+        self.cumulative_data_count = cumulative_data_count
+
+
+class SyntheticDataProject:
+    """
+    In-memory data project with the read interface used by labelmaker, serving small
+    synthetic frames such that the export paths can be benchmarked without a data server
+    """
+
+    def __init__(self, num_imgs, project_id="benchmark", frame_shape=(64, 64)):
+        self.num_imgs = num_imgs
+        self.project_id = project_id
+        self.frame_shape = frame_shape
+        self.datasets = [SyntheticDataset(num_imgs)]
+
+    def get_uri(self, index):
+        return f"file:///benchmark/data/image_{index:07d}.tif"
+
+    def get_index(self, uri):
+        return int(os.path.basename(uri).split("_")[1].split(".")[0])
+
+    def read_datasets(
+        self, indices, export="base64", resize=True, just_uri=False, **kwargs
+    ):
+        uris = [self.get_uri(int(index)) for index in indices]
+        if just_uri:
+            return uris
+        rng = np.random.default_rng(0)
+        imgs = [
+            Image.fromarray(rng.integers(0, 2**16, self.frame_shape, dtype=np.uint16))
+            for _ in indices
+        ]
+        return imgs, uris
+
+
+def make_image_stack(
+    path, num_imgs, frame_shape=(512, 512), chunk_length=16, compression=None, seed=0
+):
+    """
+    This function generates an HDF5 stack of 16-bit frames, a local stand-in for the image
+    stacks served by Tiled
+    Args:
+        path:           Path of the HDF5 file
+        num_imgs:       Number of frames
+        frame_shape:    Frame shape
+        chunk_length:   Number of frames per chunk, None for a contiguous stack
+        compression:    HDF5 compression filter, e.g., gzip
+        seed:           Random seed
+    Returns:
+        path:           Path of the HDF5 file
+    """
+    import h5py
+
+    rng = np.random.default_rng(seed)
+    chunks = (chunk_length, *frame_shape) if chunk_length else None
+    with h5py.File(path, "w") as f:
+        stack = f.create_dataset(
+            "entry/data/images",
+            (num_imgs, *frame_shape),
+            dtype=np.uint16,
+            chunks=chunks,
+            compression=compression,
+        )
+        block = chunk_length or 64
+        for start in range(0, num_imgs, block):
+            stop = min(start + block, num_imgs)
+            stack[start:stop] = rng.integers(
+                0, 2**12, (stop - start, *frame_shape), dtype=np.uint16
+            )
+    return path
@@ -0,0 +1,111 @@
+"""
+Import-time report of Label Maker, i.e., the cold start of each gunicorn worker
+
+Usage:
+    python -m benchmarks.import_time --output benchmarks/baselines/import_time.json
+    python -m benchmarks.import_time --compare benchmarks/baselines/import_time.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+
+from benchmarks.utils import get_commit
+
+
+def parse_importtime(stderr):
+    """
+    This function parses the output of python -X importtime
+    Args:
+        stderr:         Standard error of the interpreter
+    Returns:
+        modules:        Dictionary of module name: (self time, cumulative time) in seconds
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return modules
+
+
+def measure(module, repeat=5):
+    """
+    This function measures the import time of a module in fresh interpreters
+    Args:
+        module:         Module to import
+        repeat:         Number of interpreters, the fastest one is reported
+    Returns:
+        modules:        Dictionary of module name: (self time, cumulative time) in seconds of
+                        the fastest run
+    """
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.splitlines()[-1])
+        modules = parse_importtime(result.stderr)
+        if best is None or modules[module][1] < best[module][1]:
+            best = modules
+    return best
+
+
+def top_level(modules):
+    """
+    This function aggregates the cumulative import time per top-level package
+    Args:
+        modules:        Dictionary of module name: (self time, cumulative time)
+    Returns:
+        packages:       Dictionary of package name: self time summed over its modules
+    """
+    packages = {}
+    for name, (self_time, _) in modules.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_time
+    return packages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--module", default="labelmaker")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Path to store the report as JSON baseline")
+    parser.add_argument("--compare", help="Path of a JSON baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    modules = measure(args.module, args.repeat)
+    total = modules[args.module][1]
+    packages = sorted(top_level(modules).items(), key=lambda item: -item[1])
+    print(f"import {args.module}: {total:.3f} s")
+    for package, seconds in packages[: args.top]:
+        print(f"  {package:<40} {seconds:>8.3f} s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": get_commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "module": args.module,
+                    "total_s": total,
+                    "packages": dict(packages),
+                },
+                f,
+                indent=2,
+            )
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        ratio = total / max(baseline["total_s"], 1e-9)
+        print(f"\nComparison against {baseline.get('commit')}: {ratio:.2f}x")
+        sys.exit(1 if ratio > 1 + args.threshold else 0)
@@ -0,0 +1,163 @@
+"""
+Benchmarks of the labeling, querying, compression and export paths at synthetic scale
+
+Each benchmark is a setup function that receives the synthetic project of a given scale and
+returns the function to be timed, such that the setup is excluded from the timings
+"""
+
+import copy
+import os
+
+import numpy as np
+
+from benchmarks.generators import LABELS_LIST
+from src.labels import Labels
+from src.query import Query
+from src.utils.compression_utils import compress_dict, decompress_dict
+
+BENCHMARKS = {}
+
+# Export paths read every labeled image, so they are capped to keep the suite short
+MAX_EXPORTED_IMAGES = 2_000
+
+
+def benchmark(name, scales=None):
+    """
+    This decorator registers a benchmark
+    Args:
+        name:       Benchmark name
+        scales:     Scales the benchmark runs at, None for all of them
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = (setup, scales)
+        return setup
+
+    return register
+
+
+def no_progress(*args):
+    pass
+
+
+def new_labels(project):
+    return Labels(**copy.deepcopy(project["labels"]))
+
+
+def new_query(project):
+    return Query(num_imgs=project["num_imgs"], **copy.deepcopy(project["labels"]))
+
+
+@benchmark("labels.assign_labels")
+def bench_assign_labels(project):
+    labels = new_labels(project)
+    rng = np.random.default_rng(1)
+    indices = rng.choice(project["num_imgs"], project["num_imgs"] // 10, replace=False)
+    return lambda: labels.assign_labels(LABELS_LIST[0], indices.tolist())
+
+
+@benchmark("labels.update_labels_list.remove_label")
+def bench_remove_label(project):
+    labels = new_labels(project)
+    return lambda: labels.update_labels_list(remove_label=LABELS_LIST[1])
+
+
+@benchmark("labels.get_num_imgs_per_label")
+def bench_get_num_imgs_per_label(project):
+    labels = new_labels(project)
+    return labels.get_num_imgs_per_label
+
+
+@benchmark("labels.probability_labeling")
+def bench_probability_labeling(project):
+    labels = new_labels(project)
+    return lambda: labels.probability_labeling(
+        project["probability_path"], LABELS_LIST[0], 40
+    )
+
+
+@benchmark("query.sort_labeled")
+def bench_sort_labeled(project):
+    return new_query(project).sort_labeled
+
+
+@benchmark("query.hide_labeled")
+def bench_hide_labeled(project):
+    return new_query(project).hide_labeled
+
+
+@benchmark("query.similarity_search")
+def bench_similarity_search(project):
+    query = new_query(project)
+    return lambda: query.similarity_search(project["feature_path"], 0)
+
+
+@benchmark("compression.compress_dict")
+def bench_compress_dict(project):
+    labels = project["labels"]
+    return lambda: compress_dict(labels)
+
+
+@benchmark("compression.decompress_dict")
+def bench_decompress_dict(project):
+    compressed = compress_dict(project["labels"])
+    return lambda: decompress_dict(compressed)
+
+
+@benchmark("export.save_to_table")
+def bench_save_to_table(project):
+    labels = new_labels(project)
+
+    def save_to_table():
+        path = labels.save_to_table(project["data_project"], no_progress)
+        os.remove(path)
+
+    return save_to_table
+
+
+@benchmark("export.save_to_table.parquet")
+def bench_save_to_table_parquet(project):
+    labels = new_labels(project)
+
+    def save_to_table():
+        path = labels.save_to_table(project["data_project"], no_progress, "parquet")
+        os.remove(path)
+
+    return save_to_table
+
+
+@benchmark("export.save_to_directory")
+def bench_save_to_directory(project):
+    labels_dict = copy.deepcopy(project["labels"])
+    labeled = list(labels_dict["labels_dict"].items())[:MAX_EXPORTED_IMAGES]
+    labels_dict["labels_dict"] = dict(labeled)
+    labels = Labels(**labels_dict)
+    return lambda: labels.save_to_directory(project["data_project"], no_progress)
+
+
+@benchmark("export.save_to_hdf5")
+def bench_save_to_hdf5(project):
+    labels_dict = copy.deepcopy(project["labels"])
+    labeled = list(labels_dict["labels_dict"].items())[:MAX_EXPORTED_IMAGES]
+    labels_dict["labels_dict"] = dict(labeled)
+    labels = Labels(**labels_dict)
+
+    def save_to_hdf5():
+        path = labels.save_to_hdf5(project["data_project"], no_progress)
+        os.remove(path)
+
+    return save_to_hdf5
+
+
+@benchmark("export.save_to_shards")
+def bench_save_to_shards(project):
+    labels_dict = copy.deepcopy(project["labels"])
+    labeled = list(labels_dict["labels_dict"].items())[:MAX_EXPORTED_IMAGES]
+    labels_dict["labels_dict"] = dict(labeled)
+    labels = Labels(**labels_dict)
+
+    def save_to_shards():
+        path = labels.save_to_shards(project["data_project"], no_progress)
+        os.remove(path)
+
+    return save_to_shards
@@ -0,0 +1,217 @@
+"""
+Minimal Dash client that issues callback requests the way the Dash renderer does, such that
+realistic callback sequences can be replayed over HTTP
+"""
+
+import json
+import time
+
+import requests
+
+WILDCARD_ALL = ["ALL"]
+
+
+def stringify_id(component_id):
+    """
+    This function converts a component id to the string used by Dash to identify it
+    Args:
+        component_id:   Component id, either a string or a dictionary
+    Returns:
+        id_string:      Component id string
+    """
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(",", ":"))
+    return component_id
+
+
+def parse_id(id_string):
+    if id_string.startswith("{"):
+        return json.loads(id_string)
+    return id_string
+
+
+def split_outputs(output):
+    """
+    This function splits the output string of a callback into its (id, property) pairs
+    Args:
+        output:     Output string of the callback, e.g., "..a.data...b.children.."
+    Returns:
+        outputs:    List of (id string, property)
+        multi:      Whether the callback has multiple outputs
+    """
+    multi = output.startswith("..")
+    parts = output[2:-2].split("...") if multi else [output]
+    outputs = []
+    for part in parts:
+        id_string, prop = part.rsplit(".", 1)
+        outputs.append((id_string, prop.split("@")[0]))
+    return outputs, multi
+
+
+def callback_label(output):
+    """
+    This function shortens the output string of a callback to label it in the reports
+    Args:
+        output:     Output string of the callback
+    Returns:
+        label:      Short label, e.g., "thumbnail-card.style (+4)"
+    """
+    outputs, _ = split_outputs(output)
+    id_string, prop = outputs[0]
+    component_id = parse_id(id_string)
+    if isinstance(component_id, dict):
+        component_id = component_id.get("type", component_id.get("name", id_string))
+    label = f"{component_id}.{prop}"
+    if len(outputs) > 1:
+        label += f" (+{len(outputs) - 1})"
+    return label
+
+
+class DashSession:
+    """
+    Simulated browser session: it keeps the value of every component property it has seen,
+    builds the callback requests from the app dependencies and applies their responses
+    """
+
+    def __init__(self, base_url, dependencies, values, num_cards, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.dependencies = dependencies
+        self.values = dict(values)
+        self.num_cards = num_cards
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def get(self, component_id, prop, default=None):
+        return self.values.get((stringify_id(component_id), prop), default)
+
+    def set(self, component_id, prop, value):
+        self.values[(stringify_id(component_id), prop)] = value
+
+    def find_callback(self, trigger, output_prefix):
+        """
+        This function finds the server-side callback triggered by a property that updates the
+        given output
+        Args:
+            trigger:        Triggering property, e.g., "current-page.value"
+            output_prefix:  Prefix of the output string, e.g., "image-order.data@"
+        Returns:
+            dependency:     Callback dependency, as listed in /_dash-dependencies
+        """
+        for dependency in self.dependencies:
+            if dependency.get("clientside_function") is not None:
+                continue
+            output = dependency["output"]
+            if not output.lstrip(".").startswith(output_prefix):
+                continue
+            inputs = [f"{i['id']}.{i['property']}" for i in dependency["inputs"]]
+            if trigger in inputs:
+                return dependency
+        raise KeyError(
+            f"No callback updating {output_prefix} is triggered by {trigger}"
+        )
+
+    def _expand(self, id_string):
+        component_id = parse_id(id_string)
+        if isinstance(component_id, dict) and WILDCARD_ALL in component_id.values():
+            return [
+                {
+                    key: index if value == WILDCARD_ALL else value
+                    for key, value in component_id.items()
+                }
+                for index in range(self.num_cards)
+            ]
+        return None
+
+    def _with_values(self, specs):
+        payload = []
+        for spec in specs:
+            expanded = self._expand(spec["id"])
+            if expanded is None:
+                component_id = parse_id(spec["id"])
+                payload.append(
+                    {
+                        "id": component_id,
+                        "property": spec["property"],
+                        "value": self.get(component_id, spec["property"]),
+                    }
+                )
+            else:
+                payload.append(
+                    [
+                        {
+                            "id": component_id,
+                            "property": spec["property"],
+                            "value": self.get(component_id, spec["property"]),
+                        }
+                        for component_id in expanded
+                    ]
+                )
+        return payload
+
+    def build_payload(self, dependency, trigger):
+        """
+        This function builds the body of a callback request from the current session values
+        Args:
+            dependency:     Callback dependency
+            trigger:        Triggering property
+        Returns:
+            payload:        Body of the _dash-update-component request
+        """
+        outputs, multi = split_outputs(dependency["output"])
+        output_specs = []
+        for id_string, prop in outputs:
+            expanded = self._expand(id_string)
+            if expanded is None:
+                output_specs.append({"id": parse_id(id_string), "property": prop})
+            else:
+                output_specs.append(
+                    [
+                        {"id": component_id, "property": prop}
+                        for component_id in expanded
+                    ]
+                )
+        return {
+            "output": dependency["output"],
+            "outputs": output_specs if multi else output_specs[0],
+            "inputs": self._with_values(dependency["inputs"]),
+            "changedPropIds": [trigger],
+            "state": self._with_values(dependency.get("state", [])),
+        }
+
+    def post(self, payload):
+        """
+        This function sends a callback request and applies its response to the session values
+        Args:
+            payload:        Body of the _dash-update-component request
+        Returns:
+            status_code:    HTTP status code, 0 if the request failed before a response
+            duration:       Wall time in seconds
+        """
+        start = time.perf_counter()
+        try:
+            response = self.http.post(
+                f"{self.base_url}/_dash-update-component",
+                json=payload,
+                timeout=self.timeout,
+            )
+        except requests.RequestException:
+            return 0, time.perf_counter() - start
+        duration = time.perf_counter() - start
+        if response.status_code == 200:
+            for id_string, props in response.json().get("response", {}).items():
+                for prop, value in props.items():
+                    self.values[(id_string, prop)] = value
+        return response.status_code, duration
+
+    def trigger(self, trigger, output_prefix):
+        """
+        This function fires the callback that updates an output after a property changed
+        Args:
+            trigger:        Triggering property, e.g., "current-page.value"
+            output_prefix:  Prefix of the output string, e.g., "image-order.data@"
+        Returns:
+            status_code:    HTTP status code
+            duration:       Wall time in seconds
+        """
+        dependency = self.find_callback(trigger, output_prefix)
+        return self.post(self.build_payload(dependency, trigger))
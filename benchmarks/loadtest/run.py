@@ -0,0 +1,197 @@
+"""
+Load generator that replays labeling sessions of N concurrent users against a running Label
+Maker, and reports the latency percentiles and error rate per callback
+
+Usage:
+    python -m benchmarks.loadtest.run --url http://127.0.0.1:8057 --users 20 --duration 60
+    python -m benchmarks.loadtest.run --url http://127.0.0.1:8057 --users 20 --har session.har
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.loadtest.client import DashSession
+from benchmarks.loadtest.scenarios import (
+    DEFAULT_MIX,
+    Scenario,
+    har_requests,
+    initial_values,
+)
+
+
+class Recorder:
+    """
+    Thread-safe record of the outcome of every callback request
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = {}
+
+    def __call__(self, name, status_code, duration):
+        with self.lock:
+            self.results.setdefault(name, []).append((status_code, duration))
+
+    def report(self, elapsed):
+        """
+        This function summarizes the recorded requests per callback
+        Args:
+            elapsed:    Wall time of the load test in seconds
+        Returns:
+            report:     Number of requests, error rate, throughput and latency percentiles in
+                        milliseconds per callback
+        """
+        report = {}
+        with self.lock:
+            results = {name: list(values) for name, values in self.results.items()}
+        for name, values in sorted(results.items()):
+            status_codes = np.array([status for status, _ in values])
+            durations = np.array([duration for _, duration in values]) * 1000
+            # 204 is returned when a callback prevents the update
+            errors = int(np.sum((status_codes == 0) | (status_codes >= 400)))
+            p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+            report[name] = {
+                "requests": len(values),
+                "errors": errors,
+                "error_rate": errors / len(values),
+                "throughput_per_s": len(values) / elapsed,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+            }
+        return report
+
+
+def run_user(user_id, args, dependencies, data_project_dict, recorder, stop_time):
+    rng = random.Random(args.seed + user_id)
+    time.sleep(args.ramp_up * user_id / max(1, args.users))
+    values = initial_values(
+        args.num_imgs, args.num_cols, args.num_rows, data_project_dict, seed=user_id
+    )
+    session = DashSession(
+        args.url, dependencies, values, args.num_cols * args.num_rows, args.timeout
+    )
+
+    if args.har:
+        with open(args.har) as f:
+            callback_requests = har_requests(json.load(f))
+        while time.time() < stop_time:
+            for label, text in callback_requests:
+                if time.time() >= stop_time:
+                    break
+                status_code, duration = session.post(json.loads(text))
+                recorder(label, status_code, duration)
+                time.sleep(rng.uniform(0, 2 * args.think_time))
+        return
+
+    scenario = Scenario(session, recorder, rng)
+    actions = list(args.mix)
+    weights = [args.mix[action] for action in actions]
+    session.set("tab-group", "value", "manual")
+    scenario.refresh_page()
+    while time.time() < stop_time:
+        getattr(scenario, rng.choices(actions, weights)[0])()
+        time.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+def parse_mix(mix):
+    weights = dict(DEFAULT_MIX)
+    for item in mix or []:
+        action, weight = item.split("=")
+        if action not in DEFAULT_MIX:
+            raise ValueError(
+                f"Unknown action {action}, expected one of {list(DEFAULT_MIX)}"
+            )
+        weights[action] = float(weight)
+    return {action: weight for action, weight in weights.items() if weight > 0}
+
+
+def print_report(report):
+    print(
+        f"{'callback':<35} {'requests':>9} {'errors':>8} {'rate':>7} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    for name, summary in report.items():
+        print(
+            f"{name:<35} {summary['requests']:>9} {summary['errors']:>8} "
+            f"{summary['error_rate']:>7.1%} {summary['p50_ms']:>9.1f} "
+            f"{summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8057")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds")
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.5,
+        help="Mean seconds between user actions",
+    )
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument(
+        "--har", help="HAR recording to replay instead of the scenarios"
+    )
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        help=f"Weights of the user actions, e.g., label=5 similarity=0 {DEFAULT_MIX}",
+    )
+    parser.add_argument(
+        "--num-imgs",
+        type=int,
+        default=2000,
+        help="Number of images of the project, as generated by the stand-ins",
+    )
+    parser.add_argument("--num-cols", type=int, default=4)
+    parser.add_argument("--num-rows", type=int, default=3)
+    parser.add_argument(
+        "--data-project",
+        help="JSON file with the data project dictionary of the browser, enables the "
+        "thumbnail reads",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Path to store the report as JSON")
+    args = parser.parse_args()
+    args.mix = parse_mix(args.mix)
+
+    dependencies = requests.get(f"{args.url}/_dash-dependencies").json()
+    data_project_dict = None
+    if args.data_project:
+        with open(args.data_project) as f:
+            data_project_dict = json.load(f)
+
+    recorder = Recorder()
+    start = time.time()
+    stop_time = start + args.duration
+    users = [
+        threading.Thread(
+            target=run_user,
+            args=(user_id, args, dependencies, data_project_dict, recorder, stop_time),
+            daemon=True,
+        )
+        for user_id in range(args.users)
+    ]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+
+    report = recorder.report(time.time() - start)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"users": args.users, "duration_s": args.duration, "callbacks": report},
+                f,
+                indent=2,
+            )
@@ -0,0 +1,227 @@
+"""
+Callback sequences of a labeling session, as triggered by the browser after each user action
+"""
+
+import json
+import random
+import time
+
+from benchmarks.generators import LABELS_LIST, make_labels_dict
+from benchmarks.loadtest.client import callback_label, stringify_id
+from src.utils.compression_utils import compress_dict
+
+DATA_PROJECT_ID = {"base_id": "file-manager", "name": "data-project-dict"}
+NUM_IMGS_ID = {"base_id": "file-manager", "name": "total-num-data-points"}
+THUMBNAILS_OUTPUT = '{"index":["ALL"],"type":"thumbnail-card"}.style'
+POLL_INTERVAL = 0.25
+MAX_POLLS = 40
+
+DEFAULT_MIX = {
+    "page_flip": 10,
+    "label": 6,
+    "sort": 1,
+    "hide": 1,
+    "similarity": 1,
+}
+
+
+def initial_values(num_imgs, num_cols, num_rows, data_project_dict=None, seed=0):
+    """
+    This function returns the component values of a session that just loaded a project
+    Args:
+        num_imgs:           Number of images in the project
+        num_cols:           Number of thumbnail columns
+        num_rows:           Number of thumbnail rows
+        data_project_dict:  Data project dictionary, None to skip the thumbnail reads
+        seed:               Random seed of the initial labels
+    Returns:
+        values:             Component values keyed by (id string, property)
+    """
+    values = {
+        ("image-order", "data"): list(range(num_cols * num_rows)),
+        ("current-page", "value"): 0,
+        ("similarity-on-off-indicator", "color"): "#596D4E",
+        ("button-hide", "n_clicks"): 0,
+        ("button-sort", "n_clicks"): 0,
+        ("output-image-upload", "children"): None,
+        ("probability-collapse", "is_open"): False,
+        ("tab-group", "value"): "manual",
+        ("previous-tab", "data"): ["init", "manual"],
+        ("thumbnail-num-cols", "value"): num_cols,
+        ("thumbnail-num-rows", "value"): num_rows,
+        ("similarity-model-list", "value"): None,
+        ("probability-model-list", "value"): None,
+        ("log-transform", "value"): False,
+        ("min-max-percentile", "value"): [0, 100],
+        ("thumbnail-poll", "n_intervals"): 0,
+        ("label-ops-ack", "data"): 0,
+        ("labels-dict", "data"): compress_dict(
+            make_labels_dict(num_imgs, LABELS_LIST, seed=seed)
+        ),
+    }
+    for key, value in [(NUM_IMGS_ID, num_imgs), (DATA_PROJECT_ID, data_project_dict)]:
+        values[(stringify_id(key), "data")] = value
+    for index in range(num_cols * num_rows):
+        card = {"type": "thumbnail-image", "index": index}
+        values[(stringify_id(card), "n_clicks")] = 0
+        values[(stringify_id(card), "n_clicks_timestamp")] = None
+    return values
+
+
+class Scenario:
+    """
+    User actions of a labeling session. Each action fires the same callbacks, in the same
+    order, as the browser does, and records the outcome of every request
+    """
+
+    def __init__(self, session, record, rng=None):
+        self.session = session
+        self.record = record
+        self.rng = rng or random.Random()
+        self.seq = 0
+
+    def fire(self, name, trigger, output_prefix):
+        status_code, duration = self.session.trigger(trigger, output_prefix)
+        self.record(name, status_code, duration)
+        return status_code
+
+    def refresh_page(self):
+        """
+        Callbacks fired by the browser after the image order changes
+        """
+        self.fire(
+            "update_label_dict_per_page", "image-order.data", "label-dict-per-page"
+        )
+        if self.session.get(DATA_PROJECT_ID, "data") is None:
+            return
+        trigger = "image-order.data"
+        for _ in range(MAX_POLLS):
+            self.fire("update_output", trigger, THUMBNAILS_OUTPUT)
+            if self.session.get("thumbnail-poll", "disabled", True):
+                break
+            time.sleep(POLL_INTERVAL)
+            n_intervals = self.session.get("thumbnail-poll", "n_intervals", 0)
+            self.session.set("thumbnail-poll", "n_intervals", n_intervals + 1)
+            trigger = "thumbnail-poll.n_intervals"
+
+    def page_flip(self):
+        num_imgs = self.session.get(NUM_IMGS_ID, "data")
+        page_size = self.session.get("thumbnail-num-cols", "value") * self.session.get(
+            "thumbnail-num-rows", "value"
+        )
+        num_pages = max(1, num_imgs // page_size)
+        self.session.set("current-page", "value", self.rng.randrange(num_pages))
+        if (
+            self.fire("update_image_order", "current-page.value", "image-order.data@")
+            == 200
+        ):
+            self.refresh_page()
+
+    def label(self):
+        image_order = self.session.get("image-order", "data") or []
+        if len(image_order) == 0:
+            return
+        self.seq += 1
+        indices = self.rng.sample(
+            list(image_order), self.rng.randint(1, len(image_order))
+        )
+        operation = {
+            "seq": self.seq,
+            "label": self.rng.choice(LABELS_LIST),
+            "indices": [int(index) for index in indices],
+        }
+        self.session.set(
+            "label-ops-batch",
+            "data",
+            {"operations": [operation], "last_seq": self.seq},
+        )
+        if (
+            self.fire(
+                "apply_label_operations", "label-ops-batch.data", "labels-dict.data@"
+            )
+            == 200
+        ):
+            self.fire(
+                "update_label_dict_per_page", "labels-dict.data", "label-dict-per-page"
+            )
+
+    def toggle(self, button):
+        n_clicks = self.session.get(button, "n_clicks", 0) or 0
+        self.session.set(button, "n_clicks", n_clicks + 1)
+        self.session.set("current-page", "value", 0)
+        self.fire(
+            "undo_sort_or_hide_labeled_images", f"{button}.n_clicks", "image-order.data"
+        )
+        if (
+            self.fire("update_image_order", f"{button}.n_clicks", "image-order.data@")
+            == 200
+        ):
+            self.refresh_page()
+
+    def sort(self):
+        self.toggle("button-sort")
+
+    def hide(self):
+        self.toggle("button-hide")
+
+    def similarity(self):
+        if self.session.get("similarity-model-list", "value") is None:
+            self.session.set("tab-group", "value", "similarity")
+            self.fire(
+                "update_trained_model_list", "tab-group.value", "probability-model-list"
+            )
+            options = self.session.get("similarity-model-list", "options") or []
+            if len(options) == 0:
+                return
+            self.session.set("similarity-model-list", "value", options[0]["value"])
+
+        card = {"type": "thumbnail-image", "index": 0}
+        self.session.set(card, "n_clicks", 1)
+        self.session.set(card, "n_clicks_timestamp", 1)
+        self.session.set("find-similar-unsupervised", "n_clicks", 1)
+        self.session.set("current-page", "value", 0)
+        self.fire(
+            "display_indicator_on",
+            "find-similar-unsupervised.n_clicks",
+            "similarity-on-off-indicator",
+        )
+        if (
+            self.fire(
+                "update_image_order",
+                "similarity-on-off-indicator.color",
+                "image-order.data@",
+            )
+            == 200
+        ):
+            self.refresh_page()
+
+        self.session.set(card, "n_clicks", 0)
+        self.session.set("exit-similar-unsupervised", "n_clicks", 1)
+        self.fire(
+            "display_indicator_off",
+            "exit-similar-unsupervised.n_clicks",
+            "similarity-on-off-indicator",
+        )
+
+
+def har_requests(har):
+    """
+    This function extracts the callback requests of a HAR recording, e.g., exported from the
+    network tab of the browser during a labeling session
+    Args:
+        har:            HAR recording
+    Returns:
+        requests:       List of (label, payload text)
+    """
+    callback_requests = []
+    for entry in har["log"]["entries"]:
+        request = entry["request"]
+        if (
+            request["method"] != "POST"
+            or "_dash-update-component" not in request["url"]
+        ):
+            continue
+        text = request.get("postData", {}).get("text")
+        if text:
+            callback_requests.append((callback_label(json.loads(text)["output"]), text))
+    return callback_requests
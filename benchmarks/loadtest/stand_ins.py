@@ -0,0 +1,237 @@
+"""
+Local stand-ins of splash-ml and the compute API, plus a local image directory that replaces
+Tiled, such that Label Maker can be load tested without the MLExchange services
+
+Usage:
+    python -m benchmarks.loadtest.stand_ins --data-dir /tmp/labelmaker_data --num-images 2000
+
+Then start Label Maker against them, e.g.:
+    SPLASH_URL=http://127.0.0.1:8087/api/v0 MLEX_COMPUTE_URL=http://127.0.0.1:8080/api/v0 \\
+    DATA_DIR=/tmp/labelmaker_data gunicorn -c gunicorn_config.py labelmaker:server
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+from flask import Flask, jsonify, request
+from PIL import Image
+from werkzeug.serving import make_server
+
+from benchmarks.generators import (
+    LABELS_LIST,
+    make_feature_parquet,
+    make_probability_parquet,
+)
+
+
+def create_splash_app(latency=0.0):
+    """
+    This function creates an in-memory splash-ml stand-in with the endpoints used by Label Maker
+    Args:
+        latency:    Artificial latency in seconds added to every request
+    Returns:
+        app:        Flask app
+    """
+    app = Flask("splash_stand_in")
+    lock = threading.Lock()
+    events = []
+    datasets = {}
+    uri_index = {}
+    # Search results per query, cleared on writes, such that paging through a search does
+    # not scan all the datasets once per page, as a database index would
+    searches = {}
+
+    @app.before_request
+    def add_latency():
+        if latency:
+            time.sleep(latency)
+
+    def paginate(items):
+        offset = int(request.args.get("page[offset]", 0))
+        limit = int(request.args.get("page[limit]", 10))
+        return items[offset : offset + limit]
+
+    @app.route("/api/v0/events", methods=["GET", "POST"])
+    def tagging_events():
+        if request.method == "POST":
+            event = dict(request.get_json())
+            event["uid"] = str(uuid.uuid4())
+            event["run_time"] = datetime.utcnow().isoformat(timespec="microseconds")
+            with lock:
+                events.append(event)
+            return jsonify(event)
+        return jsonify(paginate(events))
+
+    def add_datasets(new_datasets):
+        added = []
+        with lock:
+            searches.clear()
+            for dataset in new_datasets:
+                key = (dataset.get("project"), dataset["uri"])
+                if key in uri_index:
+                    stored = datasets[uri_index[key]]
+                    stored["tags"].extend(add_tag_uids(dataset.get("tags", [])))
+                    added.append(stored)
+                    continue
+                dataset = dict(dataset)
+                dataset["uid"] = str(uuid.uuid4())
+                dataset["tags"] = add_tag_uids(dataset.get("tags", []))
+                datasets[dataset["uid"]] = dataset
+                uri_index[key] = dataset["uid"]
+                added.append(dataset)
+        return added
+
+    def add_tag_uids(tags):
+        return [dict(tag, uid=str(uuid.uuid4())) for tag in tags]
+
+    def find_datasets(project, uris):
+        if uris:
+            uids = [uri_index.get((project, uri)) for uri in uris]
+            return [datasets[uid] for uid in uids if uid is not None]
+        return [
+            d for d in datasets.values() if project is None or d["project"] == project
+        ]
+
+    @app.route("/api/v0/datasets", methods=["GET", "POST"])
+    def datasets_endpoint():
+        if request.method == "POST":
+            return jsonify(add_datasets(request.get_json()))
+        found = find_datasets(request.args.get("project"), request.args.getlist("uris"))
+        return jsonify(paginate(found))
+
+    @app.route("/api/v0/datasets/search", methods=["POST"])
+    def search_datasets():
+        body = request.get_json() or {}
+        event_id = body.get("event_id")
+        if body.get("uris") or event_id is None:
+            return jsonify(
+                paginate(find_datasets(body.get("project"), body.get("uris")))
+            )
+        key = (body.get("project"), event_id)
+        found = searches.get(key)
+        if found is None:
+            found = [
+                d
+                for d in find_datasets(body.get("project"), None)
+                if any(t["event_id"] == event_id for t in d["tags"])
+            ]
+            searches[key] = found
+        return jsonify(paginate(found))
+
+    @app.route("/api/v0/datasets/<uid>/tags", methods=["PATCH"])
+    def patch_tags(uid):
+        body = request.get_json()
+        with lock:
+            searches.clear()
+            dataset = datasets.get(uid)
+            if dataset is None:
+                return jsonify({"detail": "Dataset not found"}), 404
+            remove_uids = set(body.get("remove_tags", []))
+            dataset["tags"] = [
+                t for t in dataset["tags"] if t["uid"] not in remove_uids
+            ]
+            dataset["tags"].extend(add_tag_uids(body.get("add_tags", [])))
+        return jsonify(dataset)
+
+    return app
+
+
+def create_compute_app(data_dir, latency=0.0):
+    """
+    This function creates a compute API stand-in that lists one MLCoach and one Data Clinic
+    prediction job, whose results are stored in the data directory
+    Args:
+        data_dir:   Data directory
+        latency:    Artificial latency in seconds added to every request
+    Returns:
+        app:        Flask app
+    """
+    app = Flask("compute_stand_in")
+
+    def job(app_name, description):
+        out_path = f"{data_dir}/results/{app_name}"
+        return {
+            "uid": str(uuid.uuid4()),
+            "description": description,
+            "job_kwargs": {
+                "cmd": f"python predict.py -i {data_dir} -o {out_path}",
+                "kwargs": {"job_type": "prediction_model"},
+            },
+        }
+
+    jobs = {
+        "mlcoach": [job("mlcoach", "stand-in classifier")],
+        "data_clinic": [job("data_clinic", "stand-in autoencoder")],
+    }
+
+    @app.route("/api/v0/jobs")
+    def list_jobs():
+        if latency:
+            time.sleep(latency)
+        return jsonify(jobs.get(request.args.get("mlex_app"), []))
+
+    return app
+
+
+def make_data_dir(data_dir, num_images, frame_shape=(256, 256), seed=0):
+    """
+    This function writes a directory of 16-bit TIFF frames, and the MLCoach and Data Clinic
+    results associated with them
+    Args:
+        data_dir:       Data directory
+        num_images:     Number of images
+        frame_shape:    Frame shape
+        seed:           Random seed
+    """
+    rng = np.random.default_rng(seed)
+    image_dir = f"{data_dir}/images"
+    os.makedirs(image_dir, exist_ok=True)
+    for index in range(num_images):
+        path = f"{image_dir}/image_{index:07d}.tif"
+        if not os.path.exists(path):
+            frame = rng.poisson(100, frame_shape).astype(np.uint16)
+            Image.fromarray(frame).save(path)
+    for app_name in ("mlcoach", "data_clinic"):
+        os.makedirs(f"{data_dir}/results/{app_name}", exist_ok=True)
+    make_probability_parquet(
+        f"{data_dir}/results/mlcoach/results.parquet", num_images, LABELS_LIST
+    )
+    for app_name in ("mlcoach", "data_clinic"):
+        make_feature_parquet(
+            f"{data_dir}/results/{app_name}/f_vectors.parquet", num_images
+        )
+
+
+def serve(app, host, port):
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--splash-port", type=int, default=8087)
+    parser.add_argument("--compute-port", type=int, default=8080)
+    parser.add_argument("--data-dir", default="/tmp/labelmaker_data")
+    parser.add_argument("--num-images", type=int, default=2000)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every request"
+    )
+    args = parser.parse_args()
+
+    make_data_dir(args.data_dir, args.num_images)
+    serve(create_splash_app(args.latency), args.host, args.splash_port)
+    serve(create_compute_app(args.data_dir, args.latency), args.host, args.compute_port)
+    print(f"splash-ml stand-in: http://{args.host}:{args.splash_port}/api/v0")
+    print(f"compute API stand-in: http://{args.host}:{args.compute_port}/api/v0")
+    print(f"Data directory: {args.data_dir}")
+    threading.Event().wait()
@@ -0,0 +1,140 @@
+"""
+Runs the synthetic-scale benchmark suite and stores or compares JSON baselines
+
+Usage:
+    python -m benchmarks.run --scales 10k 100k --output benchmarks/baselines/labels_query.json
+    python -m benchmarks.run --scales 10k 100k --compare benchmarks/baselines/labels_query.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.generators import (
+    LABELS_LIST,
+    SCALES,
+    SyntheticDataProject,
+    make_feature_parquet,
+    make_labels_dict,
+    make_probability_parquet,
+)
+from benchmarks.labels_query import BENCHMARKS
+from benchmarks.utils import get_commit
+
+
+def make_project(scale, directory):
+    """
+    This function generates the synthetic project of a given scale
+    Args:
+        scale:          Scale name, e.g. 10k
+        directory:      Directory where the parquet files are written
+    Returns:
+        project:        Synthetic project
+    """
+    num_imgs = SCALES[scale]
+    return {
+        "num_imgs": num_imgs,
+        "labels": make_labels_dict(num_imgs, LABELS_LIST),
+        "feature_path": make_feature_parquet(
+            f"{directory}/f_vectors.parquet", num_imgs
+        ),
+        "probability_path": make_probability_parquet(
+            f"{directory}/results.parquet", num_imgs, LABELS_LIST
+        ),
+        "data_project": SyntheticDataProject(num_imgs),
+    }
+
+
+def run(scales, repeat=3, only=None):
+    """
+    This function runs the benchmarks
+    Args:
+        scales:         List of scale names
+        repeat:         Number of timed repetitions per benchmark
+        only:           Substring to select the benchmarks to run
+    Returns:
+        results:        Timings per scale and benchmark
+    """
+    results = {}
+    for scale in scales:
+        results[scale] = {}
+        with tempfile.TemporaryDirectory() as directory:
+            project = make_project(scale, directory)
+            for name, (setup, bench_scales) in BENCHMARKS.items():
+                if only and only not in name:
+                    continue
+                if bench_scales is not None and scale not in bench_scales:
+                    continue
+                timings = []
+                for _ in range(repeat):
+                    func = setup(project)
+                    start = time.perf_counter()
+                    func()
+                    timings.append(time.perf_counter() - start)
+                results[scale][name] = {
+                    "median_s": float(np.median(timings)),
+                    "min_s": float(np.min(timings)),
+                    "repeat": repeat,
+                }
+                print(
+                    f"{scale:>5} {name:<45} {results[scale][name]['median_s']:>10.4f} s"
+                )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    This function compares the results against a baseline
+    Args:
+        results:        Timings per scale and benchmark
+        baseline:       Baseline as stored by this script
+        threshold:      Relative slowdown reported as a regression, e.g. 0.2 for 20%
+    Returns:
+        regressions:    List of (scale, benchmark, ratio) that regressed
+    """
+    regressions = []
+    print(f"\nComparison against {baseline.get('commit')}:")
+    for scale, benchmarks in results.items():
+        for name, timing in benchmarks.items():
+            previous = baseline["results"].get(scale, {}).get(name)
+            if previous is None:
+                print(f"{scale:>5} {name:<45} {'':>8} NO BASELINE")
+                continue
+            ratio = timing["median_s"] / max(previous["median_s"], 1e-9)
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "REGRESSION"
+                regressions.append((scale, name, ratio))
+            print(f"{scale:>5} {name:<45} {ratio:>7.2f}x {flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scales", nargs="+", default=["10k"], choices=list(SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="Run the benchmarks whose name contains this")
+    parser.add_argument("--output", help="Path to store the results as JSON baseline")
+    parser.add_argument("--compare", help="Path of a JSON baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = run(args.scales, args.repeat, args.only)
+    report = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        sys.exit(1 if regressions else 0)
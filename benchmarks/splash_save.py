@@ -0,0 +1,107 @@
+"""
+Benchmark of the label upload to splash-ml against the local splash-ml stand-in
+
+Usage:
+    python -m benchmarks.splash_save --num-labels 10000 100000
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+
+from benchmarks.generators import LABELS_LIST, SyntheticDataProject, make_labels_dict
+from benchmarks.loadtest.stand_ins import create_splash_app, serve
+from benchmarks.utils import get_commit
+
+
+def no_progress(*args):
+    pass
+
+
+def run(num_labels_list, latency=0.0):
+    """
+    This function saves the labels of synthetic projects twice: the first save creates the
+    datasets and the second one adds tags to the existing datasets. Then, 1% of the labels
+    change and only those changes are saved into the tagging event of the second save, which
+    is finally loaded back
+    Args:
+        num_labels_list:    List of numbers of labeled images
+        latency:            Artificial latency in seconds of the splash-ml stand-in
+    Returns:
+        results:            Timings per number of labels and save
+    """
+    server = serve(create_splash_app(latency), "127.0.0.1", 0)
+    os.environ["SPLASH_URL"] = f"http://127.0.0.1:{server.server_port}/api/v0"
+    # SPLASH_URL is read when the app is imported
+    from src.labels import Labels
+    from src.utils.splash_utils import get_sync_state
+
+    results = {}
+    try:
+        for num_labels in num_labels_list:
+            data_project = SyntheticDataProject(num_labels, project_id=str(num_labels))
+            labels = Labels(
+                **make_labels_dict(num_labels, LABELS_LIST, labeled_fraction=1),
+                session_id="benchmark",
+            )
+            results[num_labels] = {}
+            for save in ("create", "tag", "incremental"):
+                if save == "incremental":
+                    changed = list(range(0, num_labels, 100))
+                    labels.assign_labels(LABELS_LIST[0], changed)
+                start = time.perf_counter()
+                statuses = labels.save_to_splash(
+                    "benchmark",
+                    data_project,
+                    no_progress,
+                    incremental=save == "incremental",
+                )
+                duration = time.perf_counter() - start
+                errors = len(list(filter(None, statuses)))
+                results[num_labels][save] = {"seconds": duration, "errors": errors}
+                print(f"{num_labels:>8} {save:<12} {duration:>10.2f} s {errors} errors")
+
+            # Load the labels of the last tagging event into empty labels
+            loaded = Labels(labels_dict={}, labels_list=[])
+            start = time.perf_counter()
+            loaded.load_splash_labels(
+                data_project, get_sync_state(labels.session_id)["event_id"], no_progress
+            )
+            duration = time.perf_counter() - start
+            errors = sum(
+                [loaded.labels_list[i] for i in loaded.labels_dict.get(index, [])]
+                != [labels.labels_list[i] for i in label]
+                for index, label in labels.labels_dict.items()
+            )
+            results[num_labels]["load"] = {"seconds": duration, "errors": errors}
+            print(f"{num_labels:>8} {'load':<12} {duration:>10.2f} s {errors} errors")
+    finally:
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--num-labels", nargs="+", type=int, default=[10_000])
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every request"
+    )
+    parser.add_argument("--output", help="Path to store the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.num_labels, args.latency)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": get_commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "latency_s": args.latency,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
@@ -0,0 +1,99 @@
+"""
+Benchmark of the page reads from local HDF5 image stacks
+
+Usage:
+    python -m benchmarks.stack_read --num-imgs 2000 --page-size 25
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.generators import make_image_stack
+from benchmarks.utils import get_commit
+from src.utils.stack_utils import LocalDataProject, get_stack_project_dict
+
+# Layouts of the stacks: (name, chunk length, compression)
+STACK_LAYOUTS = [
+    ("contiguous", None, None),
+    ("chunked", 16, None),
+    ("chunked_gzip", 16, "gzip"),
+]
+
+
+def run(num_imgs, page_size, frame_shape, render_workers=8):
+    """
+    This function reads the pages of synthetic stacks with each layout, both as one read per
+    page and as concurrent reads of single images, as done by the thumbnail renders
+    Args:
+        num_imgs:           Number of frames per stack
+        page_size:          Number of images per page
+        frame_shape:        Frame shape
+        render_workers:     Number of concurrent single image reads
+    Returns:
+        results:            Pages per second per layout and read
+    """
+    results = {}
+    pages = [
+        list(range(start, min(start + page_size, num_imgs)))
+        for start in range(0, num_imgs, page_size)
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, chunk_length, compression in STACK_LAYOUTS:
+            path = make_image_stack(
+                os.path.join(tmp_dir, f"{name}.h5"),
+                num_imgs,
+                frame_shape,
+                chunk_length,
+                compression,
+            )
+            results[name] = {}
+            for read in ("page", "images"):
+                # A new data project per read, such that no block is cached beforehand
+                data_project = LocalDataProject.from_dict(get_stack_project_dict(path))
+                start = time.perf_counter()
+                if read == "page":
+                    for page in pages:
+                        data_project.read_datasets(page, export="pillow", resize=False)
+                else:
+                    with ThreadPoolExecutor(max_workers=render_workers) as executor:
+                        for page in pages:
+                            list(
+                                executor.map(
+                                    lambda index: data_project.read_datasets(
+                                        [index], export="pillow", resize=False
+                                    ),
+                                    page,
+                                )
+                            )
+                duration = time.perf_counter() - start
+                results[name][read] = {"pages_per_second": len(pages) / duration}
+                print(f"{name:<14} {read:<8} {len(pages) / duration:>10.1f} pages/s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--num-imgs", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--frame-shape", nargs=2, type=int, default=[512, 512])
+    parser.add_argument("--output", help="Path to store the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.num_imgs, args.page_size, tuple(args.frame_shape))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": get_commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
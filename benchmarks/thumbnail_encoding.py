@@ -0,0 +1,89 @@
+"""
+Benchmark of the thumbnail encoding time vs. number of bytes for typical detector frames
+
+Usage:
+    python -m benchmarks.thumbnail_encoding [--repeat 5] [--output results.json]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.utils.image_utils import encode_image
+
+# Typical detector frames: (name, shape, dtype)
+DETECTOR_FRAMES = [
+    ("ccd_1k_uint16", (1024, 1024), np.uint16),
+    ("pilatus_1m_int32", (1043, 981), np.int32),
+    ("eiger_4m_uint32", (2167, 2070), np.uint32),
+]
+CODECS = [("png", 85), ("jpeg", 85), ("jpeg", 60), ("webp", 85), ("webp", 60)]
+SIZES = [200, 400]
+
+
+def make_detector_frame(shape, dtype, seed=0):
+    """
+    This function generates a synthetic scattering frame with rings and Poisson noise
+    Args:
+        shape:      Frame shape
+        dtype:      Frame data type
+        seed:       Random seed
+    Returns:
+        frame:      Numpy array
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.indices(shape)
+    radius = np.hypot(y - shape[0] * 0.45, x - shape[1] * 0.55)
+    intensity = 1e4 / (1 + radius) ** 1.5
+    for ring in (0.1, 0.22, 0.35):
+        intensity += 500 * np.exp(-(((radius - ring * shape[0]) / 6) ** 2))
+    frame = rng.poisson(intensity * 20).astype(dtype)
+    # Detector module gaps
+    frame[:, shape[1] // 3 :: shape[1] // 3][:, :1] = 0
+    return frame
+
+
+def run(repeat=5):
+    results = []
+    for name, shape, dtype in DETECTOR_FRAMES:
+        frame = make_detector_frame(shape, dtype)
+        for codec, quality in CODECS:
+            for size in SIZES:
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    content = encode_image(
+                        frame, codec, quality, size, log=True, percentiles=[1, 99]
+                    )
+                    timings.append(time.perf_counter() - start)
+                results.append(
+                    {
+                        "frame": name,
+                        "codec": codec,
+                        "quality": quality,
+                        "size": size,
+                        "median_ms": 1000 * float(np.median(timings)),
+                        "bytes": len(content),
+                    }
+                )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Path to store the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(f"{'frame':<18}{'codec':<6}{'quality':>8}{'size':>6}{'ms':>9}{'bytes':>9}")
+    for r in results:
+        print(
+            f"{r['frame']:<18}{r['codec']:<6}{r['quality']:>8}{r['size']:>6}"
+            f"{r['median_ms']:>9.2f}{r['bytes']:>9}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
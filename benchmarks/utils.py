@@ -0,0 +1,19 @@
+"""
+Helpers shared by the benchmarks
+"""
+
+import os
+import subprocess
+
+
+def get_commit():
+    # The commit of the repository of the benchmarks, wherever they are run from
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -2,20 +2,13 @@ import os
 import time
 
 import dash
-from dash import Input, Output, State, dcc
-from file_manager.data_project import DataProject
+from dash import Input, Output, State
+from dash.exceptions import PreventUpdate
 from flask import request
 from werkzeug.middleware.profiler import ProfilerMiddleware
 
-from src.app_layout import (  # noqa: F401
-    TILED_KEY,
-    app,
-    logger,
-    long_callback_manager,
-    server,
-)
+from src.app_layout import app, logger, long_callback_manager, server  # noqa: F401
 from src.callbacks.display import (  # noqa: F401;
-    deselect,
     display_indicator_off,
     display_indicator_on,
     full_screen_thumbnail,
@@ -39,27 +32,31 @@ from src.callbacks.display_order import (  # noqa: F401
 from src.callbacks.help import toggle_help_modal  # noqa: F401
 from src.callbacks.manage_labels import (  # noqa: F401
     add_new_label,
+    apply_label_operations,
     delete_label,
-    label_selected_thumbnails,
-    label_selected_thumbnails_key_binds,
     label_selected_thumbnails_new_dataset,
     label_selected_thumbnails_probability,
     load_from_splash_modal,
     load_labels_from_probabilities,
     modify_label,
     toggle_color_picker_modal,
-    unlabel_selected_thumbnails,
     update_labeling_progress,
 )
 from src.callbacks.update_models import update_trained_model_list  # noqa: F401
 from src.callbacks.warning import toggle_modal_unlabel_warning  # noqa: F401
 from src.labels import Labels
 from src.utils.compression_utils import compress_dict, decompress_dict
+from src.utils.data_project_utils import get_data_project, get_uri_index
+from src.utils.download_utils import init_downloads, register_file_download
+from src.utils.metrics_utils import init_metrics
 from src.utils.plot_utils import create_label_component
+from src.utils.render_utils import get_project_hash
 
 APP_PORT = os.getenv("APP_PORT", 8057)
 APP_HOST = os.getenv("APP_HOST", "127.0.0.1")
 
+init_metrics(app)
+init_downloads(app)
 
 app.clientside_callback(
     """
@@ -84,10 +81,12 @@ app.clientside_callback(
 @app.long_callback(
     Output("storage-modal", "is_open"),
     Output("storage-body-modal", "children"),
+    Output("splash-sync", "data"),
     Input("confirm-save-splash", "n_clicks"),
     State({"base_id": "file-manager", "name": "data-project-dict"}, "data"),
     State("labels-dict", "data"),
     State("tagger-id", "value"),
+    State("save-splash-incremental", "value"),
     manager=long_callback_manager,
     prevent_initial_call=True,
     running=[
@@ -95,6 +94,7 @@ app.clientside_callback(
         (Output("store-progress-title", "children"), "Storing labels to server...", ""),
     ],
     progress=[Output("store-progress", "value")],
+    cancel=[Input("cancel-store-progress", "n_clicks")],
 )
 def save_labels_to_splash(
     set_progress,
@@ -102,6 +102,7 @@ def save_labels_to_splash(
     data_project_dict,
     labels_dict,
     tagger_id,
+    incremental,
 ):
     """
     This callback saves the labels to disk or to splash-ml
@@ -111,26 +112,70 @@ def save_labels_to_splash(
         labels_dict:                    Dictionary of labeled images (docker path), as follows:
                                         {filename1: [label1, label2], ...}
         tagger_id:                      ID to identify the user/tagger
+        incremental:                    Only save the changes since the last sync
     Returns:
         storage_modal_open:             Open/closes the confirmation message
         storage_body_modal:             Confirmation message
+        splash_sync:                    Revision and time of the last sync of the labels
     """
     labels_dict = decompress_dict(labels_dict)
     labels = Labels(**labels_dict)
-    if sum(labels.num_imgs_per_label.values()) > 0:
+    changes = labels.get_changes() if incremental else None
+    incremental = changes is not None
+    if incremental and len(changes) == 0:
+        return True, "No changes since the last save", dash.no_update
+    if incremental or sum(labels.num_imgs_per_label.values()) > 0:
         # Load data project
-        data_project = DataProject.from_dict(data_project_dict, api_key=TILED_KEY)
+        data_project = get_data_project(data_project_dict)
 
-        status = labels.save_to_splash(tagger_id, data_project, set_progress)
+        status = labels.save_to_splash(
+            tagger_id, data_project, set_progress, incremental=incremental
+        )
         # Remove None elements
         status = list(filter(None, status))
         if len(status) == 0:
             response = "Labels stored in splash-ml"
+            return True, response, labels.get_sync_watermark()
         else:
-            response = f"Error. {status}"
-        return True, response
+            response = f"Error. {status} Saving again resumes the upload."
+        return True, response, dash.no_update
+
+    return True, "No labels to save", dash.no_update
 
-    return True, "No labels to save"
+
+@app.long_callback(
+    Output("splash-sync", "data", allow_duplicate=True),
+    Input("autosave-interval", "n_intervals"),
+    State({"base_id": "file-manager", "name": "data-project-dict"}, "data"),
+    State("labels-dict", "data"),
+    manager=long_callback_manager,
+    prevent_initial_call=True,
+)
+def autosave_labels_to_splash(n_intervals, data_project_dict, labels_dict):
+    """
+    This callback periodically saves the changes in the labels to the tagging event of the last
+    save to splash-ml from this session
+    Args:
+        n_intervals:                    Autosave interval
+        data_project_dict:              Data project information
+        labels_dict:                    Dictionary of labeled images (docker path), as follows:
+                                        {filename1: [label1, label2], ...}
+    Returns:
+        splash_sync:                    Revision and time of the last sync of the labels
+    """
+    labels_dict = decompress_dict(labels_dict)
+    labels = Labels(**labels_dict)
+    if not labels.get_changes():
+        raise PreventUpdate
+    data_project = get_data_project(data_project_dict)
+    status = labels.save_to_splash(
+        None, data_project, lambda progress: None, incremental=True
+    )
+    status = list(filter(None, status))
+    if len(status) > 0:
+        logger.error(f"Autosave to splash-ml failed: {status}")
+        raise PreventUpdate
+    return labels.get_sync_watermark()
 
 
 @app.long_callback(
@@ -151,6 +196,7 @@ def save_labels_to_splash(
         ),
     ],
     progress=[Output("store-progress", "value")],
+    cancel=[Input("cancel-store-progress", "n_clicks")],
 )
 def load_labels_from_splash(
     set_progress,
@@ -163,15 +209,16 @@ def load_labels_from_splash(
     start = time.time()
     labels_dict = decompress_dict(labels_dict)
     labels = Labels(**labels_dict)
-    data_project = DataProject.from_dict(data_project_dict, api_key=TILED_KEY)
-    labels.load_splash_labels(data_project, event_id, set_progress)
+    data_project = get_data_project(data_project_dict)
+    uri_index = get_uri_index(data_project, get_project_hash(data_project_dict))
+    labels.load_splash_labels(data_project, event_id, set_progress, uri_index)
     label_comp = create_label_component(labels.labels_list, color_cycle)
     logger.debug(f"Updating labels after {time.time()-start}")
     return label_comp, compress_dict(vars(labels))
 
 
 @app.long_callback(
-    Output("download-out", "data"),
+    Output("download-url", "data"),
     Output("storage-modal", "is_open", allow_duplicate=True),
     Output("storage-body-modal", "children", allow_duplicate=True),
     Input("button-save-zip", "n_clicks"),
@@ -188,6 +235,7 @@ def load_labels_from_splash(
         ),
     ],
     progress=[Output("store-progress", "value")],
+    cancel=[Input("cancel-store-progress", "n_clicks")],
 )
 def save_labels_as_zip(
     set_progress,
@@ -196,14 +244,64 @@ def save_labels_as_zip(
     labels_dict,
 ):
     """
-    This callback saves the labels to disk
+    This callback saves the labeled images to a zip archive, served by the download route
     Args:
         button_save_zip_n_clicks:       Button to save to disk as zip
         data_project_dict:              Data project information
         labels_dict:                    Dictionary of labeled images (docker path), as follows:
                                         {filename1: [label1, label2], ...}
     Returns:
-        download_out:                   Download output
+        download_url:                   Download URL
+        storage_modal_open:             Open/closes the confirmation message
+        storage_body_modal:             Confirmation message
+    """
+    labels = Labels(**decompress_dict(labels_dict))
+    if sum(labels.num_imgs_per_label.values()) > 0:
+        # Load data project
+        data_project = get_data_project(data_project_dict)
+
+        path_save = labels.save_to_directory(data_project, set_progress)
+        response = "Download will start shortly"
+        return register_file_download(app, "zip", path_save), True, response
+
+    return dash.no_update, True, "No labels to save"
+
+
+@app.long_callback(
+    Output("download-url", "data", allow_duplicate=True),
+    Output("storage-modal", "is_open", allow_duplicate=True),
+    Output("storage-body-modal", "children", allow_duplicate=True),
+    Input("button-save-hdf5", "n_clicks"),
+    State({"base_id": "file-manager", "name": "data-project-dict"}, "data"),
+    State("labels-dict", "data"),
+    manager=long_callback_manager,
+    prevent_initial_call=True,
+    running=[
+        (Output("modal-store-progress", "is_open"), True, False),
+        (
+            Output("store-progress-title", "children"),
+            "Preparing labels for download...",
+            "",
+        ),
+    ],
+    progress=[Output("store-progress", "value")],
+    cancel=[Input("cancel-store-progress", "n_clicks")],
+)
+def save_labels_as_hdf5(
+    set_progress,
+    button_save_hdf5_n_clicks,
+    data_project_dict,
+    labels_dict,
+):
+    """
+    This callback saves the labeled images to a HDF5 file, served by the download route
+    Args:
+        button_save_hdf5_n_clicks:      Button to save to disk as HDF5
+        data_project_dict:              Data project information
+        labels_dict:                    Dictionary of labeled images (docker path), as follows:
+                                        {filename1: [label1, label2], ...}
+    Returns:
+        download_url:                   Download URL
         storage_modal_open:             Open/closes the confirmation message
         storage_body_modal:             Confirmation message
     """
@@ -211,24 +309,84 @@ def save_labels_as_zip(
     labels = Labels(**labels_dict)
     if sum(labels.num_imgs_per_label.values()) > 0:
         # Load data project
-        data_project = DataProject.from_dict(
-            data_project_dict, set_progress=set_progress, api_key=TILED_KEY
-        )
+        data_project = get_data_project(data_project_dict)
 
-        path_save = labels.save_to_directory(data_project)
+        try:
+            path_save = labels.save_to_hdf5(data_project, set_progress)
+        except ValueError as e:
+            return dash.no_update, True, f"Error. {e}"
         response = "Download will start shortly"
-        return (dcc.send_file(f"{path_save}.zip", filename="files.zip"), True, response)
+        return register_file_download(app, "hdf5", path_save), True, response
 
     return dash.no_update, True, "No labels to save"
 
 
 @app.long_callback(
-    Output("download-out", "data", allow_duplicate=True),
+    Output("download-url", "data", allow_duplicate=True),
+    Output("storage-modal", "is_open", allow_duplicate=True),
+    Output("storage-body-modal", "children", allow_duplicate=True),
+    Input("button-save-shards", "n_clicks"),
+    State({"base_id": "file-manager", "name": "data-project-dict"}, "data"),
+    State("labels-dict", "data"),
+    State("shard-format", "value"),
+    manager=long_callback_manager,
+    prevent_initial_call=True,
+    running=[
+        (Output("modal-store-progress", "is_open"), True, False),
+        (
+            Output("store-progress-title", "children"),
+            "Preparing labels for download...",
+            "",
+        ),
+    ],
+    progress=[Output("store-progress", "value")],
+    cancel=[Input("cancel-store-progress", "n_clicks")],
+)
+def save_labels_as_shards(
+    set_progress,
+    button_save_shards_n_clicks,
+    data_project_dict,
+    labels_dict,
+    shard_format,
+):
+    """
+    This callback saves the labeled images as shards split into train, validation and test
+    subsets, served by the download route
+    Args:
+        button_save_shards_n_clicks:    Button to save to disk as shards
+        data_project_dict:              Data project information
+        labels_dict:                    Dictionary of labeled images (docker path), as follows:
+                                        {filename1: [label1, label2], ...}
+        shard_format:                   Shard format, tar or npz
+    Returns:
+        download_url:                   Download URL
+        storage_modal_open:             Open/closes the confirmation message
+        storage_body_modal:             Confirmation message
+    """
+    labels_dict = decompress_dict(labels_dict)
+    labels = Labels(**labels_dict)
+    if sum(labels.num_imgs_per_label.values()) > 0:
+        # Load data project
+        data_project = get_data_project(data_project_dict)
+
+        try:
+            path_save = labels.save_to_shards(data_project, set_progress, shard_format)
+        except ValueError as e:
+            return dash.no_update, True, f"Error. {e}"
+        response = "Download will start shortly"
+        return register_file_download(app, "shards", path_save), True, response
+
+    return dash.no_update, True, "No labels to save"
+
+
+@app.long_callback(
+    Output("download-url", "data", allow_duplicate=True),
     Output("storage-modal", "is_open", allow_duplicate=True),
     Output("storage-body-modal", "children", allow_duplicate=True),
     Input("button-save-table", "n_clicks"),
     State({"base_id": "file-manager", "name": "data-project-dict"}, "data"),
     State("labels-dict", "data"),
+    State("table-format", "value"),
     manager=long_callback_manager,
     prevent_initial_call=True,
     running=[
@@ -240,38 +398,60 @@ def save_labels_as_zip(
         ),
     ],
     progress=[Output("store-progress", "value")],
+    cancel=[Input("cancel-store-progress", "n_clicks")],
 )
 def save_labels_as_table(
     set_progress,
     button_save_table_n_clicks,
     data_project_dict,
     labels_dict,
+    table_format,
 ):
     """
-    This callback saves the labels to disk
+    This callback saves the labels to a table, served by the download route
     Args:
         button_save_table_n_clicks:     Button to save to disk as table
         data_project_dict:              Data project information
         labels_dict:                    Dictionary of labeled images (docker path), as follows:
                                         {filename1: [label1, label2], ...}
+        table_format:                   Table format, csv or parquet
     Returns:
-        download_out:                   Download output
+        download_url:                   Download URL
         storage_modal_open:             Open/closes the confirmation message
         storage_body_modal:             Confirmation message
     """
-    labels_dict = decompress_dict(labels_dict)
-    labels = Labels(**labels_dict)
+    labels = Labels(**decompress_dict(labels_dict))
     if sum(labels.num_imgs_per_label.values()) > 0:
         # Load data project
-        data_project = DataProject.from_dict(data_project_dict, api_key=TILED_KEY)
+        data_project = get_data_project(data_project_dict)
 
-        path_save = labels.save_to_table(data_project, set_progress)
+        path_save = labels.save_to_table(data_project, set_progress, table_format)
         response = "Download will start shortly"
-        return (dcc.send_file(path_save, filename="labels.csv"), True, response)
+        return register_file_download(app, table_format, path_save), True, response
 
     return dash.no_update, True, "No labels to save"
 
 
+app.clientside_callback(
+    """
+    function(url) {
+        if (url) {
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = '';
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+        }
+        return '';
+    }
+    """,
+    Output("dummy1", "data", allow_duplicate=True),
+    Input("download-url", "data"),
+    prevent_initial_call=True,
+)
+
+
 @app.callback(
     Output("storage-modal", "is_open", allow_duplicate=True),
     Input("close-storage-modal", "n_clicks"),
@@ -0,0 +1,301 @@
+"""
+Pre-generate the thumbnails of a data project into the thumbnail cache of Label Maker, such that
+the first browse of the project is served from the cache. Images whose thumbnails are already
+cached are skipped, so an interrupted run resumes where it stopped
+
+Usage:
+    python pregenerate_thumbnails.py --data-project data_project.json --stats stats.parquet
+    python pregenerate_thumbnails.py --stack /data/scan.h5 --workers 16
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from src.app_layout import logger
+from src.utils import cache_utils
+from src.utils.data_project_utils import get_data_project, get_num_imgs
+from src.utils.image_utils import encode_image, to_array
+from src.utils.render_utils import (
+    get_project_hash,
+    get_thumbnail_encoding,
+    get_thumbnail_key,
+)
+from src.utils.stack_utils import get_stack_project_dict
+
+# Number of images read and encoded per task, and seconds between throughput reports
+BATCH_SIZE = 64
+REPORT_INTERVAL = 10
+# Columns of the per-image statistics
+STATS_COLUMNS = ["min", "max", "mean", "std", "p1", "p99"]
+
+# Data project of this worker process
+worker_data_project = None
+
+
+def init_worker(data_project_dict):
+    global worker_data_project
+    worker_data_project = get_data_project(data_project_dict)
+
+
+def compute_stats(image_array):
+    """
+    This function computes the statistics of an image at its original bit depth
+    Args:
+        image_array:    Numpy array
+    Returns:
+        stats:          List of statistics, in the order of STATS_COLUMNS
+    """
+    image_array = image_array.astype(np.float64, copy=False)
+    p1, p99 = np.percentile(image_array, [1, 99])
+    return [
+        image_array.min(),
+        image_array.max(),
+        image_array.mean(),
+        image_array.std(),
+        p1,
+        p99,
+    ]
+
+
+def render_batch(indices, log, percentiles, encoding, with_stats):
+    """
+    This function reads and encodes a batch of images in a worker process. If the batch cannot
+    be read, its images are read one by one such that only the failed images are skipped
+    Args:
+        indices:        Indexes of the images in the data project
+        log:            Log toggle
+        percentiles:    Min-Max Percentile
+        encoding:       Thumbnail codec, quality, size and byte budget
+        with_stats:     [Bool] Compute the statistics of the images
+    Returns:
+        results:        List of (index, uri, thumbnail, statistics), thumbnail is None if the
+                        image could not be rendered
+    """
+    try:
+        imgs, uris = worker_data_project.read_datasets(
+            indices, export="pillow", resize=False
+        )
+        batches = [(indices, imgs, uris)]
+    except Exception:
+        batches = []
+        for index in indices:
+            try:
+                imgs, uris = worker_data_project.read_datasets(
+                    [index], export="pillow", resize=False
+                )
+                batches.append(([index], imgs, uris))
+            except Exception as e:
+                logger.error(f"Image {index} could not be read: {e}")
+                batches.append(([index], [None], [None]))
+
+    results = []
+    for batch_indices, imgs, uris in batches:
+        for index, img, uri in zip(batch_indices, imgs, uris):
+            if img is None:
+                results.append((index, uri, None, None))
+                continue
+            image_array = to_array(img)
+            content = encode_image(
+                image_array, log=log, percentiles=percentiles, **encoding
+            )
+            stats = compute_stats(image_array) if with_stats else None
+            results.append((index, uri, content, stats))
+    return results
+
+
+def load_stats(stats_path):
+    """
+    This function loads the statistics of a previous run
+    Args:
+        stats_path:     Path of the parquet file, None to skip the statistics
+    Returns:
+        stats:          Dictionary of index: (uri, statistics)
+    """
+    import pandas as pd
+
+    try:
+        df = pd.read_parquet(stats_path, engine="pyarrow")
+    except FileNotFoundError:
+        return {}
+    return {
+        int(row[0]): (row[1], list(row[2:]))
+        for row in df[["index", "uri"] + STATS_COLUMNS].itertuples(index=False)
+    }
+
+
+def save_stats(stats_path, stats):
+    """
+    This function saves the statistics of the images
+    Args:
+        stats_path:     Path of the parquet file
+        stats:          Dictionary of index: (uri, statistics)
+    """
+    import pandas as pd
+
+    indices = sorted(stats)
+    df = pd.DataFrame(
+        [stats[index][1] for index in indices], columns=STATS_COLUMNS, dtype=np.float64
+    )
+    df.insert(0, "uri", [stats[index][0] for index in indices])
+    df.insert(0, "index", np.asarray(indices, dtype=np.int64))
+    df.to_parquet(stats_path, engine="pyarrow", index=False)
+
+
+def pregenerate_thumbnails(
+    data_project_dict,
+    log=False,
+    percentiles=None,
+    num_imgs_per_page=18,
+    workers=4,
+    batch_size=BATCH_SIZE,
+    stats_path=None,
+):
+    """
+    This function renders the thumbnails of all the images in the data project that are not
+    cached yet, using the cache keys of the app for the given display settings
+    Args:
+        data_project_dict:  Data project information, as in the data-project-dict store
+        log:                Log toggle
+        percentiles:        Min-Max Percentile
+        num_imgs_per_page:  Number of images per page, used to split the page byte budget
+        workers:            Number of worker processes
+        batch_size:         Number of images per task
+        stats_path:         Path of the parquet file of the image statistics, None to skip
+    Returns:
+        summary:            Number of images rendered, skipped and failed, and throughput
+    """
+    if percentiles is None:
+        percentiles = [0, 100]
+    num_imgs = get_num_imgs(get_data_project(data_project_dict))
+    project_hash = get_project_hash(data_project_dict)
+    encoding = get_thumbnail_encoding(num_imgs_per_page)
+    stats = load_stats(stats_path) if stats_path else {}
+
+    def get_missing(indices):
+        keys = [
+            get_thumbnail_key(project_hash, index, log, percentiles, encoding)
+            for index in indices
+        ]
+        cached = cache_utils.get_many("thumbnails", keys)
+        return [
+            index
+            for index, content in zip(indices, cached)
+            if not content or (stats_path and index not in stats)
+        ]
+
+    rendered = skipped = failed = 0
+    start = last_report = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(data_project_dict,),
+        ) as executor:
+            pending = set()
+            for batch_start in range(0, num_imgs, batch_size):
+                indices = list(
+                    range(batch_start, min(batch_start + batch_size, num_imgs))
+                )
+                missing = get_missing(indices)
+                skipped += len(indices) - len(missing)
+                if missing:
+                    pending.add(
+                        executor.submit(
+                            render_batch,
+                            missing,
+                            log,
+                            percentiles,
+                            encoding,
+                            bool(stats_path),
+                        )
+                    )
+                # Bound the number of batches in flight, such that memory does not grow with
+                # the number of images
+                while len(pending) >= 2 * workers or (
+                    pending and batch_start + batch_size >= num_imgs
+                ):
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        thumbnails = []
+                        for index, uri, content, image_stats in future.result():
+                            if content is None:
+                                failed += 1
+                                continue
+                            key = get_thumbnail_key(
+                                project_hash, index, log, percentiles, encoding
+                            )
+                            thumbnails.append((key, content))
+                            if image_stats is not None:
+                                stats[index] = (uri, image_stats)
+                        cache_utils.store_many("thumbnails", thumbnails)
+                        rendered += len(thumbnails)
+                    if time.perf_counter() - last_report > REPORT_INTERVAL:
+                        last_report = time.perf_counter()
+                        report_progress(
+                            rendered, skipped, failed, num_imgs, last_report - start
+                        )
+    finally:
+        if stats_path:
+            save_stats(stats_path, stats)
+    duration = time.perf_counter() - start
+    report_progress(rendered, skipped, failed, num_imgs, duration)
+    return {
+        "rendered": rendered,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": duration,
+        "images_per_second": rendered / duration if duration > 0 else 0,
+    }
+
+
+def report_progress(rendered, skipped, failed, num_imgs, duration):
+    rate = rendered / duration if duration > 0 else 0
+    remaining = num_imgs - rendered - skipped - failed
+    eta = f"{remaining / rate:.0f} s" if rate > 0 else "-"
+    logger.info(
+        f"{rendered + skipped + failed}/{num_imgs} images: {rendered} rendered, "
+        f"{skipped} cached, {failed} failed, {rate:.1f} images/s, ETA {eta}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    project = parser.add_mutually_exclusive_group(required=True)
+    project.add_argument(
+        "--data-project",
+        help="JSON file of the data project, as copied from the data-project-dict store",
+    )
+    project.add_argument("--stack", help="Local HDF5 file or Zarr store")
+    parser.add_argument("--log", action="store_true", help="Log-transform the images")
+    parser.add_argument(
+        "--percentiles", nargs=2, type=int, default=[0, 100], help="Min-Max Percentile"
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=18,
+        help="Number of images per page, used to split THUMBNAIL_PAGE_BUDGET",
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--stats", help="Parquet file of the per-image statistics")
+    args = parser.parse_args()
+
+    if args.stack:
+        data_project_dict = get_stack_project_dict(args.stack)
+    else:
+        with open(args.data_project) as f:
+            data_project_dict = json.load(f)
+    pregenerate_thumbnails(
+        data_project_dict,
+        args.log,
+        args.percentiles,
+        args.page_size,
+        args.workers,
+        args.batch_size,
+        args.stats,
+    )
@@ -5,11 +5,9 @@ import dash
 import dash_bootstrap_components as dbc
 import diskcache
 from dash import dcc, html
-from dash.long_callback import DiskcacheLongCallbackManager
 from dotenv import load_dotenv
 from file_manager.main import FileManager
 from flask import Flask
-from flask_caching import Cache
 
 from src.components.browser_cache import browser_cache
 from src.components.data_transformations import data_transformations
@@ -18,9 +16,18 @@ from src.components.display_settings import display_settings
 from src.components.header import header
 from src.components.label_method import label_method
 from src.components.store import store_options
+from src.utils.job_utils import PooledLongCallbackManager
 
-cache = diskcache.Cache("./cache")
-long_callback_manager = DiskcacheLongCallbackManager(cache)
+load_dotenv(".env")
+
+# Long callbacks share the cache directory of the unified cache layer (src/utils/cache_utils)
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+# Number of job processes of each worker running the long callbacks (exports, splash-ml
+# transfers)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+long_callback_manager = PooledLongCallbackManager(
+    diskcache.Cache(os.path.join(CACHE_DIR, "jobs")), max_workers=JOB_WORKERS
+)
 
 external_stylesheets = [
     dbc.themes.BOOTSTRAP,
@@ -38,13 +45,11 @@ app = dash.Dash(
 
 server = app.server
 
-cache = Cache(app.server, config={"CACHE_TYPE": "filesystem", "CACHE_DIR": ".cache"})
-
-load_dotenv(".env")
-
 MLCOACH_URL = os.getenv("MLCOACH_URL")
 DATA_CLINIC_URL = os.getenv("DATA_CLINIC_URL")
 SPLASH_URL = os.getenv("SPLASH_URL")
+# Interval in seconds between incremental saves of the labels to splash-ml, 0 to disable
+AUTOSAVE_INTERVAL = int(os.getenv("AUTOSAVE_INTERVAL", 0))
 MLEX_COMPUTE_URL = os.getenv("MLEX_COMPUTE_URL")
 DEFAULT_TILED_URI = os.getenv("DEFAULT_TILED_URI")
 DEFAULT_TILED_SUB_URI = os.getenv("DEFAULT_TILED_SUB_URI")
@@ -53,6 +58,23 @@ if TILED_KEY == "":
     TILED_KEY = None
 DATA_DIR = os.getenv("DATA_DIR")
 USER = "admin"
+PROGRESSIVE_RENDER = os.getenv("PROGRESSIVE_RENDER", "True").lower() == "true"
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 8))
+THUMBNAIL_CODEC = os.getenv("THUMBNAIL_CODEC", "png").lower()
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 85))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", 200))
+THUMBNAIL_PAGE_BUDGET = int(os.getenv("THUMBNAIL_PAGE_BUDGET", 0))
+FULL_SCREEN_SIZE = int(os.getenv("FULL_SCREEN_SIZE", 0)) or None
+METRICS_DIR = os.getenv("METRICS_DIR", "./.metrics")
+CACHE_EVICTION_POLICY = os.getenv("CACHE_EVICTION_POLICY", "least-recently-used")
+# Thumbnails are packed into a single data file (packed) or stored as a diskcache (diskcache)
+THUMBNAIL_STORE = os.getenv("THUMBNAIL_STORE", "packed").lower()
+CACHE_SIZE_LIMITS_MB = {
+    "thumbnails": int(os.getenv("THUMBNAILS_CACHE_MB", 2048)),
+    "orders": int(os.getenv("ORDERS_CACHE_MB", 256)),
+    "models": int(os.getenv("MODELS_CACHE_MB", 16)),
+    "events": int(os.getenv("EVENTS_CACHE_MB", 16)),
+}
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -69,72 +91,81 @@ dash_file_explorer.init_callbacks(app)
 app.title = "Label Maker"
 app._favicon = "mlex.ico"
 
-app.layout = html.Div(
-    [
-        header(
-            "MLExchange | Label Maker",
-            "https://github.com/mlexchange/mlex_dash_labelmaker_demo",
-        ),
-        dbc.Container(
-            [
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                dbc.Accordion(
-                                    [
-                                        dbc.AccordionItem(
-                                            data_transformations(),
-                                            title="Data Transformations",
-                                            item_id="data-transformations",
-                                        ),
-                                        dbc.AccordionItem(
-                                            label_method(),
-                                            title="Labeling Method",
-                                            item_id="label-method",
-                                        ),
-                                        dbc.AccordionItem(
-                                            store_options(),
-                                            title="Store Options",
-                                            item_id="store-options",
-                                        ),
-                                        dbc.AccordionItem(
-                                            display_settings(),
-                                            title="Display Settings",
-                                            item_id="display-settings",
-                                        ),
-                                    ],
-                                    active_item="label-method",
-                                    style={
-                                        "position": "sticky",
-                                        "top": "10%",
-                                        "width": "100%",
-                                    },
-                                )
-                            ],
-                            width=4,
-                            style={"display": "flex"},
-                        ),
-                        dbc.Col(
-                            [
-                                dash_file_explorer.file_explorer,
-                                dcc.Loading(
-                                    id="loading-display",
-                                    parent_className="transparent-loader-wrapper",
-                                    children=[html.Div(id="output-image-upload")],
-                                    type="circle",
-                                ),
-                                display(),
-                            ],
-                            width=8,
-                        ),
-                    ],
-                    justify="center",
-                ),
-            ],
-            fluid=True,
-            style={"margin-top": "1%"},
-        ),
-        browser_cache(MLCOACH_URL, DATA_CLINIC_URL),
-    ]
-)
+
+def serve_layout():
+    """
+    This function builds the layout of a page load, such that each browser session has its own
+    labels
+    """
+    return html.Div(
+        [
+            header(
+                "MLExchange | Label Maker",
+                "https://github.com/mlexchange/mlex_dash_labelmaker_demo",
+            ),
+            dbc.Container(
+                [
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    dbc.Accordion(
+                                        [
+                                            dbc.AccordionItem(
+                                                data_transformations(),
+                                                title="Data Transformations",
+                                                item_id="data-transformations",
+                                            ),
+                                            dbc.AccordionItem(
+                                                label_method(),
+                                                title="Labeling Method",
+                                                item_id="label-method",
+                                            ),
+                                            dbc.AccordionItem(
+                                                store_options(),
+                                                title="Store Options",
+                                                item_id="store-options",
+                                            ),
+                                            dbc.AccordionItem(
+                                                display_settings(),
+                                                title="Display Settings",
+                                                item_id="display-settings",
+                                            ),
+                                        ],
+                                        active_item="label-method",
+                                        style={
+                                            "position": "sticky",
+                                            "top": "10%",
+                                            "width": "100%",
+                                        },
+                                    )
+                                ],
+                                width=4,
+                                style={"display": "flex"},
+                            ),
+                            dbc.Col(
+                                [
+                                    dash_file_explorer.file_explorer,
+                                    dcc.Loading(
+                                        id="loading-display",
+                                        parent_className="transparent-loader-wrapper",
+                                        children=[html.Div(id="output-image-upload")],
+                                        type="circle",
+                                    ),
+                                    display(),
+                                ],
+                                width=8,
+                            ),
+                        ],
+                        justify="center",
+                    ),
+                ],
+                fluid=True,
+                style={"margin-top": "1%"},
+            ),
+            browser_cache(MLCOACH_URL, DATA_CLINIC_URL, AUTOSAVE_INTERVAL),
+        ]
+    )
+
+
+app.layout = serve_layout
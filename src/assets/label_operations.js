@@ -0,0 +1,85 @@
+if (typeof window.dash_clientside === 'undefined') {
+    window.dash_clientside = {};
+}
+
+if (typeof window.dash_clientside.clientside === 'undefined') {
+    window.dash_clientside.clientside = {};
+}
+
+// Time (ms) after which a batch that has not been acknowledged by the server is sent again
+const LABEL_BATCH_RETRY_TIMEOUT = 10000;
+
+
+/**
+ * Buffers a labeling operation triggered by the label buttons, the un-label button or the
+ * labeling key binds, such that operations are applied by the server in order
+ */
+window.dash_clientside.clientside.queue_label_operation = function(
+    labelButtonTimestamps, unlabelNClicks, keybindLabel, thumbClicked, labelButtonChildren,
+    imageOrder, buffer, ack
+) {
+    const triggered = window.dash_clientside.callback_context.triggered.map(t => t.prop_id);
+    let label;
+    if (triggered.includes('keybind-event-listener.event')) {
+        if (!keybindLabel || !('key' in keybindLabel)) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        const labelIndex = parseInt(keybindLabel['key']) - 1;
+        if (
+            !/^[0-9]$/.test(keybindLabel['key'])
+            || keybindLabel['ctrlKey'] !== true
+            || labelIndex < 0
+            || labelIndex >= labelButtonChildren.length
+        ) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        label = labelButtonChildren[labelIndex];
+    } else if (triggered.includes('un-label.n_clicks')) {
+        label = null;
+    } else {
+        if (labelButtonTimestamps.every(t => !t)) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        const labelIndex = labelButtonTimestamps.indexOf(Math.max(...labelButtonTimestamps));
+        label = labelButtonChildren[labelIndex];
+    }
+
+    const indices = [];
+    thumbClicked.forEach((clicks, cardIndex) => {
+        if (clicks !== null && clicks % 2 === 1 && cardIndex < imageOrder.length) {
+            indices.push(imageOrder[cardIndex]);
+        }
+    });
+    if (indices.length === 0) {
+        throw window.dash_clientside.PreventUpdate;
+    }
+
+    // Operations that have been acknowledged by the server are dropped from the buffer
+    const seq = buffer['seq'] + 1;
+    const operations = buffer['operations'].filter(op => op['seq'] > ack);
+    operations.push({'seq': seq, 'label': label, 'indices': indices});
+    return {'seq': seq, 'operations': operations};
+}
+
+
+/**
+ * Flushes the buffered labeling operations as one ordered batch when there is no batch
+ * waiting to be acknowledged by the server
+ */
+window.dash_clientside.clientside.flush_label_operations = function(
+    nIntervals, buffer, ack, batch
+) {
+    const now = Date.now();
+    if (batch && batch['last_seq'] > ack && now - batch['sent_at'] < LABEL_BATCH_RETRY_TIMEOUT) {
+        throw window.dash_clientside.PreventUpdate;
+    }
+    const operations = buffer['operations'].filter(op => op['seq'] > ack);
+    if (operations.length === 0) {
+        throw window.dash_clientside.PreventUpdate;
+    }
+    return {
+        'operations': operations,
+        'last_seq': operations[operations.length - 1]['seq'],
+        'sent_at': now,
+    };
+}
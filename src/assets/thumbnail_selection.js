@@ -0,0 +1,83 @@
+if (typeof window.dash_clientside === 'undefined') {
+    window.dash_clientside = {};
+}
+
+if (typeof window.dash_clientside.clientside === 'undefined') {
+    window.dash_clientside.clientside = {};
+}
+
+
+/**
+ * Assigns a color to a thumbnail card in the following scenarios:
+ *  - An image has been selected, but no label has been assigned (blue)
+ *  - An image has been labeled (label color)
+ *  - An image has been unselected or unlabeled (no color)
+ */
+window.dash_clientside.clientside.select_thumbnail = function(
+    value, labelsDict, colorCycle, currentColor, cardId, imageOrder
+) {
+    let color;
+    if (value === null || value === undefined) {
+        color = currentColor;
+    } else if (value % 2 === 1) {
+        color = 'primary';
+    } else {
+        const cardIndex = cardId['index'];
+        color = 'white';
+        if (imageOrder && cardIndex < imageOrder.length && labelsDict && labelsDict['labels_dict']) {
+            const label = labelsDict['labels_dict'][String(imageOrder[cardIndex])];
+            if (label && label.length > 0) {
+                color = colorCycle[label[0]];
+            }
+        }
+    }
+    if (color === currentColor) {
+        return window.dash_clientside.no_update;
+    }
+    return color;
+}
+
+
+/**
+ * Selects all the thumbnail cards with ctrl+a
+ */
+window.dash_clientside.clientside.select_all_keybind = function(keybindLabel) {
+    if (keybindLabel && 'key' in keybindLabel) {
+        if (!(keybindLabel['key'] === 'a' && keybindLabel['ctrlKey'])) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+    }
+    return ['primary', 1];
+}
+
+
+/**
+ * Deselects the thumbnail cards after labeling, unlabeling or labeling with key binds
+ */
+window.dash_clientside.clientside.deselect = function(
+    labelButtonTrigger, unlabelNClicks, unlabelAll, keybindLabel, thumbClicked
+) {
+    const triggered = window.dash_clientside.callback_context.triggered.map(t => t.prop_id);
+    let keybindIsValid = true;
+    if (triggered.includes('keybind-event-listener.event') && keybindLabel && 'key' in keybindLabel) {
+        const labelIndex = parseInt(keybindLabel['key']) - 1;
+        keybindIsValid = (
+            /^[0-9]$/.test(keybindLabel['key'])
+            && keybindLabel['ctrlKey'] === true
+            && labelIndex >= 0
+            && labelIndex < labelButtonTrigger.length
+        );
+        if (!keybindIsValid) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+    }
+    if (
+        labelButtonTrigger.every(x => x === null || x === undefined)
+        && (unlabelNClicks === null || unlabelNClicks === undefined)
+        && (unlabelAll === null || unlabelAll === undefined)
+        && !keybindIsValid
+    ) {
+        return thumbClicked.map(() => window.dash_clientside.no_update);
+    }
+    return thumbClicked.map(() => 0);
+}
@@ -2,15 +2,35 @@ import os
 import time
 
 import dash
-import pandas as pd
-from dash import ALL, MATCH, Input, Output, State, callback, ctx
+from dash import (
+    ALL,
+    MATCH,
+    ClientsideFunction,
+    Input,
+    Output,
+    State,
+    callback,
+    clientside_callback,
+    ctx,
+)
 from dash.exceptions import PreventUpdate
-from file_manager.data_project import DataProject
 
-from src.app_layout import TILED_KEY, cache, logger
+from src.app_layout import FULL_SCREEN_SIZE, PROGRESSIVE_RENDER, logger
 from src.query import Query
 from src.utils.compression_utils import decompress_dict
+from src.utils.data_project_utils import get_data_project
+from src.utils.metrics_utils import record_cache_access, timer
+from src.utils.model_utils import load_model_output
 from src.utils.plot_utils import draw_rows, parse_full_screen_content
+from src.utils.render_utils import (
+    get_project_hash,
+    get_thumbnail_encoding,
+    get_thumbnail_key,
+    get_thumbnails,
+    read_image,
+    render_page,
+    submit_thumbnails,
+)
 
 
 @callback(
@@ -18,41 +38,42 @@ from src.utils.plot_utils import draw_rows, parse_full_screen_content
     Output({"type": "thumbnail-name", "index": ALL}, "children"),
     Output({"type": "thumbnail-src", "index": ALL}, "src"),
     Output({"type": "thumbnail-image", "index": ALL}, "n_clicks"),
+    Output("thumbnail-poll", "disabled"),
     Input("image-order", "data"),
     Input({"base_id": "file-manager", "name": "data-project-dict"}, "data"),
     Input("log-transform", "value"),
     Input("min-max-percentile", "value"),
+    Input("thumbnail-poll", "n_intervals"),
     State("labels-dict", "data"),
     State("similarity-on-off-indicator", "color"),
     State("thumbnail-num-cols", "value"),
     State("thumbnail-num-rows", "value"),
     prevent_initial_call=True,
 )
-@cache.memoize(timeout=0)
 def update_output(
     image_order,
     data_project_dict,
     log,
     percentiles,
+    poll_n_intervals,
     labels_dict,
     similarity_on_off_color,
     thumbnail_num_cols,
     thumbnail_num_rows,
 ):
     """
-    This callback displays images in the front-end
+    This callback displays images in the front-end. In progressive mode, the thumbnails are
+    rendered in the background and this callback is polled until all of them are available
     Args:
         image_order:            Order of the images according to the selected action (sort, hide,
                                 new data, etc)
-        current_page:           Index of the current page
+        data_project_dict:      Data project information
         log:                    Log toggle
         percentiles:            Min-Max Percentile
+        poll_n_intervals:       Number of times the rendered thumbnails have been polled
         labels_dict:            Dictionary with labeling information, e.g.
                                 {filename1: [label1,label2], ...}
-        data_project_dict:      Data project information
-        find_similar_images:    Find similar images button, n_clicks
-        tab_selection:          Current tab [Manual, Similarity, Probability]
-        card_id:                Card ID to identify the card index
+        similarity_on_off_color: Color of the similarity-based search indicator
         thumbnail_num_cols:     Number of thumbnail columns
         thumbnail_num_rows:     Number of thumbnail rows
     Returns:
@@ -60,12 +81,12 @@ def update_output(
         filename:               Filename label in image card
         content:                Content to be displayed in image card
         init_clicks:            Initial number of clicks in image card
+        poll_disabled:          Disables the thumbnail polling when all thumbnails are available
     """
     if percentiles is None:
         percentiles = [0, 100]
     num_imgs_per_page = thumbnail_num_cols * thumbnail_num_rows
     none_style = {"display": "none"}
-    labels_dict = decompress_dict(labels_dict)
 
     if data_project_dict == {}:
         return (
@@ -73,22 +94,64 @@ def update_output(
             [dash.no_update] * num_imgs_per_page,
             [dash.no_update] * num_imgs_per_page,
             [dash.no_update] * num_imgs_per_page,
+            True,
         )
 
-    data_project = DataProject.from_dict(data_project_dict, api_key=TILED_KEY)
+    data_project = get_data_project(data_project_dict)
     if len(data_project.datasets) == 0:
         return (
             [none_style] * num_imgs_per_page,
             [dash.no_update] * num_imgs_per_page,
             [dash.no_update] * num_imgs_per_page,
             [dash.no_update] * num_imgs_per_page,
+            True,
         )
 
     start = time.time()
+    project_hash = get_project_hash(data_project_dict)
+    encoding = get_thumbnail_encoding(num_imgs_per_page)
+    thumbnail_keys = [
+        get_thumbnail_key(project_hash, index, log, percentiles, encoding)
+        for index in image_order
+    ]
+
+    # Thumbnails are being polled, only the contents are updated
+    if ctx.triggered_id == "thumbnail-poll":
+        contents = get_thumbnails(thumbnail_keys)
+        poll_disabled = all(content is not None for content in contents)
+        contents = [
+            content if content is not None else dash.no_update for content in contents
+        ]
+        contents += [dash.no_update] * (num_imgs_per_page - len(contents))
+        logger.debug(f"Thumbnails polled after {time.time()-start}")
+        return (
+            [dash.no_update] * num_imgs_per_page,
+            [dash.no_update] * num_imgs_per_page,
+            contents,
+            [dash.no_update] * num_imgs_per_page,
+            poll_disabled,
+        )
+
     # Load labels and data project
-    contents, uris = data_project.read_datasets(
-        image_order, resize=True, log=log, percentiles=percentiles
-    )
+    if PROGRESSIVE_RENDER:
+        contents = get_thumbnails(thumbnail_keys)
+        missing = [i for i, content in enumerate(contents) if content is None]
+        record_cache_access("thumbnails", len(contents) - len(missing), len(missing))
+        submit_thumbnails(
+            data_project,
+            [image_order[i] for i in missing],
+            [thumbnail_keys[i] for i in missing],
+            log,
+            percentiles,
+            encoding,
+        )
+    else:
+        contents = render_page(
+            data_project, image_order, thumbnail_keys, log, percentiles, encoding
+        )
+    poll_disabled = all(content is not None for content in contents)
+    contents = [content if content is not None else "" for content in contents]
+    uris = data_project.read_datasets(image_order, just_uri=True)
     logger.debug(f"Data project done after {time.time()-start}")
 
     uris = uris + [""] * (num_imgs_per_page - len(contents))
@@ -99,14 +162,14 @@ def update_output(
 
     # Find similar images has been activated
     if similarity_on_off_color == "green":
-        init_clicks = 1
+        labels_dict = decompress_dict(labels_dict)
         query = Query(
             num_imgs=data_project.datasets[-1].cumulative_data_count, **labels_dict
         )
-        unlabeled_indices = query.hide_labeled()
+        unlabeled_indices = set(query.hide_labeled())
         init_clicks = [1 if image in unlabeled_indices else 0 for image in image_order]
     else:
-        init_clicks = [0] * len(uris)
+        init_clicks = [0] * len(image_order)
 
     init_clicks += [0] * (num_imgs_per_page - len(init_clicks))
     logger.debug(f"Display done after {time.time()-start}")
@@ -115,6 +178,7 @@ def update_output(
         uris,
         contents,
         init_clicks,
+        poll_disabled,
     )
 
 
@@ -158,7 +222,7 @@ def update_probabilities(
 ):
     num_imgs_per_page = thumbnail_num_cols * thumbnail_num_rows
     if probability_model and tab_selection == "probability":
-        df_prob = pd.read_parquet(probability_model)
+        df_prob = load_model_output(probability_model, "probability")
         probs = df_prob.iloc[image_order]
         probs = [
             " \n".join([f"{col}: {row[col]*100:.2f}" for col in probs.columns])
@@ -235,18 +299,24 @@ def full_screen_thumbnail(
         raise PreventUpdate
     if percentiles is None:
         percentiles = [0, 100]
-    data_project = DataProject.from_dict(data_project_dict, api_key=TILED_KEY)
-    img_contents, img_uri = data_project.read_datasets(
-        [image_order[double_click.index(1)]],
-        resize=False,
-        log=log,
-        percentiles=percentiles,
-    )
+    data_project = get_data_project(data_project_dict)
+    encoding = get_thumbnail_encoding()
+    encoding["size"] = FULL_SCREEN_SIZE
+    encoding["byte_budget"] = None
+    with timer("read_duration_seconds", source="full_screen"):
+        img_contents, img_uri = read_image(
+            data_project,
+            int(image_order[double_click.index(1)]),
+            encoding,
+            log,
+            percentiles,
+        )
     contents = parse_full_screen_content(img_contents, img_uri)
     return [contents], [True], [0] * len(double_click)
 
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="select_thumbnail"),
     Output({"type": "thumbnail-card", "index": MATCH}, "color", allow_duplicate=True),
     Input({"type": "thumbnail-image", "index": MATCH}, "n_clicks"),
     Input("label-dict-per-page", "data"),
@@ -256,43 +326,10 @@ def full_screen_thumbnail(
     State("image-order", "data"),
     prevent_initial_call=True,
 )
-def select_thumbnail(
-    value, labels_dict, color_cycle, current_color, card_id, image_order
-):
-    """
-    This callback assigns a color to thumbnail cards in the following scenarios:
-        - An image has been selected, but no label has been assigned (blue)
-        - An image has been labeled (label color)
-        - An image has been unselected or unlabeled (no color)
-    Args:
-        value:                      Thumbnail card that triggered the callback (n_clicks)
-        labels_dict:                Dictionary of labeled images, as follows: {'img1':[], 'img2':[]}
-        color_cycle:                List that contains the color cycle associated with the labels
-        current_color:              Current color in thumbnail card
-        card_id:                    Card ID to identify the card index
-        image_order:                Order of the images according to the selected action (sort,hide)
-    Returns:
-        thumbnail_color:            Color of thumbnail card
-    """
-    if value is None:
-        color = current_color
-    elif value % 2 == 1:
-        color = "primary"
-    else:
-        card_index = card_id["index"]
-        color = "white"
-        if card_index < len(image_order):
-            if str(image_order[card_index]) in labels_dict["labels_dict"].keys():
-                label = labels_dict["labels_dict"][str(image_order[card_index])]
-                if len(label) > 0:
-                    label_indx = label[0]
-                    color = color_cycle[label_indx]
-    if color == current_color:
-        return dash.no_update
-    return color
 
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="select_all_keybind"),
     Output({"type": "thumbnail-card", "index": MATCH}, "color", allow_duplicate=True),
     Output(
         {"type": "thumbnail-image", "index": MATCH}, "n_clicks", allow_duplicate=True
@@ -300,23 +337,10 @@ def select_thumbnail(
     Input("keybind-event-listener", "event"),
     prevent_initial_call=True,
 )
-def select_all_keybind(keybind_label):
-    """
-    This callback selects all the thumbnail cards using the keybind
-    Args:
-        keybind_label:          Keyword entry
-    Returns:
-        Modify the color of the thumbnail card
-    """
-    keybind_is_valid = True
-    if "key" in keybind_label:
-        keybind_is_valid = keybind_label["key"] == "a" and keybind_label["ctrlKey"]
-        if not keybind_is_valid:
-            raise PreventUpdate
-    return "primary", 1
 
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="deselect"),
     Output({"type": "thumbnail-image", "index": ALL}, "n_clicks", allow_duplicate=True),
     Input({"type": "label-button", "index": ALL}, "n_clicks_timestamp"),
     Input("un-label", "n_clicks"),
@@ -325,38 +349,6 @@ def select_all_keybind(keybind_label):
     State({"type": "thumbnail-image", "index": ALL}, "n_clicks"),
     prevent_initial_call=True,
 )
-def deselect(
-    label_button_trigger, unlabel_n_clicks, unlabel_all, keybind_label, thumb_clicked
-):
-    """
-    This callback deselects a thumbnail card
-    Args:
-        label_button_trigger:   Label button
-        unlabel_n_clicks:       Un-label button
-        unlabel_all:            Un-label all the images
-        keybind_label:          Keyword entry
-        thumb_clicked:          Selected thumbnail card indice, e.g., [0,1,1,0,0,0]
-    Returns:
-        Modify the number of clicks for a specific thumbnail card
-    """
-    changed_id = ctx.triggered_id
-    keybind_is_valid = True
-    if changed_id == "keybind-event-listener" and "key" in keybind_label:
-        keybind_is_valid = (
-            keybind_label["key"].isdigit()
-            and keybind_label["ctrlKey"]
-            and int(keybind_label["key"]) - 1 in range(len(label_button_trigger))
-        )
-        if not keybind_is_valid:
-            raise PreventUpdate
-    if (
-        all(x is None for x in label_button_trigger)
-        and unlabel_n_clicks is None
-        and unlabel_all is None
-        and not keybind_is_valid
-    ):
-        return [dash.no_update] * len(thumb_clicked)
-    return [0 for thumb in thumb_clicked]
 
 
 @callback(
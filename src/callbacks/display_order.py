@@ -1,13 +1,14 @@
+import hashlib
 import math
 import os
 
 import dash
-import h5py
 import numpy as np
 from dash import ALL, Input, Output, State, callback
 from dash.exceptions import PreventUpdate
 
 from src.query import Query
+from src.utils import cache_utils
 from src.utils.compression_utils import decompress_dict
 
 
@@ -77,6 +78,8 @@ def update_image_order(
         image_order:                Order of the images according to the selected action
                                     (sort, hide, new data, etc)
     """
+    import h5py
+
     # Calculate the start and end index of the images to be displayed
     start_indx = thumbnail_num_cols * thumbnail_num_rows * current_page
     max_indx = min(start_indx + thumbnail_num_cols * thumbnail_num_rows, num_imgs)
@@ -114,6 +117,7 @@ def update_image_order(
 
     # Check if the similarity-based search is activated
     elif similarity_on_off_color == "green":
+        labels_hash = hashlib.sha1(labels_dict.encode("utf-8")).hexdigest()
         labels_dict = decompress_dict(labels_dict)
         query = Query(num_imgs=num_imgs, **labels_dict)
 
@@ -125,9 +129,16 @@ def update_image_order(
 
         # If an image and model are selected, find similar images
         if clicked_ind is not None and similarity_model:
-            ordered_indx = query.similarity_search(
-                similarity_model,
-                current_image_order[int(clicked_ind)],
+            index_interest = current_image_order[int(clicked_ind)]
+            ordered_indx = cache_utils.get_or_compute(
+                "orders",
+                (
+                    similarity_model,
+                    os.stat(similarity_model).st_mtime_ns,
+                    index_interest,
+                    labels_hash,
+                ),
+                lambda: query.similarity_search(similarity_model, index_interest),
             )
 
             with h5py.File(".current_image_order.hdf5", "w") as f:
@@ -264,6 +275,8 @@ def go_to_last_page(
     """
     Update the current page to the last page
     """
+    import h5py
+
     if button_hide_n_clicks and button_hide_n_clicks % 2 == 1:
         if os.path.exists(".current_image_order.hdf5"):
             with h5py.File(".current_image_order.hdf5", "r") as f:
@@ -320,6 +333,8 @@ def disable_buttons(
     """
     Disable first and last page buttons based on the current page
     """
+    import h5py
+
     if button_hide_n_clicks and button_hide_n_clicks % 2 == 1:
         if os.path.exists(".current_image_order.hdf5"):
             with h5py.File(".current_image_order.hdf5", "r") as f:
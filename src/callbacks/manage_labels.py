@@ -1,17 +1,27 @@
 import time
-from datetime import datetime, timezone
 
 import dash
 import numpy as np
-import pandas as pd
-import requests
-from dash import ALL, Input, Output, State, callback
+from dash import (
+    ALL,
+    ClientsideFunction,
+    Input,
+    Output,
+    State,
+    callback,
+    clientside_callback,
+)
 from dash.exceptions import PreventUpdate
 
-from src.app_layout import SPLASH_URL, logger
+from src.app_layout import logger
 from src.labels import Labels
 from src.utils.compression_utils import compress_dict, decompress_dict
+from src.utils.model_utils import load_model_output
 from src.utils.plot_utils import create_label_component
+from src.utils.splash_utils import filter_tagging_events, get_tagging_events
+
+# Number of tagging events listed per page in the load from splash-ml modal
+EVENT_OPTIONS_PAGE_SIZE = 50
 
 
 @callback(
@@ -69,52 +79,71 @@ def update_labeling_progress(labels_dict, num_imgs, current_label_perc_value):
     return label_perc_value, label_perc_label, total_labeled
 
 
-@callback(
-    Output("labels-dict", "data", allow_duplicate=True),
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="queue_label_operation"),
+    Output("label-ops-buffer", "data"),
+    Input({"type": "label-button", "index": ALL}, "n_clicks_timestamp"),
+    Input("un-label", "n_clicks"),
     Input("keybind-event-listener", "event"),
     State({"type": "thumbnail-image", "index": ALL}, "n_clicks"),
-    State("labels-dict", "data"),
     State({"type": "label-button", "index": ALL}, "children"),
     State("image-order", "data"),
+    State("label-ops-buffer", "data"),
+    State("label-ops-ack", "data"),
     prevent_initial_call=True,
 )
-def label_selected_thumbnails_key_binds(
-    keybind_label,
-    thumbnail_image_select_value,
-    labels_dict,
-    label_button_children,
-    image_order,
-):
+
+
+clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="flush_label_operations"),
+    Output("label-ops-batch", "data"),
+    Input("label-ops-flush", "n_intervals"),
+    State("label-ops-buffer", "data"),
+    State("label-ops-ack", "data"),
+    State("label-ops-batch", "data"),
+    prevent_initial_call=True,
+)
+
+
+@callback(
+    Output("labels-dict", "data", allow_duplicate=True),
+    Output("label-ops-ack", "data"),
+    Input("label-ops-batch", "data"),
+    State("labels-dict", "data"),
+    State("label-ops-ack", "data"),
+    prevent_initial_call=True,
+)
+def apply_label_operations(label_ops_batch, labels_dict, label_ops_ack):
     """
-    This callback updates the dictionary of labeled images when a new image is labeled with key binds
+    This callback applies a batch of labeling operations buffered in the browser (label buttons,
+    un-label button and key binds) in a single pass
     Args:
-        keybind_label:                  Keyword entry
-        thumbnail_image_select_value:   Selected thumbnail image (n_clicks)
+        label_ops_batch:                Batch of labeling operations, e.g.,
+                                        {"operations": [{"seq": 1, "label": "label1",
+                                        "indices": [0, 5]}, ...], "last_seq": 1}
         labels_dict:                    Dictionary of labeled images, e.g.,
                                         {filename1: [label1, label2], ...}
-        label_button_children:          List of label text in label buttons
-        image_order:                    Order of the images
+        label_ops_ack:                  Sequence number of the last applied operation
     Returns:
         labels_dict:                    Dictionary with labeling information, e.g.
                                         {filename1: [label1, label2], ...}
+        label_ops_ack:                  Sequence number of the last applied operation
     """
+    operations = [
+        operation
+        for operation in label_ops_batch["operations"]
+        if operation["seq"] > label_ops_ack
+    ]
+    if len(operations) == 0:
+        raise PreventUpdate
     start = time.time()
     labels_dict = decompress_dict(labels_dict)
     labels = Labels(**labels_dict)
-    if "key" in keybind_label:
-        if (
-            keybind_label["key"].isdigit()
-            and keybind_label["ctrlKey"] is True
-            and int(keybind_label["key"]) - 1 in range(len(label_button_children))
-        ):
-            label_class_value = label_button_children[int(keybind_label["key"]) - 1]
-            labels.manual_labeling(
-                label_class_value, thumbnail_image_select_value, image_order
-            )
-        else:
-            raise PreventUpdate
-    logger.debug(f"Updating labels after {time.time()-start}")
-    return compress_dict(vars(labels))
+    labels.batch_labeling(operations)
+    logger.debug(
+        f"Updating labels with {len(operations)} operations after {time.time()-start}"
+    )
+    return compress_dict(vars(labels)), max(op["seq"] for op in operations)
 
 
 @callback(
@@ -187,80 +216,6 @@ def label_selected_thumbnails_probability(
     return compress_dict(vars(labels))
 
 
-@callback(
-    Output("labels-dict", "data", allow_duplicate=True),
-    Input("un-label", "n_clicks"),
-    State({"type": "thumbnail-image", "index": ALL}, "n_clicks"),
-    State("labels-dict", "data"),
-    State("image-order", "data"),
-    prevent_initial_call=True,
-)
-def unlabel_selected_thumbnails(
-    unlabel_button,
-    thumbnail_image_select_value,
-    labels_dict,
-    image_order,
-):
-    """
-    Args:
-        unlabel_button:                 Un-label button
-        thumbnail_image_select_value:   Selected thumbnail image (n_clicks)
-        labels_dict:                    Dictionary of labeled images, e.g.,
-                                        {filename1: [label1, label2], ...}
-        image_order:                    Order of the images
-    Returns:
-        labels_dict:                    Dictionary with labeling information, e.g.
-                                        {filename1: [label1, label2], ...}
-    """
-    start = time.time()
-    labels_dict = decompress_dict(labels_dict)
-    labels = Labels(**labels_dict)
-    labels.manual_labeling(None, thumbnail_image_select_value, image_order)
-    logger.debug(f"Updating labels after {time.time()-start}")
-    return compress_dict(vars(labels))
-
-
-@callback(
-    Output("labels-dict", "data", allow_duplicate=True),
-    Input({"type": "label-button", "index": ALL}, "n_clicks_timestamp"),
-    State({"type": "thumbnail-image", "index": ALL}, "n_clicks"),
-    State("labels-dict", "data"),
-    State({"type": "label-button", "index": ALL}, "children"),
-    State("image-order", "data"),
-    prevent_initial_call=True,
-)
-def label_selected_thumbnails(
-    label_button_n_clicks,
-    thumbnail_image_select_value,
-    labels_dict,
-    label_button_children,
-    image_order,
-):
-    """
-    This callback updates the dictionary of labeled images when a new image is labeled
-    Args:
-        label_button_n_clicks:          List of timestamps of the clicked label-buttons
-        thumbnail_image_select_value:   Selected thumbnail image (n_clicks)
-        labels_dict:                    Dictionary of labeled images, e.g.,
-                                        {filename1: [label1, label2], ...}
-        label_button_children:          List of label text in label buttons
-        image_order:                    Order of the images
-    Returns:
-        labels_dict:                    Dictionary with labeling information, e.g.
-                                        {filename1: [label1, label2], ...}
-    """
-    if all(click == 0 for click in label_button_n_clicks):
-        raise PreventUpdate
-    start = time.time()
-    labels_dict = decompress_dict(labels_dict)
-    labels = Labels(**labels_dict)
-    indx = np.argmax(label_button_n_clicks)
-    label_class_value = label_button_children[indx]
-    labels.manual_labeling(label_class_value, thumbnail_image_select_value, image_order)
-    logger.debug(f"Updating labels after {time.time()-start}")
-    return compress_dict(vars(labels))
-
-
 @callback(
     Output("label-buttons", "children", allow_duplicate=True),
     Output("labels-dict", "data", allow_duplicate=True),
@@ -380,7 +335,7 @@ def load_labels_from_probabilities(
     labels_dict = decompress_dict(labels_dict)
     labels = Labels(**labels_dict)
     if probability_model:
-        df_prob = pd.read_parquet(probability_model)
+        df_prob = load_model_output(probability_model, "probability")
         probability_labels = list(df_prob.columns[0:])
         additional_labels = list(set(probability_labels) - set(labels.labels_list))
         for additional_label in additional_labels:
@@ -398,55 +353,69 @@ def load_labels_from_probabilities(
 @callback(
     Output("event-id", "options"),
     Output("modal-load-splash", "is_open"),
+    Output("event-options-limit", "data"),
+    Output("event-load-more", "children"),
+    Output("event-load-more", "disabled"),
     Input("button-load-splash", "n_clicks"),
     Input("confirm-load-splash", "n_clicks"),
+    Input("event-load-more", "n_clicks"),
+    Input("event-tagger-filter", "value"),
+    Input("event-date-filter", "start_date"),
+    Input("event-date-filter", "end_date"),
+    State("event-options-limit", "data"),
     prevent_initial_call=True,
 )
-def load_from_splash_modal(load_n_click, confirm_load):
+def load_from_splash_modal(
+    load_n_click,
+    confirm_load,
+    load_more_n_clicks,
+    tagger_id,
+    start_date,
+    end_date,
+    options_limit,
+):
     """
     Load labels from splash-ml associated with the project_id
     Args:
         load_n_click:       Number of clicks in load from splash-ml button
         confirm_load:       Number of clicks in confim button within loading from splash-ml modal
+        load_more_n_clicks: Number of clicks in load more tagging events button
+        tagger_id:          Tagger ID filter
+        start_date:         Start date filter
+        end_date:           End date filter
+        options_limit:      Number of tagging events currently listed
     Returns:
         event_id:           Available tagging event IDs associated with the current data project
         modal_load_splash:  True/False to open/close loading from splash-ml modal
+        options_limit:      Number of tagging events listed
+        load_more_text:     Load more button text
+        load_more_disabled: Disables the load more button when all the events are listed
     """
     changed_id = dash.callback_context.triggered[-1]["prop_id"]
     if (
         changed_id == "confirm-load-splash.n_clicks"
     ):  # if confirmed, load chosen tagging event
-        return dash.no_update, False
+        return dash.no_update, False, dash.no_update, dash.no_update, dash.no_update
 
-    response = requests.get(
-        f"{SPLASH_URL}/events", params={"page[offset]": 0, "page[limit]": 1000}
-    )
-    event_ids = response.json()
+    if changed_id == "event-load-more.n_clicks":
+        options_limit += EVENT_OPTIONS_PAGE_SIZE
+    else:
+        options_limit = EVENT_OPTIONS_PAGE_SIZE
 
     # Present the tagging event options with their corresponding tagger id and runtime
-    temp = []
-    for tagging_event in event_ids:
-        tagger_id = tagging_event["tagger_id"]
-        utc_tagging_event_time = tagging_event["run_time"]
-        tagging_event_time = datetime.strptime(
-            utc_tagging_event_time, "%Y-%m-%dT%H:%M:%S.%f"
-        )
-        tagging_event_time = (
-            tagging_event_time.replace(tzinfo=timezone.utc)
-            .astimezone(tz=None)
-            .strftime("%d-%m-%Y %H:%M:%S")
-        )
-        temp.append(
-            (
-                tagging_event_time,
-                {
-                    "label": f"Tagger ID: {tagger_id}, modified: {tagging_event_time}",
-                    "value": tagging_event["uid"],
-                },
-            )
-        )
-
-    # Sort temp by time in descending order and extract the dictionaries
-    options = [item[1] for item in sorted(temp, key=lambda x: x[0], reverse=True)]
-
-    return options, True
+    events = filter_tagging_events(
+        get_tagging_events(), tagger_id, start_date, end_date
+    )
+    options = [
+        {"label": event["label"], "value": event["uid"]}
+        for event in events[:options_limit]
+    ]
+    load_more_text = f"Load more ({len(options)} of {len(events)})"
+    is_open = dash.no_update if changed_id != "button-load-splash.n_clicks" else True
+    return (
+        options,
+        is_open,
+        options_limit,
+        load_more_text,
+        len(options) == len(events),
+    )
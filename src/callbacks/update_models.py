@@ -2,7 +2,7 @@ import dash
 from dash import Input, Output, callback
 
 from src.app_layout import DATA_DIR, USER
-from src.utils.model_utils import get_trained_models_list
+from src.utils.model_utils import get_trained_models
 
 
 @callback(
@@ -26,20 +26,20 @@ def update_trained_model_list(
         prob_model_list:                List of trained models in mlcoach
         similarity_model_list:          List of trained models in data clinic and mlcoach
     """
+    # Refresh buttons query the compute API, tab switches are served from the cached listing
+    changed_id = dash.callback_context.triggered[-1]["prop_id"]
+    refresh = changed_id != "tab-group.value"
+    correct_path = DATA_DIR != "/app/work/data"
     if tab_value == "probability":
-        prob_models = get_trained_models_list(
-            USER, "mlcoach", False, DATA_DIR != "/app/work/data"
+        prob_models = get_trained_models(
+            USER, ["mlcoach"], False, correct_path, refresh
         )
         similarity_models = dash.no_update
     elif tab_value == "similarity":
         prob_models = dash.no_update
-        data_clinic_models = get_trained_models_list(
-            USER, "data_clinic", True, DATA_DIR != "/app/work/data"
+        similarity_models = get_trained_models(
+            USER, ["data_clinic", "mlcoach"], True, correct_path, refresh
         )
-        ml_coach_models = get_trained_models_list(
-            USER, "mlcoach", True, DATA_DIR != "/app/work/data"
-        )
-        similarity_models = data_clinic_models + ml_coach_models
     else:
         return dash.no_update, dash.no_update
     return prob_models, similarity_models
@@ -1,28 +1,47 @@
-import plotly.express as px
+import uuid
+
 from dash import dcc, html
+from plotly.colors import qualitative
 
 from src.utils.compression_utils import compress_dict
 
 
-def browser_cache(mlcoach_url, data_clinic_url):
+def browser_cache(mlcoach_url, data_clinic_url, autosave_interval=0):
     browser_cache = html.Div(
         id="no-display",
         children=[
             dcc.Store(
                 id="labels-dict",
-                data=compress_dict({"labels_dict": {}, "labels_list": []}),
+                data=compress_dict(
+                    {
+                        "labels_dict": {},
+                        "labels_list": [],
+                        "session_id": uuid.uuid4().hex,
+                    }
+                ),
             ),
             dcc.Store(id="image-order", data=[]),
             dcc.Store(id="del-label", data=-1),
             dcc.Store(id="dummy1", data=0),
             dcc.Store(id="previous-tab", data=["init"]),
-            dcc.Store(id="color-cycle", data=px.colors.qualitative.Light24),
+            dcc.Store(id="color-cycle", data=qualitative.Light24),
             dcc.Store(id="mlcoach-url", data=mlcoach_url),
             dcc.Store(id="data-clinic-url", data=data_clinic_url),
             dcc.Store(
                 id="label-dict-per-page",
                 data={},
             ),
+            dcc.Interval(id="thumbnail-poll", interval=250, disabled=True),
+            dcc.Store(id="label-ops-buffer", data={"seq": 0, "operations": []}),
+            dcc.Store(id="label-ops-batch", data=None),
+            dcc.Store(id="label-ops-ack", data=0),
+            dcc.Interval(id="label-ops-flush", interval=150),
+            dcc.Store(id="splash-sync", data=None),
+            dcc.Interval(
+                id="autosave-interval",
+                interval=max(autosave_interval, 1) * 1000,
+                disabled=autosave_interval <= 0,
+            ),
         ],
     )
     return browser_cache
@@ -16,9 +16,34 @@ def store_options():
             dbc.Modal(
                 [
                     dbc.ModalHeader(dbc.ModalTitle("Labeling versions")),
-                    dbc.ModalBody(dcc.Dropdown(id="event-id")),
+                    dbc.ModalBody(
+                        [
+                            dbc.Input(
+                                id="event-tagger-filter",
+                                type="text",
+                                placeholder="Filter by tagger ID",
+                                debounce=True,
+                                style={"margin-bottom": "8px"},
+                            ),
+                            dcc.DatePickerRange(
+                                id="event-date-filter",
+                                clearable=True,
+                                display_format="DD-MM-YYYY",
+                                style={"margin-bottom": "8px"},
+                            ),
+                            dcc.Dropdown(id="event-id"),
+                            dcc.Store(id="event-options-limit", data=0),
+                        ]
+                    ),
                     dbc.ModalFooter(
                         [
+                            dbc.Button(
+                                "Load more",
+                                id="event-load-more",
+                                color="secondary",
+                                outline=True,
+                                n_clicks=0,
+                            ),
                             dbc.Button(
                                 "LOAD",
                                 id="confirm-load-splash",
@@ -26,7 +51,7 @@ def store_options():
                                 outline=False,
                                 className="ms-auto",
                                 n_clicks=0,
-                            )
+                            ),
                         ]
                     ),
                 ],
@@ -48,6 +73,12 @@ def store_options():
                         [
                             dbc.Label("Entry tagger ID:"),
                             dbc.Input(id="tagger-id", type="text"),
+                            dbc.Checkbox(
+                                id="save-splash-incremental",
+                                label="Only save the changes since the last save",
+                                value=False,
+                                style={"margin-top": "8px"},
+                            ),
                         ]
                     ),
                     dbc.ModalFooter(
@@ -74,6 +105,32 @@ def store_options():
                 size="sm",
                 style={"width": "100%", "margin-bottom": "4px"},
             ),
+            dbc.Button(
+                "Download Labels as HDF5",
+                id="button-save-hdf5",
+                outline="True",
+                color="primary",
+                size="sm",
+                style={"width": "100%", "margin-bottom": "4px"},
+            ),
+            dbc.Button(
+                "Download Labels as Training Shards",
+                id="button-save-shards",
+                outline="True",
+                color="primary",
+                size="sm",
+                style={"width": "100%"},
+            ),
+            dbc.RadioItems(
+                id="shard-format",
+                options=[
+                    {"label": "TAR", "value": "tar"},
+                    {"label": "NPZ", "value": "npz"},
+                ],
+                value="tar",
+                inline=True,
+                style={"font-size": "small", "margin-bottom": "4px"},
+            ),
             dbc.Button(
                 "Download Labels as Table",
                 id="button-save-table",
@@ -82,7 +139,17 @@ def store_options():
                 size="sm",
                 style={"width": "100%"},
             ),
-            dcc.Download(id="download-out"),
+            dbc.RadioItems(
+                id="table-format",
+                options=[
+                    {"label": "CSV", "value": "csv"},
+                    {"label": "Parquet", "value": "parquet"},
+                ],
+                value="csv",
+                inline=True,
+                style={"font-size": "small"},
+            ),
+            dcc.Store(id="download-url", data=None),
             dbc.Modal(
                 [
                     dbc.ModalBody(id="storage-body-modal"),
@@ -96,6 +163,15 @@ def store_options():
                 [
                     dbc.ModalHeader(dbc.ModalTitle(id="store-progress-title")),
                     dbc.ModalBody(dbc.Progress(id="store-progress")),
+                    dbc.ModalFooter(
+                        dbc.Button(
+                            "CANCEL",
+                            id="cancel-store-progress",
+                            color="secondary",
+                            outline=True,
+                            className="ms-auto",
+                        )
+                    ),
                 ],
                 id="modal-store-progress",
                 is_open=False,
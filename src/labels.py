@@ -1,33 +1,159 @@
+import io
 import itertools
+import json
 import logging
 import os
-import shutil
+import tarfile
 import tempfile
+import uuid
+import zipfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from functools import partial
-from pathlib import Path
 
 import numpy as np
-import pandas as pd
 import requests
 from requests.adapters import Retry
 
 from src.app_layout import SPLASH_URL
+from src.utils.data_project_utils import get_num_imgs
+from src.utils.model_utils import load_model_output
+from src.utils.splash_utils import (
+    clear_sync_state,
+    clear_tagging_events,
+    clear_upload_checkpoint,
+    get_sync_state,
+    get_upload_checkpoint,
+    get_upload_key,
+    store_upload_checkpoint,
+    update_sync_state,
+)
 
 logging.basicConfig(encoding="utf-8", level=logging.INFO)
 
+# splash-ml requests: search page size, datasets per bulk POST, tags per concurrent PATCH
+# batch and number of concurrent requests
+SPLASH_PAGE_SIZE = 1000
+SPLASH_CHUNK_SIZE = 500
+SPLASH_PATCH_CHUNK_SIZE = 50
+SPLASH_WORKERS = 16
+# Seconds to wait for a splash-ml response
+SPLASH_TIMEOUT = 60
+
+# Number of labels per chunk of the table export
+TABLE_CHUNK_SIZE = 100_000
+# Number of images read at once by the zip export
+EXPORT_CHUNK_SIZE = 64
+# Sharded export: images per shard, shards written at once and default subsets
+EXPORT_SHARD_SIZE = 1000
+EXPORT_SHARD_WORKERS = 4
+EXPORT_SPLITS = {"train": 0.8, "val": 0.1, "test": 0.1}
+
+
+class StreamBuffer(io.RawIOBase):
+    """
+    Write-only, non-seekable buffer that hands over its content in pieces, such that files are
+    streamed as they are written
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self.buffer.extend(content)
+        self.position += len(content)
+        return len(content)
+
+    def tell(self):
+        return self.position
+
+    def pop(self):
+        content = bytes(self.buffer)
+        self.buffer.clear()
+        return content
+
 
 class Labels:
-    def __init__(self, labels_dict, labels_list, num_imgs_per_label=None) -> None:
+    def __init__(
+        self,
+        labels_dict,
+        labels_list,
+        num_imgs_per_label=None,
+        revision=0,
+        session_id=None,
+    ) -> None:
         self.labels_dict = labels_dict
         self.labels_list = labels_list
         if num_imgs_per_label is None:
             self.num_imgs_per_label = self.get_num_imgs_per_label()
         else:
             self.num_imgs_per_label = num_imgs_per_label
+        # The images changed since the last sync with splash-ml are tracked server-side for the
+        # labels of a browser session, the browser only keeps the revision of the labels
+        self.revision = revision
+        self.session_id = session_id
+        pass
+
+    def _mark_dirty(self, indices):
+        """
+        Records the images that changed since the last sync with splash-ml
+        Args:
+            indices:        List of indexes of the changed images
+        """
+        self.revision += 1
+        if self.session_id is None:
+            return
+        changes = {str(index): self.revision for index in indices}
+        update_sync_state(self.session_id, lambda state: state["dirty"].update(changes))
         pass
 
+    def mark_synced(self, event_id, revision, sync_time, created):
+        """
+        Records a successful sync with splash-ml, such that the images that changed up to the
+        synced revision are no longer dirty
+        Args:
+            event_id:       Tagging event of the sync
+            revision:       Revision of the labels when the sync started
+            sync_time:      Time of the sync
+            created:        [Bool] The tagging event was created by this session
+        """
+        if self.session_id is None:
+            return
+
+        def update(state):
+            state["dirty"] = {
+                index: change
+                for index, change in state["dirty"].items()
+                if change > revision
+            }
+            state.update(
+                event_id=event_id, revision=revision, time=sync_time, created=created
+            )
+
+        update_sync_state(self.session_id, update)
+        pass
+
+    def get_changes(self):
+        """
+        Retrieves the images changed since the last save to a tagging event created by this
+        session. Loaded tagging events belong to other taggers and are never saved into
+        Returns:
+            indices:        List of indexes of the changed images, None if this session has not
+                            saved to splash-ml
+        """
+        state = get_sync_state(self.session_id)
+        return list(state["dirty"]) if state["created"] else None
+
+    def get_sync_watermark(self):
+        state = get_sync_state(self.session_id)
+        return {"revision": state["revision"], "time": state["time"]}
+
     def init_labels(self, labels_list=None):
         """
         Initializes the labels dictionary
@@ -38,6 +164,10 @@ class Labels:
         if labels_list:
             self.labels_list = labels_list
         self.labels_dict = {}
+        # The sync state belongs to the previous labels
+        if self.session_id is not None:
+            clear_sync_state(self.session_id)
+            self.session_id = uuid.uuid4().hex
         self.num_imgs_per_label = self.get_num_imgs_per_label()
         pass
 
@@ -69,6 +199,9 @@ class Labels:
         elif remove_label is not None:
             remove_index = self.labels_list.index(remove_label)
             self.labels_list.remove(remove_label)
+            self._mark_dirty(
+                [k for k, v in self.labels_dict.items() if remove_index in v]
+            )
 
             new_labels_dict = {}
             for key, values in self.labels_dict.items():
@@ -92,11 +225,21 @@ class Labels:
         elif rename_label is not None and new_name is not None:
             mod_indx = self.labels_list.index(rename_label)
             self.labels_list[mod_indx] = new_name
+            self._mark_dirty([k for k, v in self.labels_dict.items() if mod_indx in v])
         pass
 
     def _get_labeled_indices(self):
         return [int(k) for k, v in self.labels_dict.items() if v != []]
 
+    def _get_single_labels(self):
+        """
+        Retrieves the label of each labeled image
+        Returns:
+            labeled:                List of (index, label index) per labeled image
+        """
+        # TODO: Add support for multiple labels per image
+        return [(int(k), v[0]) for k, v in self.labels_dict.items() if len(v) > 0]
+
     def assign_labels(self, label, indices_to_label, overwrite=True):
         """
         Assign labels in dictionary with or without overwriting existing labels
@@ -110,15 +253,16 @@ class Labels:
         if not overwrite:
             labeled_indices = self._get_labeled_indices()
             indices_to_label = list((set(indices_to_label) - set(labeled_indices)))
+        self._mark_dirty(indices_to_label)
         for index in indices_to_label:
             current_labels = self.labels_dict.get(str(index), [])
             if current_labels:
                 self.num_imgs_per_label[str(current_labels[0])] -= 1
             if label is None:
-                self.labels_dict[index] = []
+                self.labels_dict[str(index)] = []
             else:
                 label_index = self.labels_list.index(label)
-                self.labels_dict[index] = [label_index]
+                self.labels_dict[str(index)] = [label_index]
                 self.num_imgs_per_label[str(label_index)] += 1
         pass
 
@@ -131,7 +275,7 @@ class Labels:
             probability_label:      Label to be assigned across the data set
             threshold:              Probability threshold to assign labels
         """
-        df_prob = pd.read_parquet(probability_model)
+        df_prob = load_model_output(probability_model, "probability")
         indices = np.where(df_prob[probability_label] > threshold / 100)[0].tolist()
         self.assign_labels(probability_label, indices, overwrite=False)
         pass
@@ -152,237 +296,835 @@ class Labels:
         self.assign_labels(label, indexes_to_label)
         pass
 
-    def _get_splash_dataset(self, project_id):
+    def batch_labeling(self, operations):
         """
-        Retrieve the current data set of interest from splash-ml with their labels
+        Manual labeling process where an ordered batch of operations is applied in one pass
         Args:
-            project_id:     Data project_id
-        """
-        uri_list = list(self.labels_dict.keys())
-        url = f"{SPLASH_URL}/datasets/search"
-        params = {"page[offset]": 0, "page[limit]": len(uri_list)}
-        data = {"uris": uri_list, "project": project_id}
-        status = requests.post(url, params=params, json=data)
-        if status.status_code != 200:
-            logging.error(
-                f"Data set was not retrieved from splash-ml due to {status.status_code}: \
-                          {status.json()}"
-            )
-        return status.json()
+            operations:     List of operations, e.g. [{"seq": 1, "label": "label1", "indices": [0, 5]}],
+                            where a None label unlabels the images
+        """
+        for operation in sorted(operations, key=lambda op: op["seq"]):
+            label = operation["label"]
+            if label is not None and label not in self.labels_list:
+                logging.warning(
+                    f"Labeling operation {operation['seq']} skipped, {label} no longer exists"
+                )
+                continue
+            self.assign_labels(label, operation["indices"])
+        pass
+
+    def _search_splash_event(self, splash_session, project_id, event_id, set_progress):
+        """
+        Retrieve the splash-ml datasets tagged within a tagging event. The search pages are
+        requested concurrently, in waves of one page per worker, until the last page is reached
+        Args:
+            splash_session:     Requests session
+            project_id:         Data project_id
+            event_id:           Tagging event id
+            set_progress:       Progress callback, receives the number of datasets retrieved
+        Returns:
+            datasets:           List of splash-ml datasets
+        """
+        search = partial(
+            self._search_splash_page,
+            splash_session,
+            {"project": project_id, "event_id": event_id},
+        )
+        datasets = []
+        offset = 0
+        with ThreadPoolExecutor(max_workers=SPLASH_WORKERS) as executor:
+            while True:
+                offsets = range(
+                    offset,
+                    offset + SPLASH_WORKERS * SPLASH_PAGE_SIZE,
+                    SPLASH_PAGE_SIZE,
+                )
+                pages = list(executor.map(search, offsets))
+                for page in pages:
+                    datasets.extend(page)
+                set_progress(len(datasets))
+                if any(len(page) < SPLASH_PAGE_SIZE for page in pages):
+                    return datasets
+                offset += SPLASH_WORKERS * SPLASH_PAGE_SIZE
 
-    def load_splash_labels(self, data_project, event_id, set_progress):
+    def load_splash_labels(self, data_project, event_id, set_progress, uri_index=None):
         """
         Query labels from splash-ml
         Args:
-            project_id:     Data project_id
-            event_id:      [str] Event id
+            data_project:   Data project
+            event_id:       [str] Event id
             set_progress:   [dbc.Progress] Progress bar
+            uri_index:      Dictionary of URI: index of the data project, built from the data
+                            project if not provided
         """
-        project_id = data_project.project_id
-        datasets = self._get_splash_dataset(project_id)
-        self.init_labels()  # resets dict and label before loading data
-        len_dataset = len(datasets)
-        for indx, dataset in enumerate(datasets):
+        num_imgs = max(get_num_imgs(data_project), 1)
+        datasets = self._search_splash_event(
+            self._get_splash_session(),
+            data_project.project_id,
+            event_id,
+            lambda num_datasets: set_progress(min(num_datasets / num_imgs, 1) * 80),
+        )
+        if uri_index is None:
+            uris = data_project.read_datasets(
+                list(range(get_num_imgs(data_project))), just_uri=True
+            )
+            uri_index = {uri: index for index, uri in enumerate(uris)}
+        set_progress(90)
+
+        # Group the labeled images per label
+        indices_per_label = {}
+        for dataset in datasets:
+            index = uri_index.get(dataset["uri"])
+            if index is None:
+                continue
+            # One label per image, as in _get_single_labels
             for tag in dataset["tags"]:
                 if tag["event_id"] == event_id:
-                    label = tag["name"]
-                    if label not in self.labels_list:
-                        self.update_labels_list(add_label=label)
-                    index = data_project.get_index(dataset["uri"])
-                    self.assign_labels(label, [index])
-            set_progress(indx / len_dataset * 100)
+                    indices_per_label.setdefault(tag["name"], []).append(index)
+                    break
+
+        self.init_labels()  # resets dict and label before loading data
+        for label, indices in indices_per_label.items():
+            if label not in self.labels_list:
+                self.update_labels_list(add_label=label)
+            self.assign_labels(label, indices)
+        self.mark_synced(event_id, self.revision, str(datetime.utcnow()), created=False)
+        set_progress(100)
         pass
 
-    def save_to_splash(self, tagger_id, data_project, set_progress):
-        """
-        Save labels to splash-ml.
-        Args:
-            tagger_id:      [str] Tagger id
-            datasets:       [list of dict] Data Project
-            project_id:     Data project_id
-            set_progress:   [dbc.Progress] Progress bar
-        Returns:
-            Request status
-        """
+    @staticmethod
+    def _get_splash_session():
         splash_session = requests.Session()
+        # Tag updates replace the tags of the event, so they are retried as well
         retries = Retry(
-            total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504]
+            total=5,
+            backoff_factor=0.1,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"PATCH"},
         )
         adapter = requests.adapters.HTTPAdapter(
-            max_retries=retries, pool_connections=100, pool_maxsize=100
+            max_retries=retries,
+            pool_connections=SPLASH_WORKERS,
+            pool_maxsize=SPLASH_WORKERS,
         )
         splash_session.mount("http://", adapter)
         splash_session.mount("https://", adapter)
-        # Request new tagging event
-        project_id = data_project.project_id
-        event_status = splash_session.post(
-            f"{SPLASH_URL}/events",
-            json={"tagger_id": tagger_id, "run_time": str(datetime.utcnow())},
-        ).json()
-        event_id = event_status["uid"]
-
-        # Define partial function to save one dataset to splash
-        partial_save_one_dataset_to_splash = partial(
-            self._save_one_dataset_to_splash,
-            labels_list=self.labels_list,
-            project_id=project_id,
-            event_id=event_id,
-            splash_session=splash_session,
+        return splash_session
+
+    @staticmethod
+    def _search_splash_page(splash_session, query, offset):
+        response = splash_session.post(
+            f"{SPLASH_URL}/datasets/search",
+            params={"page[offset]": offset, "page[limit]": SPLASH_PAGE_SIZE},
+            json=query,
+            timeout=SPLASH_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _search_splash_datasets(splash_session, project_id, uris):
+        """
+        Retrieve the splash-ml datasets of a list of URIs in paged search calls
+        Args:
+            splash_session:     Requests session
+            project_id:         Data project_id
+            uris:               List of URIs
+        Returns:
+            datasets:           Dictionary of URI: splash-ml dataset
+        """
+        datasets = {}
+        offset = 0
+        while True:
+            page = Labels._search_splash_page(
+                splash_session, {"uris": uris, "project": project_id}, offset
+            )
+            for dataset in page:
+                datasets[dataset["uri"]] = dataset
+            if len(page) < SPLASH_PAGE_SIZE:
+                return datasets
+            offset += SPLASH_PAGE_SIZE
+
+    @staticmethod
+    def _post_splash_datasets(splash_session, new_datasets):
+        response = splash_session.post(
+            f"{SPLASH_URL}/datasets", json=new_datasets, timeout=SPLASH_TIMEOUT
         )
+        if response.status_code != 200:
+            logging.error(f"Error: {response.text}.")
+            return (
+                f"{len(new_datasets)} new data sets ended with status "
+                f"{response.status_code}."
+            )
+        return None
+
+    @staticmethod
+    def _patch_splash_tags(splash_session, patches):
+        """
+        Update the tags of existing splash-ml datasets. splash-ml has no bulk tag endpoint, so
+        one PATCH request is sent per dataset
+        Args:
+            splash_session:     Requests session
+            patches:            List of (URI, dataset uid, tags to add, tag uids to remove)
+        Returns:
+            status:             Error message, None if all the tags were updated
+        """
+        errors = []
+        for uri, dataset_uid, add_tags, remove_tags in patches:
+            response = splash_session.patch(
+                f"{SPLASH_URL}/datasets/{dataset_uid}/tags",
+                json={"add_tags": add_tags, "remove_tags": remove_tags},
+                timeout=SPLASH_TIMEOUT,
+            )
+            if response.status_code != 200:
+                logging.error(f"Error: {response.text}.")
+                errors.append(
+                    f"Data set: {uri} ended with status {response.status_code}."
+                )
+        return " ".join(errors) if errors else None
+
+    @staticmethod
+    def _get_tag_changes(dataset, label, event_id):
+        """
+        Define the tag changes of an existing splash-ml dataset, replacing the tags of the
+        tagging event such that repeated saves do not create duplicate tags
+        Args:
+            dataset:        splash-ml dataset
+            label:          Label of the dataset, None if unlabeled
+            event_id:       Tagging event id
+        Returns:
+            add_tags:       Tags to add
+            remove_tags:    Tag uids to remove
+        """
+        event_tags = [
+            tag for tag in dataset.get("tags", []) if tag["event_id"] == event_id
+        ]
+        if label is None:
+            return [], [tag["uid"] for tag in event_tags]
+        if [tag["name"] for tag in event_tags] == [str(label)]:
+            # The dataset is already tagged
+            return [], []
+        add_tags = [{"name": str(label), "event_id": event_id}]
+        return add_tags, [tag["uid"] for tag in event_tags]
+
+    def save_to_splash(self, tagger_id, data_project, set_progress, incremental=False):
+        """
+        Save labels to splash-ml in bulk: the existing datasets are resolved in paged search
+        calls, new datasets are created in chunked POST requests and the tags of existing
+        datasets are updated concurrently. Progress is reported per chunk, and completed chunks
+        are recorded in a checkpoint, such that retrying a failed save resumes it within the
+        same tagging event. If the save is successful, the labels are marked as synced
+        Args:
+            tagger_id:      [str] Tagger id
+            data_project:   Data Project
+            set_progress:   [dbc.Progress] Progress bar
+            incremental:    If True and this session saved to splash-ml before, only the images
+                            that changed since then are saved, into the tagging event of that
+                            save. Otherwise, all the labels are saved into a new tagging event
+        Returns:
+            Request status per chunk, None if the chunk was saved
+        """
+        splash_session = self._get_splash_session()
+        project_id = data_project.project_id
+        revision = self.revision
+        sync_state = get_sync_state(self.session_id)
+        if incremental and sync_state["created"]:
+            event_id = sync_state["event_id"]
+            indices = list(sync_state["dirty"])
+        else:
+            event_id = None
+            indices = self._get_labeled_indices()
 
-        indexes = self.labels_dict.keys()
-        indexes = list(map(int, indexes))
-        uri_list = data_project.read_datasets(indexes, just_uri=True)
+        single_labels = dict(self._get_single_labels())
+        labels = [
+            (
+                self.labels_list[single_labels[int(index)]]
+                if int(index) in single_labels
+                else None
+            )
+            for index in indices
+        ]
+        if len(indices) > 0:
+            uri_list = data_project.read_datasets(
+                list(map(int, indices)), just_uri=True
+            )
+        else:
+            uri_list = []
+        uri_chunks = [
+            uri_list[i : i + SPLASH_CHUNK_SIZE]
+            for i in range(0, len(uri_list), SPLASH_CHUNK_SIZE)
+        ]
+        label_chunks = [
+            labels[i : i + SPLASH_CHUNK_SIZE]
+            for i in range(0, len(labels), SPLASH_CHUNK_SIZE)
+        ]
 
-        # Save all datasets to splash
-        with ThreadPoolExecutor() as executor:
-            # Start all the tasks
-            futures = {
-                executor.submit(partial_save_one_dataset_to_splash, uri, labels)
-                for uri, labels in zip(uri_list, self.labels_dict.values())
+        # Resume the checkpoint of a previous attempt of this save
+        upload_key = get_upload_key(project_id, tagger_id, event_id, uri_list, labels)
+        checkpoint = get_upload_checkpoint(upload_key) or {}
+        if event_id is None:
+            event_id = checkpoint.get("event_id")
+        if event_id is None:
+            # Request new tagging event
+            response = splash_session.post(
+                f"{SPLASH_URL}/events",
+                json={"tagger_id": tagger_id, "run_time": str(datetime.utcnow())},
+                timeout=SPLASH_TIMEOUT,
+            )
+            response.raise_for_status()
+            event_id = response.json()["uid"]
+            clear_tagging_events()
+        completed = set(checkpoint.get("completed", []))
+        store_upload_checkpoint(
+            upload_key, {"event_id": event_id, "completed": sorted(completed)}
+        )
+        pending = [i for i in range(len(uri_chunks)) if i not in completed]
+        if len(completed) > 0:
+            logging.info(
+                f"Resuming upload to event {event_id}, {len(completed)} of "
+                f"{len(uri_chunks)} chunks were completed"
+            )
+
+        statuses = []
+        with ThreadPoolExecutor(max_workers=SPLASH_WORKERS) as executor:
+            # Resolve the existing datasets
+            searches = {
+                executor.submit(
+                    self._search_splash_datasets,
+                    splash_session,
+                    project_id,
+                    uri_chunks[chunk],
+                ): chunk
+                for chunk in pending
             }
+            existing = {}
+            for i, future in enumerate(as_completed(searches), 1):
+                try:
+                    existing[searches[future]] = future.result()
+                except requests.RequestException as e:
+                    logging.error(f"Error: {e}.")
+                    statuses.append(f"Chunk {searches[future]} search failed: {e}.")
+                set_progress(i / len(searches) * 50)
 
-            statuses = []
+            # Group the new datasets and the tag updates of the existing datasets per chunk
+            futures = {}
+            remaining = {}
+            for chunk, datasets in existing.items():
+                new_datasets = []
+                patches = []
+                for uri, label in zip(uri_chunks[chunk], label_chunks[chunk]):
+                    if uri in datasets:
+                        add_tags, remove_tags = self._get_tag_changes(
+                            datasets[uri], label, event_id
+                        )
+                        if add_tags or remove_tags:
+                            patches.append(
+                                (uri, datasets[uri]["uid"], add_tags, remove_tags)
+                            )
+                    elif label is not None:
+                        new_datasets.append(
+                            {
+                                "uri": uri,
+                                "type": "tiled" if "http" in uri else "file",
+                                "project": project_id,
+                                "tags": [{"name": str(label), "event_id": event_id}],
+                            }
+                        )
+                requests_args = []
+                if new_datasets:
+                    requests_args.append((self._post_splash_datasets, new_datasets))
+                for j in range(0, len(patches), SPLASH_PATCH_CHUNK_SIZE):
+                    requests_args.append(
+                        (
+                            self._patch_splash_tags,
+                            patches[j : j + SPLASH_PATCH_CHUNK_SIZE],
+                        )
+                    )
+                if len(requests_args) == 0:
+                    completed.add(chunk)
+                remaining[chunk] = len(requests_args)
+                for request_fn, request_data in requests_args:
+                    future = executor.submit(request_fn, splash_session, request_data)
+                    futures[future] = chunk
+
+            # Record the chunks whose requests succeeded
+            failed = set()
             for i, future in enumerate(as_completed(futures), 1):
-                status = future.result()
+                chunk = futures[future]
+                try:
+                    status = future.result()
+                except requests.RequestException as e:
+                    logging.error(f"Error: {e}.")
+                    status = f"Chunk {chunk} failed: {e}."
                 statuses.append(status)
-                set_progress(i / len(futures) * 100)
+                if status is not None:
+                    failed.add(chunk)
+                remaining[chunk] -= 1
+                if remaining[chunk] == 0 and chunk not in failed:
+                    completed.add(chunk)
+                    store_upload_checkpoint(
+                        upload_key,
+                        {"event_id": event_id, "completed": sorted(completed)},
+                    )
+                set_progress(50 + i / len(futures) * 50)
+
+        if len(completed) == len(uri_chunks):
+            clear_upload_checkpoint(upload_key)
+            self.mark_synced(event_id, revision, str(datetime.utcnow()), created=True)
+        else:
+            store_upload_checkpoint(
+                upload_key, {"event_id": event_id, "completed": sorted(completed)}
+            )
         return statuses
 
-    @staticmethod
-    def _save_one_dataset_to_splash(
-        uri,
-        label_index,
-        labels_list,
-        project_id,
-        event_id,
-        splash_session,
-    ):
-        if len(label_index) > 0:
-            label = labels_list[label_index[0]]
-            # TODO: Add support for multiple labels per image
-
-            # Check if dataset already exists in splash
-            splash_dataset = splash_session.get(
-                f"{SPLASH_URL}/datasets",
-                params={"project": project_id, "uris": [uri]},
-            ).json()
-
-            # If dataset exists, add tag to dataset
-            if len(splash_dataset) > 0:
-                dataset_uid = splash_dataset[0]["uid"]
-                tag = {"name": str(label), "event_id": event_id}
-                data = {"add_tags": [tag]}
-                response = splash_session.patch(
-                    f"{SPLASH_URL}/datasets/{dataset_uid}/tags", json=data
+    def stream_table(self, data_project, set_progress=None, table_format="csv"):
+        """
+        Stream the labels as a table in chunks. The URIs of each chunk are resolved in one bulk
+        call and the table is built column-wise
+        Args:
+            data_project:   Data project
+            set_progress:   [dbc.Progress] Progress bar, updated once per chunk
+            table_format:   csv, with the columns uri and label, or parquet, with the columns
+                            uri, label_index and label
+        Returns:
+            Generator of the table content
+        """
+        import pandas as pd
+
+        labeled = self._get_single_labels()
+        indices, label_indices = np.array(labeled, dtype=np.int64).reshape(-1, 2).T
+        label_names = np.array(self.labels_list, dtype=object)
+
+        table_stream = StreamBuffer()
+        writer = None
+        for start in range(0, max(len(indices), 1), TABLE_CHUNK_SIZE):
+            chunk_indices = indices[start : start + TABLE_CHUNK_SIZE]
+            chunk_labels = label_indices[start : start + TABLE_CHUNK_SIZE]
+            uris = []
+            if len(chunk_indices) > 0:
+                uris = data_project.read_datasets(chunk_indices.tolist(), just_uri=True)
+            if table_format == "parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.table(
+                    {
+                        "uri": pa.array(uris, type=pa.string()),
+                        "label_index": pa.array(chunk_labels, type=pa.int64()),
+                        "label": pa.array(
+                            label_names[chunk_labels].tolist(), type=pa.string()
+                        ),
+                    }
                 )
-            # If dataset does not exist, create new dataset
+                if writer is None:
+                    writer = pq.ParquetWriter(table_stream, table.schema)
+                writer.write_table(table)
             else:
-                new_dataset = {
-                    "uri": uri,
-                    "type": "tiled" if "http" in uri else "file",
-                    "project": project_id,
-                }
-                new_dataset["tags"] = [{"name": str(label), "event_id": event_id}]
-                response = splash_session.post(
-                    f"{SPLASH_URL}/datasets", json=[new_dataset]
+                pd.DataFrame({"uri": uris, "label": label_names[chunk_labels]}).to_csv(
+                    table_stream, header=start == 0, index=False
                 )
+            yield table_stream.pop()
+            if set_progress is not None:
+                set_progress(
+                    min(start + TABLE_CHUNK_SIZE, len(indices))
+                    / max(len(indices), 1)
+                    * 100
+                )
+        if writer is not None:
+            writer.close()
+            yield table_stream.pop()
 
-            status = None
-            if response.status_code != 200:
-                logging.error(f"{status} Error: {response.json()}.")
-                status = f"Data set: {uri} with label {label} ended with status {response.status_code}."
-            return status
-        else:
-            return None
-
-    def save_to_table(self, data_project, set_progress):
+    def save_to_table(self, data_project, set_progress, table_format="csv"):
         """
         Save labels to a table
         Args:
             data_project:   Data project
             set_progress:   [dbc.Progress] Progress bar
+            table_format:   csv or parquet, see stream_table
         Returns:
-            Table with labels
-        """
-        labels_table = pd.DataFrame(columns=["uri", "label"])
-        num_labeled = len(self.labels_dict)
-        for index, labels in self.labels_dict.items():
-            if len(labels) > 0:
-                label = self.labels_list[labels[0]]
-                uri = data_project.read_datasets([int(index)], just_uri=True)[0]
-                new_row = pd.DataFrame({"uri": [uri], "label": [label]})
-                labels_table = pd.concat([labels_table, new_row], ignore_index=True)
-            set_progress(len(labels_table) / num_labeled * 100)
+            Path to the table
+        """
+        return self._save_stream(
+            self.stream_table(data_project, set_progress, table_format), table_format
+        )
 
+    @staticmethod
+    def _save_stream(stream, suffix):
         # Create a temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_file_name = temp_file.name
-        temp_file.close()
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f".{suffix}")
+        try:
+            with temp_file:
+                for content in stream:
+                    temp_file.write(content)
+        except BaseException:
+            # Failed or cancelled exports leave no file behind
+            os.remove(temp_file.name)
+            raise
+        return temp_file.name
+
+    @staticmethod
+    def _encode_image(image):
+        """
+        Encode an image as a TIFF file at its original bit depth. The image data is compressed
+        here, such that the compression runs in the thread pool rather than in the zip writer
+        Args:
+            image:          PIL image
+        Returns:
+            TIFF file content
+        """
+        buffer = io.BytesIO()
+        image.save(buffer, format="TIFF", compression="tiff_adobe_deflate")
+        return buffer.getvalue()
+
+    @staticmethod
+    def _get_archive_name(label, uri, used_names):
+        """
+        Define the path of an image within the zip archive, in the folder of its label and
+        named after its URI. Repeated names get a numeric suffix
+        Args:
+            label:          Label of the image
+            uri:            URI of the image
+            used_names:     Set of the paths already in the archive, updated in place
+        Returns:
+            Path of the image within the archive
+        """
+        base_name = uri.rstrip("/").split("/")[-1].split(".")[0]
+        archive_name = f"{label}/{base_name}.tif"
+        i = 0  # check duplicate uri and save under different name if needed
+        while archive_name in used_names:
+            archive_name = f"{label}/{base_name}_{i}.tif"
+            i += 1
+        used_names.add(archive_name)
+        return archive_name
 
-        # Save the DataFrame to the temporary file as CSV
-        labels_table.to_csv(temp_file_name, index=False)
+    def stream_zip(self, data_project, set_progress=None):
+        """
+        Stream a zip archive of the labeled images. The images are read in chunks, encoded in a
+        thread pool and written straight into the archive, such that the memory usage does not
+        grow with the number of images
+        Args:
+            data_project:   Data project
+            set_progress:   [dbc.Progress] Progress bar, updated once per chunk
+        Returns:
+            Generator of the archive content
+        """
+        labeled = self._get_single_labels()
 
-        return temp_file_name
+        archive_stream = StreamBuffer()
+        used_names = set()
+        with zipfile.ZipFile(archive_stream, "w", zipfile.ZIP_STORED) as archive:
+            with ThreadPoolExecutor() as executor:
+                for start in range(0, len(labeled), EXPORT_CHUNK_SIZE):
+                    chunk = labeled[start : start + EXPORT_CHUNK_SIZE]
+                    imgs, uris = data_project.read_datasets(
+                        [index for index, _ in chunk],
+                        export="pillow",
+                        resize=False,
+                    )
+                    contents = executor.map(self._encode_image, imgs)
+                    for (_, label_index), uri, content in zip(chunk, uris, contents):
+                        archive_name = self._get_archive_name(
+                            self.labels_list[label_index], uri, used_names
+                        )
+                        archive.writestr(archive_name, content)
+                    del imgs
+                    yield archive_stream.pop()
+                    if set_progress is not None:
+                        set_progress(
+                            min(start + EXPORT_CHUNK_SIZE, len(labeled))
+                            / len(labeled)
+                            * 100
+                        )
+        yield archive_stream.pop()
 
     def save_to_directory(self, data_project, set_progress):
         """
         Zips images with labels to be downloaded
+        Args:
+            data_project:   Data project
+            set_progress:   [dbc.Progress] Progress bar
+        Returns:
+            Path to the zip archive
         """
-        with tempfile.TemporaryDirectory() as temp_dir:
-            data_path = os.path.join(temp_dir, "downloaded_images")
-
-            # Get the system's temporary directory
-            tmp_dir = tempfile.gettempdir()
-
-            # create a folder per label
-            for label_key in self.labels_list:
-                label_index = self.labels_list.index(label_key)
-                if self.num_imgs_per_label[str(label_index)] > 0:
-                    label_dir = data_path / Path(label_key)
-                    label_dir.mkdir(parents=True, exist_ok=True)
-
-            # save images to the corresponding label folder
-            indexes = self.labels_dict.keys()
-            imgs, uris = data_project.read_datasets(
-                list(map(int, indexes)),
-                export="pillow",
-                resize=False,
-            )
+        return self._save_stream(self.stream_zip(data_project, set_progress), "zip")
 
-            with ThreadPoolExecutor() as executor:
-                futures = []
-                for index, (_, label_index) in enumerate(self.labels_dict.items()):
-                    if len(label_index) > 0:
-                        save_image = partial(
-                            self._save_image,
-                            data_path,
-                            self.labels_list[label_index[0]],
-                            imgs[index],
-                            uris[index],
+    def save_to_hdf5(self, data_project, set_progress):
+        """
+        Save the labeled images to a NeXus-style HDF5 file with a chunked, compressed dataset of
+        frames. The images are read in chunks and appended to the file as they are read, such
+        that the memory usage does not grow with the number of images. The file contains:
+            entry/data/images:          Frames, one HDF5 chunk per frame
+            entry/data/label_index:     Index of the label of each frame in label_names
+            entry/data/uris:            Source URI of each frame
+            entry/label_names:          Names of the labels
+        Args:
+            data_project:   Data project
+            set_progress:   [dbc.Progress] Progress bar, updated once per chunk
+        Returns:
+            Path to the HDF5 file
+        """
+        import h5py
+
+        labeled = self._get_single_labels()
+        # The shape of the images dataset is given by the labeled images
+        if len(labeled) == 0:
+            raise ValueError("There are no labeled images to export")
+
+        # Create a temporary file
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".h5")
+        hdf5_path = temp_file.name
+        temp_file.close()
+
+        try:
+            string_dtype = h5py.string_dtype()
+            with h5py.File(hdf5_path, "w") as f:
+                entry = f.create_group("entry")
+                entry.attrs["NX_class"] = "NXentry"
+                entry.create_dataset(
+                    "label_names", data=self.labels_list, dtype=string_dtype
+                )
+                data = entry.create_group("data")
+                data.attrs["NX_class"] = "NXdata"
+                data.attrs["signal"] = "images"
+                data.create_dataset(
+                    "label_index",
+                    data=np.array([label for _, label in labeled], dtype=np.int64),
+                )
+                uris = data.create_dataset(
+                    "uris", shape=(len(labeled),), dtype=string_dtype
+                )
+                images = None
+                for start in range(0, len(labeled), EXPORT_CHUNK_SIZE):
+                    chunk = labeled[start : start + EXPORT_CHUNK_SIZE]
+                    imgs, chunk_uris = data_project.read_datasets(
+                        [index for index, _ in chunk],
+                        export="pillow",
+                        resize=False,
+                    )
+                    frames = np.stack([np.asarray(img) for img in imgs])
+                    if images is None:
+                        images = data.create_dataset(
+                            "images",
+                            shape=(len(labeled),) + frames.shape[1:],
+                            dtype=frames.dtype,
+                            chunks=(1,) + frames.shape[1:],
+                            compression="gzip",
+                            shuffle=True,
                         )
-                        # Submit the function to the executor
-                        futures.append(executor.submit(save_image))
+                    if frames.shape[1:] != images.shape[1:]:
+                        raise ValueError(
+                            f"Images of shape {frames.shape[1:]} cannot be exported along "
+                            f"images of shape {images.shape[1:]}"
+                        )
+                    images[start : start + len(chunk)] = frames
+                    uris[start : start + len(chunk)] = chunk_uris
+                    del imgs, frames
+                    set_progress(
+                        min(start + EXPORT_CHUNK_SIZE, len(labeled))
+                        / len(labeled)
+                        * 100
+                    )
+        except BaseException:
+            # Failed or cancelled exports leave no file behind
+            os.remove(hdf5_path)
+            raise
+        return hdf5_path
 
-                # Print the progress
-                for i, future in enumerate(as_completed(futures), 1):
-                    set_progress(i / len(futures) * 100)
+    def get_stratified_splits(self, fractions=EXPORT_SPLITS, seed=0):
+        """
+        Split the labeled images into subsets with the same proportion of each label
+        Args:
+            fractions:      Dictionary of subset name: fraction of the labeled images, e.g.
+                            {"train": 0.8, "val": 0.1, "test": 0.1}
+            seed:           Seed of the random assignment and order of the images
+        Returns:
+            Dictionary of subset name: list of (index, label index) in random order
+        """
+        rng = np.random.default_rng(seed)
+        indices_per_label = {}
+        for index, label_index in self._get_single_labels():
+            indices_per_label.setdefault(label_index, []).append(index)
 
-            archive_path = os.path.join(tmp_dir, "results")
-            shutil.make_archive(archive_path, "zip", data_path)
-        return archive_path
+        names = list(fractions)
+        cumulative = np.cumsum([fractions[name] for name in names])
+        splits = {name: [] for name in names}
+        for label_index, indices in indices_per_label.items():
+            num_imgs = len(indices)
+            bounds = [0] + [int(round(num_imgs * c)) for c in cumulative]
+            bounds[-1] = num_imgs
+            indices = rng.permutation(indices)
+            for name, start, end in zip(names, bounds[:-1], bounds[1:]):
+                splits[name].extend((int(i), label_index) for i in indices[start:end])
+        for name in names:
+            order = rng.permutation(len(splits[name]))
+            splits[name] = [splits[name][i] for i in order]
+        return splits
 
-    @staticmethod
-    def _save_image(data_path, label, image, uri):
-        label_dir = f"{data_path}/{label}"
-        base_name = uri.split("/")[-1].split(".")[0]
-        filename = Path(f"{base_name}.tif")
-        i = 0  # check duplicate uri and save under different name if needed
-        while filename.exists():
-            filename = Path(f"{label_dir}/{base_name}_{i}.tif")
-            i += 1
-        image.save(f"{label_dir}/{filename}")
-        pass
+    def _write_shard(self, data_project, samples, shard_path, shard_format):
+        """
+        Write one shard of labeled images. The images are read in chunks and appended to the
+        shard as they are read
+        Args:
+            data_project:   Data project
+            samples:        List of (index, label index)
+            shard_path:     Path of the shard
+            shard_format:   tar, with a TIFF image and a JSON label per sample, or npz, with
+                            the arrays images, label_index and uris
+        Returns:
+            Path of the shard
+        """
+        if shard_format == "npz":
+            with zipfile.ZipFile(shard_path, "w", zipfile.ZIP_DEFLATED) as shard:
+                with shard.open("label_index.npy", "w") as label_index:
+                    np.lib.format.write_array(
+                        label_index,
+                        np.array([label for _, label in samples], dtype=np.int64),
+                    )
+                all_uris = []
+                with shard.open("images.npy", "w", force_zip64=True) as images:
+                    for start in range(0, len(samples), EXPORT_CHUNK_SIZE):
+                        chunk = samples[start : start + EXPORT_CHUNK_SIZE]
+                        imgs, uris = data_project.read_datasets(
+                            [index for index, _ in chunk],
+                            export="pillow",
+                            resize=False,
+                        )
+                        frames = np.stack([np.asarray(img) for img in imgs])
+                        if start == 0:
+                            header = np.lib.format.header_data_from_array_1_0(frames)
+                            header["shape"] = (len(samples),) + frames.shape[1:]
+                            np.lib.format.write_array_header_1_0(images, header)
+                            dtype = frames.dtype
+                        elif frames.shape[1:] != header["shape"][1:]:
+                            raise ValueError(
+                                f"Images of shape {frames.shape[1:]} cannot be exported "
+                                f"along images of shape {header['shape'][1:]}"
+                            )
+                        elif frames.dtype != dtype:
+                            raise ValueError(
+                                f"Images of type {frames.dtype} cannot be exported "
+                                f"along images of type {dtype}"
+                            )
+                        images.write(np.ascontiguousarray(frames).tobytes())
+                        all_uris.extend(uris)
+                with shard.open("uris.npy", "w") as uris:
+                    np.lib.format.write_array(uris, np.array(all_uris, dtype=str))
+            return shard_path
+
+        with tarfile.open(shard_path, "w") as shard:
+            for start in range(0, len(samples), EXPORT_CHUNK_SIZE):
+                chunk = samples[start : start + EXPORT_CHUNK_SIZE]
+                imgs, uris = data_project.read_datasets(
+                    [index for index, _ in chunk], export="pillow", resize=False
+                )
+                for (index, label_index), img, uri in zip(chunk, imgs, uris):
+                    key = f"{index:09d}"
+                    sample = json.dumps(
+                        {
+                            "label": self.labels_list[label_index],
+                            "label_index": label_index,
+                            "uri": uri,
+                        }
+                    ).encode("utf-8")
+                    for name, content in (
+                        (f"{key}.tif", self._encode_image(img)),
+                        (f"{key}.json", sample),
+                    ):
+                        info = tarfile.TarInfo(name)
+                        info.size = len(content)
+                        shard.addfile(info, io.BytesIO(content))
+        return shard_path
+
+    def save_to_shards(
+        self,
+        data_project,
+        set_progress,
+        shard_format="tar",
+        shard_size=EXPORT_SHARD_SIZE,
+        fractions=EXPORT_SPLITS,
+        seed=0,
+    ):
+        """
+        Save the labeled images as a training-ready dataset of fixed-size shards, split into
+        stratified subsets, such that they can be streamed with sequential reads. Shards are
+        written in parallel and collected into a zip archive with a manifest.json that lists
+        the label names and the shards of each subset
+        Args:
+            data_project:   Data project
+            set_progress:   [dbc.Progress] Progress bar, updated once per shard
+            shard_format:   tar or npz, see _write_shard
+            shard_size:     Maximum number of images per shard
+            fractions:      Dictionary of subset name: fraction of the labeled images
+            seed:           Seed of the split
+        Returns:
+            Path to the zip archive
+        """
+        splits = self.get_stratified_splits(fractions, seed)
+        manifest = {
+            "format": shard_format,
+            "label_names": self.labels_list,
+            "seed": seed,
+            "splits": {},
+        }
+        shards = []
+        for name, samples in splits.items():
+            num_per_label = np.bincount(
+                [label for _, label in samples], minlength=len(self.labels_list)
+            )
+            manifest["splits"][name] = {
+                "fraction": fractions[name],
+                "num_samples": len(samples),
+                "num_samples_per_label": dict(
+                    zip(self.labels_list, num_per_label.tolist())
+                ),
+                "shards": [],
+            }
+            for i, start in enumerate(range(0, len(samples), shard_size)):
+                shard_samples = samples[start : start + shard_size]
+                shard_name = f"{name}/{name}-{i:05d}.{shard_format}"
+                manifest["splits"][name]["shards"].append(
+                    {"path": shard_name, "num_samples": len(shard_samples)}
+                )
+                shards.append((shard_name, shard_samples))
+
+        # Create a temporary file
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
+        archive_path = temp_file.name
+        temp_file.close()
+
+        try:
+            with (
+                tempfile.TemporaryDirectory() as temp_dir,
+                zipfile.ZipFile(archive_path, "w", zipfile.ZIP_STORED) as archive,
+                ThreadPoolExecutor(max_workers=EXPORT_SHARD_WORKERS) as executor,
+            ):
+                futures = {
+                    executor.submit(
+                        self._write_shard,
+                        data_project,
+                        shard_samples,
+                        os.path.join(temp_dir, f"shard-{i}.{shard_format}"),
+                        shard_format,
+                    ): shard_name
+                    for i, (shard_name, shard_samples) in enumerate(shards)
+                }
+                try:
+                    for i, future in enumerate(as_completed(futures), 1):
+                        shard_path = future.result()
+                        archive.write(shard_path, futures[future])
+                        os.remove(shard_path)
+                        set_progress(i / len(futures) * 100)
+                except BaseException:
+                    # The shards that have not started are not written
+                    for future in futures:
+                        future.cancel()
+                    raise
+                archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        except BaseException:
+            # Failed or cancelled exports leave no file behind
+            os.remove(archive_path)
+            raise
+        return archive_path
 
     def get_labeling_progress(self, total_num_images):
         """
@@ -2,10 +2,9 @@ import logging
 from itertools import chain
 
 import numpy as np
-import pandas as pd
-from scipy.spatial.distance import cdist
 
 from src.labels import Labels
+from src.utils.model_utils import load_model_output
 
 logging.basicConfig(encoding="utf-8", level=logging.INFO)
 
@@ -37,8 +36,11 @@ class Query(Labels):
         return list(unlabeled_indices)
 
     def similarity_search(self, model_path, index_interest):
+        # scipy is only needed here, it is imported on first use
+        from scipy.spatial.distance import cdist
+
         unlabeled_indx = self.hide_labeled()  # Get list of indexes of unlabeled images
-        df_model = pd.read_parquet(model_path, engine="pyarrow")
+        df_model = load_model_output(model_path, "similarity")
         dist = cdist(
             df_model.iloc[index_interest, :].values[np.newaxis, :],
             df_model.loc[unlabeled_indx].values,
@@ -0,0 +1,28 @@
+import sys
+
+import diskcache
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    # Tests use their own caches instead of the ones of the app in CACHE_DIR. The cache layer
+    # imports the app, such that tests of modules without it are collected without the app
+    cache_utils = sys.modules.get("src.utils.cache_utils")
+    if cache_utils is None:
+        return
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(
+        cache_utils,
+        "caches",
+        {
+            namespace: cache_utils.create_cache(namespace, size_limit_mb)
+            for namespace, size_limit_mb in cache_utils.CACHE_SIZE_LIMITS_MB.items()
+        },
+    )
+    for name in ("leases", "checkpoints", "sync_states", "downloads"):
+        monkeypatch.setattr(
+            cache_utils,
+            name,
+            diskcache.Cache(str(tmp_path / "cache" / name), eviction_policy="none"),
+        )
@@ -0,0 +1,71 @@
+import os
+
+from src.utils import blob_utils
+from src.utils.blob_utils import BlobStore
+
+
+def test_blob_store_reads_evicts_and_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_utils, "COMPACT_MIN_BYTES", 0)
+    store = BlobStore(str(tmp_path), size_limit=1000)
+    store.set_many([(f"key-{i}", f"value-{i:03d}") for i in range(10)])
+    store.set("bytes", b"\x00\x01")
+    store.set("empty", "")
+    assert store.get_many(["key-3", "missing", "bytes", "empty"]) == [
+        "value-003",
+        None,
+        b"\x00\x01",
+        "",
+    ]
+
+    # Replaced values are read from their last write, expired values are missing
+    store.set("key-3", "replaced")
+    store.set("failed", "", expire=-1)
+    assert store.get("key-3") == "replaced"
+    assert store.get("failed", default="missing") == "missing"
+
+    # Another process reads the values written so far through its own index connection
+    other = BlobStore(str(tmp_path), size_limit=1000)
+    assert other.get("key-9") == "value-009"
+
+    # The least recently stored values are evicted once the live values exceed the limit
+    store.set("large", "x" * 950)
+    assert store.get("key-0") is None
+    assert store.get("large") == "x" * 950
+    assert len(store) < 12
+
+    # Unused bytes are reclaimed into a new generation of the data file
+    store.compact()
+    assert store.volume() <= 1000
+    assert other.get("large") == "x" * 950
+    assert os.listdir(tmp_path).count("blobs-0.dat") == 0
+
+
+def test_values_stored_during_compaction_are_kept(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path))
+    store.set_many([(f"key-{i}", f"value-{i}") for i in range(5)])
+    store.set("key-0", "replaced")
+    copy = BlobStore._copy
+
+    def copy_and_write(src, dst, rows, new_end):
+        if new_end == 0:
+            # Writes are not blocked while the values are copied
+            store.set("key-1", "written")
+            store.set("key-5", "added")
+            store.delete("key-2")
+        return copy(src, dst, rows, new_end)
+
+    monkeypatch.setattr(BlobStore, "_copy", staticmethod(copy_and_write))
+    assert store.compact()
+    assert store.get_many([f"key-{i}" for i in range(6)]) == [
+        "replaced",
+        "written",
+        None,
+        "value-3",
+        "value-4",
+        "added",
+    ]
+    assert "blobs-0.dat" not in os.listdir(tmp_path)
+    # Values replaced or removed during the copy are reclaimed by the next compaction
+    monkeypatch.setattr(BlobStore, "_copy", staticmethod(copy))
+    assert store.compact()
+    assert store.volume() == len("replacedwrittenvalue-3value-4added")
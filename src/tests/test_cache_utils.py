@@ -0,0 +1,25 @@
+import uuid
+
+from src.utils import cache_utils
+
+
+def test_get_or_compute_computes_once():
+    key = uuid.uuid4().hex
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [1, 2, 3]
+
+    assert cache_utils.get_or_compute("orders", key, compute) == [1, 2, 3]
+    assert cache_utils.get_or_compute("orders", key, compute) == [1, 2, 3]
+    assert len(calls) == 1
+
+
+def test_lease_is_exclusive():
+    key = uuid.uuid4().hex
+    token = cache_utils.acquire_lease("thumbnails", key)
+    assert token is not None
+    assert cache_utils.acquire_lease("thumbnails", key) is None
+    cache_utils.release_lease("thumbnails", key, token)
+    assert cache_utils.acquire_lease("thumbnails", key) is not None
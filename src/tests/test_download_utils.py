@@ -0,0 +1,23 @@
+import os
+
+import dash
+
+from src.utils.download_utils import init_downloads, register_file_download
+
+
+def test_file_download_is_served_once_and_removed(tmp_path):
+    app = dash.Dash(__name__)
+    app.layout = dash.html.Div()
+    init_downloads(app)
+    path = tmp_path / "labels.h5"
+    path.write_bytes(b"content")
+
+    url = register_file_download(app, "hdf5", str(path))
+    client = app.server.test_client()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == b"content"
+    assert "labels.h5" in response.headers["Content-Disposition"]
+    response.close()
+    assert not os.path.exists(path)
+    assert client.get(url).status_code == 404
@@ -0,0 +1,52 @@
+import base64
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.utils.image_utils import encode_image, window_array
+
+
+def decode(data_uri):
+    base64_data = data_uri.split(",", 1)[1]
+    return Image.open(io.BytesIO(base64.b64decode(base64_data)))
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.poisson(1000, (512, 256)).astype(np.uint16) * 50
+
+
+def test_window_array_16bit(frame):
+    windowed = window_array(frame, log=False, percentiles=[0, 100])
+    assert windowed.dtype == np.uint8
+    assert windowed.min() == 0
+    assert windowed.max() == 255
+
+
+def test_window_array_keeps_negative_values():
+    # Dark-subtracted frames are windowed over their full range without the log-transform
+    frame = np.array([[-100, 0], [50, 100]], dtype=np.int32)
+    windowed = window_array(frame, log=False, percentiles=[0, 100])
+    assert windowed[0, 0] == 0
+    assert windowed[0, 1] == 127
+    windowed = window_array(frame, log=True, percentiles=[0, 100])
+    assert windowed[0, 0] == windowed[0, 1] == 0
+
+
+@pytest.mark.parametrize("codec", ["png", "jpeg", "webp"])
+def test_encode_image_codec_and_size(frame, codec):
+    data_uri = encode_image(frame, codec=codec, size=200, log=True)
+    assert data_uri.startswith(f"data:image/{codec};base64,")
+    image = decode(data_uri)
+    assert image.size == (100, 200)
+
+
+def test_encode_image_byte_budget(frame):
+    unbounded = encode_image(frame, codec="jpeg", quality=95, size=200)
+    bounded = encode_image(
+        frame, codec="jpeg", quality=95, size=200, byte_budget=len(unbounded) // 4
+    )
+    assert len(bounded) < len(unbounded)
@@ -0,0 +1,59 @@
+import time
+
+import diskcache
+import pytest
+
+from src.utils.job_utils import PooledLongCallbackManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return PooledLongCallbackManager(diskcache.Cache(str(tmp_path)), max_workers=1)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_job_runs_in_pool(manager):
+    def double(set_progress, value):
+        set_progress(50)
+        return 2 * value
+
+    manager.register("double", double, True)
+    job = manager.call_job_fn("key", manager.func_registry["double"], [21], {})
+    assert wait_for(lambda: manager.result_ready("key"))
+    assert manager.get_result("key", job) == 42
+    assert wait_for(lambda: not manager.job_running(job))
+
+
+def test_job_is_cancelled_at_next_progress(manager):
+    def count(set_progress):
+        for i in range(500):
+            set_progress(i)
+            time.sleep(0.01)
+        return "done"
+
+    manager.register("count", count, True)
+    job = manager.call_job_fn("key", manager.func_registry["count"], [], {})
+    assert wait_for(lambda: manager.job_running(job))
+    manager.terminate_job(job)
+    assert not manager.job_running(job)
+    assert wait_for(lambda: not manager.local_jobs)
+    assert not manager.result_ready("key")
+    assert not manager.is_cancelled(job)
+
+
+def test_finished_job_leaves_no_cancel_state(manager):
+    def identity(value):
+        return value
+
+    manager.register("identity", identity, False)
+    job = manager.call_job_fn("key", manager.func_registry["identity"], [1], {})
+    assert wait_for(lambda: manager.result_ready("key"))
+    assert manager.get_result("key", job) == 1
+    assert wait_for(lambda: not manager.local_jobs)
+    assert not manager.is_cancelled(job)
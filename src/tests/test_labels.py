@@ -0,0 +1,158 @@
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src import labels as labels_module
+from src.labels import Labels
+from src.utils import cache_utils
+from src.utils.splash_utils import get_sync_state
+
+
+@pytest.fixture
+def labels():
+    return Labels(
+        labels_dict={}, labels_list=["label1", "label2"], session_id="session"
+    )
+
+
+def test_batch_labeling_applies_operations_in_order(labels):
+    operations = [
+        {"seq": 3, "label": None, "indices": [1]},
+        {"seq": 1, "label": "label1", "indices": [0, 1, 2]},
+        {"seq": 2, "label": "label2", "indices": [2]},
+    ]
+    labels.batch_labeling(operations)
+    assert labels.labels_dict == {"0": [0], "1": [], "2": [1]}
+    assert labels.num_imgs_per_label == {"0": 1, "1": 1}
+
+
+def test_batch_labeling_skips_deleted_labels(labels):
+    operations = [
+        {"seq": 1, "label": "deleted", "indices": [0]},
+        {"seq": 2, "label": "label2", "indices": [1]},
+    ]
+    labels.batch_labeling(operations)
+    assert labels.labels_dict == {"1": [1]}
+    assert labels.num_imgs_per_label == {"0": 0, "1": 1}
+
+
+def test_dirty_tracking_keeps_changes_after_the_synced_revision(labels):
+    labels.assign_labels("label1", [0, 1])
+    revision = labels.revision
+    labels.assign_labels("label2", [2])
+    labels.mark_synced("event", revision, "2024-01-01 00:00:00", created=True)
+    assert get_sync_state(labels.session_id)["dirty"] == {"2": revision + 1}
+    assert get_sync_state(labels.session_id)["event_id"] == "event"
+    assert labels.get_changes() == ["2"]
+
+    labels.update_labels_list(remove_label="label1")
+    assert set(labels.get_changes()) == {"0", "1", "2"}
+
+
+def test_labels_without_session_leave_no_sync_state():
+    labels = Labels(labels_dict={}, labels_list=["label1"])
+    labels.assign_labels("label1", [0])
+    labels.mark_synced("event", labels.revision, "2024-01-01 00:00:00", created=True)
+    assert labels.revision == 1
+    assert len(cache_utils.sync_states) == 0
+
+
+def test_load_splash_labels_assigns_labels_of_the_event(labels):
+    datasets = [
+        {"uri": "a", "tags": [{"name": "label3", "event_id": "event"}]},
+        {"uri": "b", "tags": [{"name": "label1", "event_id": "other"}]},
+        {"uri": "c", "tags": [{"name": "label1", "event_id": "event"}]},
+        {"uri": "unknown", "tags": [{"name": "label1", "event_id": "event"}]},
+    ]
+    uri_index = {"a": 0, "b": 1, "c": 2}
+    data_project = MagicMock(project_id="project")
+    with patch.object(Labels, "_search_splash_event", return_value=datasets):
+        labels.load_splash_labels(data_project, "event", MagicMock(), uri_index)
+    assert labels.labels_list == ["label1", "label2", "label3"]
+    assert labels.labels_dict == {"0": [2], "2": [0]}
+    assert get_sync_state(labels.session_id)["dirty"] == {}
+    assert get_sync_state(labels.session_id)["event_id"] == "event"
+    # Loaded tagging events are never saved into
+    assert labels.get_changes() is None
+
+
+def test_tag_changes_replace_the_tags_of_the_event():
+    dataset = {
+        "tags": [
+            {"uid": "1", "name": "label1", "event_id": "event"},
+            {"uid": "2", "name": "label2", "event_id": "other"},
+        ]
+    }
+    assert Labels._get_tag_changes(dataset, "label1", "event") == ([], [])
+    assert Labels._get_tag_changes(dataset, None, "event") == ([], ["1"])
+    assert Labels._get_tag_changes(dataset, "label2", "event") == (
+        [{"name": "label2", "event_id": "event"}],
+        ["1"],
+    )
+
+
+def test_archive_names_are_unique_per_label():
+    used_names = set()
+    names = [
+        Labels._get_archive_name(label, uri, used_names)
+        for label, uri in [
+            ("a", "file:///x/image.tif"),
+            ("b", "file:///y/image.tif"),
+            ("a", "file:///y/image.tif"),
+            ("a", "file:///z/image.tif"),
+        ]
+    ]
+    assert names == ["a/image.tif", "b/image.tif", "a/image_0.tif", "a/image_1.tif"]
+
+
+def test_stratified_splits_keep_label_proportions():
+    labels_dict = {str(i): [0] for i in range(100)}
+    labels_dict.update({str(i): [1] for i in range(100, 120)})
+    labels = Labels(labels_dict=labels_dict, labels_list=["label1", "label2"])
+    splits = labels.get_stratified_splits({"train": 0.8, "val": 0.1, "test": 0.1})
+    counts = {
+        name: [sum(label == i for _, label in samples) for i in range(2)]
+        for name, samples in splits.items()
+    }
+    assert counts == {"train": [80, 16], "val": [10, 2], "test": [10, 2]}
+    indices = [index for samples in splits.values() for index, _ in samples]
+    assert sorted(indices) == list(range(120))
+
+
+def test_failed_hdf5_export_removes_its_file(labels, tmp_path, monkeypatch):
+    export_dir = tmp_path / "exports"
+    export_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(export_dir))
+    labels.assign_labels("label1", [0, 1])
+    data_project = MagicMock()
+    data_project.read_datasets.side_effect = ValueError("unreadable")
+    with pytest.raises(ValueError):
+        labels.save_to_hdf5(data_project, MagicMock())
+    assert list(export_dir.iterdir()) == []
+
+
+def test_hdf5_export_without_labels_is_refused(labels, tmp_path, monkeypatch):
+    export_dir = tmp_path / "exports"
+    export_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(export_dir))
+    with pytest.raises(ValueError):
+        labels.save_to_hdf5(MagicMock(), MagicMock())
+    assert list(export_dir.iterdir()) == []
+
+
+def test_failed_shard_export_removes_its_archive(tmp_path, monkeypatch):
+    export_dir = tmp_path / "exports"
+    export_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(export_dir))
+    monkeypatch.setattr(labels_module, "EXPORT_CHUNK_SIZE", 1)
+    labels = Labels(labels_dict={"0": [0], "1": [0]}, labels_list=["label1"])
+    data_project = MagicMock()
+    data_project.read_datasets.side_effect = [
+        ([np.zeros((2, 2), dtype=np.uint8)], ["a"]),
+        ([np.zeros((2, 2), dtype=np.uint16)], ["b"]),
+    ]
+    with pytest.raises(ValueError, match="type"):
+        labels.save_to_shards(data_project, MagicMock(), "npz", fractions={"train": 1})
+    assert list(export_dir.iterdir()) == []
@@ -0,0 +1,13 @@
+import json
+from importlib import metadata
+
+from src.utils.mask_utils import get_pyfai_detectors
+
+
+def test_get_pyfai_detectors_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata, "version", lambda name: "2023.9.0")
+    cache_path = tmp_path / "mask_options.json"
+    cache_path.write_text(
+        json.dumps({"pyfai_version": "2023.9.0", "detectors": ["Pilatus1M"]})
+    )
+    assert get_pyfai_detectors(cache_path) == ["Pilatus1M"]
@@ -0,0 +1,22 @@
+import json
+import os
+import time
+
+from src.utils import metrics_utils
+
+
+def test_metrics_of_exited_processes_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_utils, "METRICS_DIR", str(tmp_path))
+    # The metrics of this process are not flushed
+    monkeypatch.setitem(metrics_utils.metrics_state, "pid", None)
+    series = [["cache_hits_total", [["cache", "thumbnails"]], "count", 3]]
+    for name in ("live", "exited"):
+        with open(tmp_path / f"{name}.json", "w") as f:
+            json.dump(series, f)
+    stale_time = time.time() - 2 * metrics_utils.METRICS_FILE_TIMEOUT
+    os.utime(tmp_path / "exited.json", (stale_time, stale_time))
+
+    metrics_text = metrics_utils.render_metrics()
+    assert 'labelmaker_cache_hits_total{cache="thumbnails"} 3' in metrics_text
+    assert not os.path.exists(tmp_path / "exited.json")
+    assert os.path.exists(tmp_path / "live.json")
@@ -13,7 +13,7 @@ def query():
     labels_list = []
     num_imgs_per_label = None
     return Query(
-        num_imgs=400000,
+        num_imgs=40000,
         labels_dict=labels_dict,
         labels_list=labels_list,
         num_imgs_per_label=num_imgs_per_label,
@@ -23,21 +23,23 @@ def query():
 def test_similarity_search(query):
     model_path = "dummy_model_path.parquet"
     index_interest = 10
-    indices = list(range(18))
 
     # Mock data
-    unlabeled_indx = list(range(100000))
-    data = np.random.rand(400000, 1000)
+    unlabeled_indx = list(range(10000))
+    data = np.random.rand(40000, 100)
     df_model = pd.DataFrame(data)
 
     # Setup mocks
     with patch.object(
         query, "hide_labeled", return_value=unlabeled_indx
     ) as mock_hide_labeled, patch(
-        "pandas.read_parquet", return_value=df_model
-    ) as mock_read_parquet:
-        result = query.similarity_search(model_path, index_interest, indices)
+        "src.query.load_model_output", return_value=df_model
+    ) as mock_load_model_output:
+        result = query.similarity_search(model_path, index_interest)
         # Assertions
         mock_hide_labeled.assert_called_once()
-        mock_read_parquet.assert_called_once_with(model_path, engine="pyarrow")
-        assert len(result) == len(indices)
+        mock_load_model_output.assert_called_once_with(model_path, "similarity")
+        assert len(result) == len(unlabeled_indx)
+        assert sorted(result) == unlabeled_indx
+        # The image of interest is unlabeled, so it is the most similar one
+        assert result[0] == index_interest
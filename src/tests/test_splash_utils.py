@@ -0,0 +1,37 @@
+from unittest.mock import MagicMock, patch
+
+from src.utils import splash_utils
+
+
+def make_event(uid, tagger_id, run_time):
+    return {"uid": uid, "tagger_id": tagger_id, "run_time": run_time}
+
+
+def test_tagging_events_are_paged_sorted_and_filtered():
+    pages = [
+        [
+            make_event(str(i), "alice", f"2024-01-01T00:00:{i:02d}.000000")
+            for i in (0, 1)
+        ],
+        [make_event("2", "Bob", "2024-03-01T00:00:00.000000")],
+    ]
+    responses = [MagicMock(json=MagicMock(return_value=page)) for page in pages]
+    with (
+        patch.object(splash_utils, "EVENTS_PAGE_SIZE", 2),
+        patch.object(splash_utils.requests, "get", side_effect=responses) as mock_get,
+    ):
+        splash_utils.clear_tagging_events()
+        events = splash_utils.get_tagging_events()
+        assert splash_utils.get_tagging_events() == events
+        splash_utils.clear_tagging_events()
+    assert mock_get.call_count == 2
+    assert all(
+        call.kwargs["timeout"] == splash_utils.EVENTS_REQUEST_TIMEOUT
+        for call in mock_get.call_args_list
+    )
+    assert [event["uid"] for event in events] == ["2", "1", "0"]
+
+    filtered = splash_utils.filter_tagging_events(events, tagger_id="bob")
+    assert [event["uid"] for event in filtered] == ["2"]
+    filtered = splash_utils.filter_tagging_events(events, end_date="2024-02-01")
+    assert [event["uid"] for event in filtered] == ["1", "0"]
@@ -0,0 +1,53 @@
+import h5py
+import numpy as np
+
+from src.utils.stack_utils import LocalDataProject, get_stack_project_dict
+
+
+def test_hdf5_stacks_are_read_by_page_and_by_image(tmp_path):
+    path = str(tmp_path / "stacks.h5")
+    rng = np.random.default_rng(0)
+    chunked = rng.integers(0, 2**16, (10, 8, 6), dtype=np.uint16)
+    contiguous = rng.integers(0, 2**8, (5, 8, 6), dtype=np.uint8)
+    with h5py.File(path, "w") as f:
+        f.create_dataset("entry/chunked", data=chunked, chunks=(4, 8, 6))
+        f.create_dataset("entry/contiguous", data=contiguous)
+
+    data_project = LocalDataProject.from_dict(get_stack_project_dict(path))
+    assert [dataset.uri for dataset in data_project.datasets] == [
+        "entry/chunked",
+        "entry/contiguous",
+    ]
+    assert data_project.datasets[-1].cumulative_data_count == 15
+    assert isinstance(data_project._arrays[1], np.memmap)
+
+    frames = list(chunked) + list(contiguous)
+    indices = [3, 4, 5, 9, 10, 14, 0]
+    imgs, uris = data_project.read_datasets(indices, export="numpy", resize=False)
+    for index, img in zip(indices, imgs):
+        np.testing.assert_array_equal(img, frames[index])
+    assert uris[-1] == f"{data_project.root_uri}/entry/chunked/0"
+    assert data_project.read_datasets([11], just_uri=True) == [
+        f"{data_project.root_uri}/entry/contiguous/1"
+    ]
+
+    for index in range(15):
+        imgs, _ = data_project.read_datasets([index], export="pillow", resize=False)
+        np.testing.assert_array_equal(np.asarray(imgs[0]), frames[index])
+    # Single images of the chunked stack are read in blocks of one chunk
+    assert sorted(data_project._blocks) == [(0, 0), (0, 1), (0, 2)]
+
+
+def test_resized_images_keep_their_bit_depth(tmp_path):
+    path = str(tmp_path / "stacks.h5")
+    frame = np.arange(64 * 32, dtype=np.uint16).reshape(64, 32) * 16
+    with h5py.File(path, "w") as f:
+        f.create_dataset("entry/data", data=frame[np.newaxis])
+
+    data_project = LocalDataProject.from_dict(
+        get_stack_project_dict(path), thumbnail_size=16
+    )
+    imgs, _ = data_project.read_datasets([0], export="pillow", resize=True)
+    img = np.asarray(imgs[0])
+    assert img.shape == (16, 8)
+    assert img.max() > 2**8
@@ -0,0 +1,406 @@
+import fcntl
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Maximum number of keys per index lookup of get_many
+LOOKUP_BATCH_SIZE = 500
+# The data file is compacted once its unused bytes exceed its live bytes and this size
+COMPACT_MIN_BYTES = 64 * 2**20
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    key TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    is_text INTEGER NOT NULL,
+    expire REAL
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('generation', 0), ('end', 0), ('live', 0);
+"""
+
+
+class BlobStore:
+    """
+    Packed store of small values (str or bytes): values are appended to a single data file and
+    located through a SQLite index, such that millions of entries take two files. Values are
+    read from a memory map of the data file with one indexed lookup per key. Writers of all the
+    processes are serialized by the index, and the least recently stored values are evicted
+    once the live values exceed the size limit. Unused bytes of replaced, evicted or expired
+    values are reclaimed by compaction into a new generation of the data file, in the
+    background of the process that wrote them
+    """
+
+    def __init__(self, directory, size_limit=2**30):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.size_limit = size_limit
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._compacting = False
+        self._pid = os.getpid()
+        self._connect().executescript(SCHEMA)
+        with self._transaction() as db:
+            generation = self._get_meta(db)[0]
+            open(self._data_path(generation), "ab").close()
+        # Data files left by an interrupted compaction, unless another process is compacting
+        with open(self._lock_path(), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            generation = self._get_meta(self._connect())[0]
+            for name in os.listdir(directory):
+                if name.startswith("blobs-") and name != self._data_name(generation):
+                    self._remove(os.path.join(directory, name))
+
+    @staticmethod
+    def _data_name(generation):
+        return f"blobs-{generation}.dat"
+
+    def _data_path(self, generation):
+        return os.path.join(self.directory, self._data_name(generation))
+
+    def _lock_path(self):
+        return os.path.join(self.directory, "compact.lock")
+
+    @staticmethod
+    def _remove(path):
+        # The file may have been removed by another process sharing the store
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _connect(self):
+        """
+        Connection of this thread to the index, reopened in forked processes
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+            with self._lock:
+                self._maps = {}
+                self._compacting = False
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(
+                os.path.join(self.directory, "index.sqlite"),
+                timeout=60,
+                isolation_level=None,
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction, exclusive across the threads and processes sharing the store
+        """
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _get_meta(db):
+        meta = dict(db.execute("SELECT name, value FROM meta"))
+        return meta["generation"], meta["end"], meta["live"]
+
+    @staticmethod
+    def _set_meta(db, generation, end, live):
+        db.executemany(
+            "UPDATE meta SET value = ? WHERE name = ?",
+            [(generation, "generation"), (end, "end"), (live, "live")],
+        )
+
+    def _get_map(self, generation, end):
+        """
+        Memory map of the data file of a generation, remapped once the file grows beyond it
+        """
+        with self._lock:
+            data_map = self._maps.get(generation)
+            if data_map is not None and len(data_map) >= end:
+                return data_map
+            with open(self._data_path(generation), "rb") as f:
+                data_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Maps of previous generations are released once no read holds them
+            self._maps = {generation: data_map}
+            return data_map
+
+    def _read(self, generation, offset, length, is_text):
+        if length == 0:
+            return "" if is_text else b""
+        data_map = self._get_map(generation, offset + length)
+        with memoryview(data_map) as view, view[offset : offset + length] as blob:
+            return str(blob, "utf-8") if is_text else bytes(blob)
+
+    def _lookup(self, keys):
+        """
+        Locate the values of the keys, along with the generation of the data file, in one read
+        of the index
+        """
+        db = self._connect()
+        db.execute("BEGIN")
+        try:
+            generation = db.execute(
+                "SELECT value FROM meta WHERE name = 'generation'"
+            ).fetchone()[0]
+            rows = db.execute(
+                "SELECT key, offset, length, is_text, expire FROM blobs "
+                f"WHERE key IN ({', '.join('?' * len(keys))})",
+                keys,
+            ).fetchall()
+        finally:
+            db.execute("COMMIT")
+        now = time.time()
+        return generation, {
+            row[0]: row[1:4] for row in rows if row[4] is None or row[4] > now
+        }
+
+    def get_many(self, keys, default=None):
+        """
+        Retrieve the values of multiple keys
+        Args:
+            keys:       List of keys
+            default:    Value returned for the keys that are not stored
+        Returns:
+            values:     List of values
+        """
+        values = []
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start : start + LOOKUP_BATCH_SIZE]
+            for attempt in range(2):
+                generation, located = self._lookup(batch)
+                try:
+                    values += [
+                        (
+                            self._read(generation, *located[key])
+                            if key in located
+                            else default
+                        )
+                        for key in batch
+                    ]
+                    break
+                except FileNotFoundError:
+                    # The data file was compacted between the lookup and the read
+                    if attempt == 1:
+                        raise
+        return values
+
+    def get(self, key, default=None):
+        return self.get_many([key], default=default)[0]
+
+    def set_many(self, items, expire=None):
+        """
+        Append multiple values to the data file and index them in one transaction
+        Args:
+            items:      List of (key, value) pairs
+            expire:     Seconds until the values expire, None to keep them until evicted
+        """
+        expire_time = time.time() + expire if expire is not None else None
+        blobs = []
+        for key, value in items:
+            if isinstance(value, str):
+                blobs.append((key, value.encode("utf-8"), 1))
+            elif isinstance(value, (bytes, bytearray, memoryview)):
+                blobs.append((key, bytes(value), 0))
+            else:
+                raise TypeError(f"Unsupported value type: {type(value).__name__}")
+        with self._transaction() as db:
+            generation, end, live = self._get_meta(db)
+            with open(self._data_path(generation), "ab") as f:
+                # Bytes beyond the indexed end were written by an interrupted write
+                f.truncate(end)
+                for key, data, is_text in blobs:
+                    replaced = db.execute(
+                        "SELECT length FROM blobs WHERE key = ?", (key,)
+                    ).fetchone()
+                    f.write(data)
+                    db.execute(
+                        "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                        (key, end, len(data), is_text, expire_time),
+                    )
+                    live += len(data) - (replaced[0] if replaced else 0)
+                    end += len(data)
+                # The values are on disk before they are indexed
+                f.flush()
+                os.fsync(f.fileno())
+            live = self._evict(db, live)
+            self._set_meta(db, generation, end, live)
+        if end - live > max(live, COMPACT_MIN_BYTES):
+            self._compact_in_background()
+
+    def set(self, key, value, expire=None):
+        self.set_many([(key, value)], expire=expire)
+
+    def delete(self, key):
+        with self._transaction() as db:
+            generation, end, live = self._get_meta(db)
+            deleted = db.execute(
+                "SELECT length FROM blobs WHERE key = ?", (key,)
+            ).fetchone()
+            if deleted:
+                db.execute("DELETE FROM blobs WHERE key = ?", (key,))
+                self._set_meta(db, generation, end, live - deleted[0])
+        return bool(deleted)
+
+    def _evict(self, db, live):
+        """
+        Remove the expired values, and then the least recently stored values until the live
+        values fit within the size limit
+        Returns:
+            live:       Number of bytes of the live values
+        """
+        now = time.time()
+        expired = db.execute(
+            "SELECT SUM(length) FROM blobs WHERE expire IS NOT NULL AND expire <= ?",
+            (now,),
+        ).fetchone()[0]
+        if expired is not None:
+            db.execute(
+                "DELETE FROM blobs WHERE expire IS NOT NULL AND expire <= ?", (now,)
+            )
+            live -= expired
+        while live > self.size_limit:
+            oldest = db.execute(
+                "SELECT rowid, length FROM blobs ORDER BY rowid LIMIT ?",
+                (LOOKUP_BATCH_SIZE,),
+            ).fetchall()
+            if not oldest:
+                break
+            for rowid, length in oldest:
+                live -= length
+                if live <= self.size_limit:
+                    break
+            db.execute("DELETE FROM blobs WHERE rowid <= ?", (rowid,))
+        return live
+
+    def _compact_in_background(self):
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def compact():
+            try:
+                self.compact(blocking=False)
+            except Exception as e:
+                logger.error(f"Compaction of {self.directory} failed: {e}")
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+        threading.Thread(target=compact, daemon=True).start()
+
+    def compact(self, blocking=True):
+        """
+        Copy the live values into a new generation of the data file, in the order they were
+        stored, and remove the previous data file. The values are copied without blocking the
+        writers, which are only blocked to copy the values stored meanwhile and switch to the
+        new generation. One process compacts the store at a time
+        Args:
+            blocking:       Wait for the compaction of another process, instead of skipping
+        Returns:
+            [Bool] The store was compacted
+        """
+        with open(self._lock_path(), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+            # The lock is released when the file is closed
+            db = self._connect()
+            db.execute("BEGIN")
+            try:
+                generation, end, _ = self._get_meta(db)
+                rows = db.execute(
+                    "SELECT rowid, offset, length FROM blobs "
+                    "WHERE expire IS NULL OR expire > ? ORDER BY rowid",
+                    (time.time(),),
+                ).fetchall()
+            finally:
+                db.execute("COMMIT")
+            # Temporary data files are removed along with the orphaned generations
+            temp_path = f"{self._data_path(generation + 1)}.{uuid.uuid4().hex}"
+            try:
+                with (
+                    open(self._data_path(generation), "rb") as src,
+                    open(temp_path, "wb") as dst,
+                ):
+                    offsets, new_end = self._copy(src, dst, rows, 0)
+                    with self._transaction() as db:
+                        if self._get_meta(db)[0] != generation:
+                            return False
+                        # Values stored since the copy started
+                        rows = db.execute(
+                            "SELECT rowid, offset, length FROM blobs "
+                            "WHERE offset >= ? ORDER BY rowid",
+                            (end,),
+                        ).fetchall()
+                        tail_offsets, new_end = self._copy(src, dst, rows, new_end)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                        # Values replaced or removed since the copy started keep their offset
+                        db.executemany(
+                            "UPDATE blobs SET offset = ? WHERE rowid = ? AND offset = ?",
+                            offsets + tail_offsets,
+                        )
+                        os.replace(temp_path, self._data_path(generation + 1))
+                        live = db.execute(
+                            "SELECT COALESCE(SUM(length), 0) FROM blobs"
+                        ).fetchone()[0]
+                        self._set_meta(db, generation + 1, new_end, live)
+            except FileNotFoundError:
+                # The data file was removed by another process
+                return False
+            finally:
+                self._remove(temp_path)
+        # Readers holding a map of the previous data file keep reading it until they close it
+        self._remove(self._data_path(generation))
+        return True
+
+    @staticmethod
+    def _copy(src, dst, rows, new_end):
+        """
+        Copy values from the data file to the new generation of the data file
+        Args:
+            src:            Data file
+            dst:            New generation of the data file
+            rows:           List of (rowid, offset, length) of the values
+            new_end:        Number of bytes already copied to the new generation
+        Returns:
+            offsets:        List of (new offset, rowid, offset) of the values
+            new_end:        Number of bytes copied to the new generation
+        """
+        offsets = []
+        for rowid, offset, length in rows:
+            src.seek(offset)
+            dst.write(src.read(length))
+            offsets.append((new_end, rowid, offset))
+            new_end += length
+        return offsets, new_end
+
+    def volume(self):
+        """
+        Number of bytes of the data file
+        """
+        return self._get_meta(self._connect())[1]
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
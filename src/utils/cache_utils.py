@@ -0,0 +1,214 @@
+import os
+import time
+import uuid
+
+import diskcache
+
+from src.app_layout import (
+    CACHE_DIR,
+    CACHE_EVICTION_POLICY,
+    CACHE_SIZE_LIMITS_MB,
+    THUMBNAIL_STORE,
+    logger,
+)
+from src.utils.blob_utils import BlobStore
+from src.utils.metrics_utils import record_cache_access, register_gauge
+
+# Computations are leased to one worker at a time, the lease expires if the worker dies
+LEASE_TIMEOUT = 60
+LEASE_POLL_INTERVAL = 0.05
+
+
+def create_cache(namespace, size_limit_mb):
+    """
+    This function creates the cache of a namespace. Thumbnails are packed into a single data
+    file with an index, such that millions of thumbnails do not take one file each
+    Args:
+        namespace:      Cache namespace
+        size_limit_mb:  Size limit in MB
+    Returns:
+        cache:          diskcache or packed store
+    """
+    if namespace == "thumbnails" and THUMBNAIL_STORE == "packed":
+        return BlobStore(
+            os.path.join(CACHE_DIR, "thumbnails-packed"),
+            size_limit=size_limit_mb * 2**20,
+        )
+    return diskcache.Cache(
+        os.path.join(CACHE_DIR, namespace),
+        size_limit=size_limit_mb * 2**20,
+        eviction_policy=CACHE_EVICTION_POLICY,
+    )
+
+
+# Namespaces are independent caches shared by all the gunicorn workers
+caches = {
+    namespace: create_cache(namespace, size_limit_mb)
+    for namespace, size_limit_mb in CACHE_SIZE_LIMITS_MB.items()
+}
+# Leases are kept apart, such that they are never evicted
+leases = diskcache.Cache(os.path.join(CACHE_DIR, "leases"), eviction_policy="none")
+# Upload checkpoints are kept apart as well, such that failed uploads can always be resumed
+checkpoints = diskcache.Cache(
+    os.path.join(CACHE_DIR, "checkpoints"), eviction_policy="none"
+)
+# Sync state of the labels of each browser session with splash-ml, never evicted either
+sync_states = diskcache.Cache(
+    os.path.join(CACHE_DIR, "sync_states"), eviction_policy="none"
+)
+# Exports waiting to be downloaded, shared with the worker that serves the download
+downloads = diskcache.Cache(
+    os.path.join(CACHE_DIR, "downloads"), eviction_policy="none"
+)
+
+
+def get(namespace, key, default=None):
+    """
+    This function retrieves a value from a cache namespace
+    Args:
+        namespace:      Cache namespace [thumbnails, orders, models, events]
+        key:            Cache key
+        default:        Value returned if the key is not cached
+    Returns:
+        value:          Cached value
+    """
+    value = caches[namespace].get(key, default=default)
+    hit = value is not default
+    record_cache_access(namespace, int(hit), int(not hit))
+    return value
+
+
+def get_many(namespace, keys):
+    """
+    This function retrieves multiple values from a cache namespace
+    Args:
+        namespace:      Cache namespace
+        keys:           List of cache keys
+    Returns:
+        values:         List of cached values, None if the key is not cached
+    """
+    cache = caches[namespace]
+    if isinstance(cache, BlobStore):
+        return cache.get_many(keys)
+    return [cache.get(key) for key in keys]
+
+
+def store(namespace, key, value, expire=None):
+    """
+    This function stores a value in a cache namespace
+    Args:
+        namespace:      Cache namespace
+        key:            Cache key
+        value:          Value to be stored
+        expire:         Seconds until the value expires, None to keep it until it is evicted
+    """
+    caches[namespace].set(key, value, expire=expire)
+
+
+def store_many(namespace, items, expire=None):
+    """
+    This function stores multiple values in a cache namespace in one transaction
+    Args:
+        namespace:      Cache namespace
+        items:          List of (key, value) pairs
+        expire:         Seconds until the values expire, None to keep them until they are evicted
+    """
+    cache = caches[namespace]
+    if isinstance(cache, BlobStore):
+        cache.set_many(items, expire=expire)
+    else:
+        with cache.transact():
+            for key, value in items:
+                cache.set(key, value, expire=expire)
+
+
+def delete(namespace, key):
+    """
+    This function removes a value from a cache namespace
+    Args:
+        namespace:      Cache namespace
+        key:            Cache key
+    """
+    caches[namespace].delete(key)
+
+
+def acquire_lease(namespace, key, timeout=LEASE_TIMEOUT):
+    """
+    This function acquires the lease to compute a value across workers, such that concurrent
+    requests of the same value do not compute it at once
+    Args:
+        namespace:      Cache namespace
+        key:            Cache key
+        timeout:        Seconds until the lease expires
+    Returns:
+        token:          Lease token, None if another request holds the lease
+    """
+    token = uuid.uuid4().hex
+    if leases.add((namespace, key), token, expire=timeout):
+        return token
+    return None
+
+
+def release_lease(namespace, key, token):
+    """
+    This function releases a lease, unless it expired and was acquired by another request
+    Args:
+        namespace:      Cache namespace
+        key:            Cache key
+        token:          Lease token
+    """
+    with leases.transact():
+        if leases.get((namespace, key)) == token:
+            leases.delete((namespace, key))
+
+
+def get_or_compute(namespace, key, compute, expire=None, timeout=LEASE_TIMEOUT):
+    """
+    This function retrieves a value from the cache, or computes it if missing. If another
+    request is already computing it, this request waits for its result instead
+    Args:
+        namespace:      Cache namespace
+        key:            Cache key
+        compute:        Function without arguments that computes the value
+        expire:         Seconds until the value expires, None to keep it until it is evicted
+        timeout:        Seconds to wait for the result of another request
+    Returns:
+        value:          Cached or computed value
+    """
+    missing = object()
+    value = get(namespace, key, default=missing)
+    if value is not missing:
+        return value
+    deadline = time.monotonic() + timeout
+    while True:
+        token = acquire_lease(namespace, key, timeout)
+        if token is not None:
+            try:
+                # The value may have been stored before the lease was acquired
+                value = caches[namespace].get(key, default=missing)
+                if value is not missing:
+                    return value
+                value = compute()
+                store(namespace, key, value, expire)
+                return value
+            finally:
+                release_lease(namespace, key, token)
+        time.sleep(LEASE_POLL_INTERVAL)
+        value = caches[namespace].get(key, default=missing)
+        if value is not missing:
+            return value
+        if time.monotonic() > deadline:
+            logger.warning(f"Timed out waiting for {namespace} {key}, computing it")
+            return compute()
+
+
+def collect_sizes():
+    return [({"cache": name}, cache.volume()) for name, cache in caches.items()]
+
+
+def collect_entries():
+    return [({"cache": name}, len(cache)) for name, cache in caches.items()]
+
+
+register_gauge("cache_size_bytes", collect_sizes)
+register_gauge("cache_entries", collect_entries)
@@ -0,0 +1,87 @@
+import os
+import threading
+from collections import OrderedDict
+
+from file_manager.data_project import DataProject
+
+from src.app_layout import THUMBNAIL_SIZE, TILED_KEY
+from src.utils import cache_utils
+from src.utils.render_utils import get_project_hash
+from src.utils.stack_utils import LocalDataProject, is_stack_project
+
+# Number of data projects kept per worker
+DATA_PROJECT_CACHE_SIZE = 8
+
+# Data projects of this worker, by project hash, in least recently used order
+data_projects = OrderedDict()
+data_projects_lock = threading.Lock()
+data_projects_pid = None
+
+
+def get_data_project(data_project_dict):
+    """
+    This function retrieves the data project of the given information. Data projects are kept
+    per worker, such that repeated callbacks reuse their datasets and the connections and
+    metadata of their data clients instead of rebuilding them. Local HDF5 and Zarr image stacks
+    are read without a Tiled server
+    Args:
+        data_project_dict:  Data project information
+    Returns:
+        data_project:       Data project
+    """
+    global data_projects_pid
+    project_hash = get_project_hash(data_project_dict)
+    with data_projects_lock:
+        if data_projects_pid != os.getpid():
+            # Clients inherited from the parent process are not shared with forked workers
+            data_projects.clear()
+            data_projects_pid = os.getpid()
+        data_project = data_projects.get(project_hash)
+        if data_project is not None:
+            data_projects.move_to_end(project_hash)
+            return data_project
+    if is_stack_project(data_project_dict):
+        data_project = LocalDataProject.from_dict(
+            data_project_dict, thumbnail_size=THUMBNAIL_SIZE
+        )
+    else:
+        data_project = DataProject.from_dict(data_project_dict, api_key=TILED_KEY)
+    with data_projects_lock:
+        data_projects[project_hash] = data_project
+        data_projects.move_to_end(project_hash)
+        while len(data_projects) > DATA_PROJECT_CACHE_SIZE:
+            data_projects.popitem(last=False)
+    return data_project
+
+
+def get_num_imgs(data_project):
+    """
+    This function retrieves the number of images in the data project
+    Args:
+        data_project:       Data project
+    Returns:
+        num_imgs:           Number of images
+    """
+    if len(data_project.datasets) == 0:
+        return 0
+    return data_project.datasets[-1].cumulative_data_count
+
+
+def get_uri_index(data_project, project_hash):
+    """
+    This function maps the URIs of the images in the data project to their indexes. The map is
+    built once per data project and shared across workers through the cache
+    Args:
+        data_project:       Data project
+        project_hash:       Hash of the data project
+    Returns:
+        uri_index:          Dictionary of URI: index
+    """
+
+    def compute():
+        uris = data_project.read_datasets(
+            list(range(get_num_imgs(data_project))), just_uri=True
+        )
+        return {uri: index for index, uri in enumerate(uris)}
+
+    return cache_utils.get_or_compute("orders", f"uri-index-{project_hash}", compute)
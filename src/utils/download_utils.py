@@ -0,0 +1,70 @@
+import os
+import uuid
+
+from flask import abort, send_file
+
+from src.utils import cache_utils
+
+# Download links expire after this number of seconds
+DOWNLOAD_TIMEOUT = 3600
+
+DOWNLOADS = {
+    "csv": ("labels.csv", "text/csv"),
+    "parquet": ("labels.parquet", "application/vnd.apache.parquet"),
+    "zip": ("files.zip", "application/zip"),
+    "hdf5": ("labels.h5", "application/x-hdf5"),
+    "shards": ("dataset.zip", "application/zip"),
+}
+
+
+def register_file_download(app, export_format, path):
+    """
+    This function registers an export written to a file to be served by the download route,
+    which removes the file once it is sent
+    Args:
+        app:                Dash app
+        export_format:      Export format, csv, parquet, zip, hdf5 or shards
+        path:               Path of the file
+    Returns:
+        url:                Download URL
+    """
+    token = uuid.uuid4().hex
+    cache_utils.downloads.set(
+        token, {"format": export_format, "path": path}, expire=DOWNLOAD_TIMEOUT
+    )
+    return app.get_relative_path(f"/download/{token}")
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def init_downloads(app):
+    """
+    This function exposes the exports registered by the long callbacks at /download/<token>,
+    such that finished files are read from disk as they are sent instead of going through the
+    callback results. Each token can be downloaded once
+    Args:
+        app:            Dash app
+    """
+    server = app.server
+
+    @server.route(f"{app.config.routes_pathname_prefix}download/<token>")
+    def download(token):
+        download = cache_utils.downloads.pop(token)
+        if download is None:
+            abort(404)
+        filename, mimetype = DOWNLOADS[download["format"]]
+        response = send_file(
+            download["path"],
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=filename,
+        )
+        # Passthrough responses skip the close callbacks
+        response.direct_passthrough = False
+        response.call_on_close(lambda: remove_file(download["path"]))
+        return response
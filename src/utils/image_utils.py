@@ -0,0 +1,149 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+CODEC_FORMATS = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+MIN_QUALITY = 20
+QUALITY_STEP = 15
+MIN_SIZE = 32
+
+
+def to_array(image):
+    """
+    This function converts an image to a numpy array keeping its original bit depth
+    Args:
+        image:          PIL image or numpy array
+    Returns:
+        image_array:    Numpy array
+    """
+    if isinstance(image, Image.Image) and image.mode == "P":
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+def resize_array(image_array, size):
+    """
+    This function downscales an image to fit within a square of the given size, preserving its
+    aspect ratio and bit depth
+    Args:
+        image_array:    Numpy array
+        size:           Target size in pixels of the largest dimension, None to skip resizing
+    Returns:
+        image_array:    Resized float32 numpy array
+    """
+    image_array = image_array.astype(np.float32, copy=False)
+    height, width = image_array.shape[:2]
+    if size is None or max(height, width) <= size:
+        return image_array
+    scale = size / max(height, width)
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if image_array.ndim == 2:
+        resized = Image.fromarray(image_array).resize(new_size, Image.BILINEAR)
+        return np.asarray(resized)
+    channels = [
+        np.asarray(
+            Image.fromarray(np.ascontiguousarray(image_array[..., c])).resize(
+                new_size, Image.BILINEAR
+            )
+        )
+        for c in range(image_array.shape[2])
+    ]
+    return np.stack(channels, axis=-1)
+
+
+def window_array(image_array, log=False, percentiles=None):
+    """
+    This function windows an image with an arbitrary bit depth to 8-bit, such that the
+    log-transform and the min-max percentiles are applied before quantization
+    Args:
+        image_array:    Numpy array
+        log:            Log toggle
+        percentiles:    Min-Max Percentile
+    Returns:
+        image_array:    uint8 numpy array
+    """
+    if percentiles is None:
+        percentiles = [0, 100]
+    image_array = np.nan_to_num(image_array.astype(np.float32, copy=False))
+    if log:
+        # The log-transform is only defined for non-negative values
+        image_array = np.log1p(np.clip(image_array, 0, None))
+    low, high = np.percentile(image_array, percentiles)
+    if high <= low:
+        return np.zeros(image_array.shape, dtype=np.uint8)
+    image_array = (image_array - low) * (255.0 / (high - low))
+    return np.clip(image_array, 0, 255).astype(np.uint8)
+
+
+def encode_array(image_array, codec="png", quality=85):
+    """
+    This function encodes an 8-bit image with the given codec
+    Args:
+        image_array:    uint8 numpy array
+        codec:          Image codec [png, jpeg, webp]
+        quality:        Quality of lossy codecs (1-100)
+    Returns:
+        image_bytes:    Encoded image
+    """
+    image = Image.fromarray(image_array)
+    buffer = io.BytesIO()
+    if codec == "png":
+        image.save(buffer, format="PNG", compress_level=1)
+    elif codec in CODEC_FORMATS:
+        image.save(buffer, format=CODEC_FORMATS[codec], quality=quality)
+    else:
+        raise ValueError(f"Unsupported image codec: {codec}")
+    return buffer.getvalue()
+
+
+def encode_image(
+    image,
+    codec="png",
+    quality=85,
+    size=None,
+    log=False,
+    percentiles=None,
+    byte_budget=None,
+):
+    """
+    This function windows, resizes and encodes an image as a data URI. If a byte budget is
+    given, the quality (lossy codecs) and then the size are reduced until the encoded image
+    fits within the budget
+    Args:
+        image:          PIL image or numpy array
+        codec:          Image codec [png, jpeg, webp]
+        quality:        Quality of lossy codecs (1-100)
+        size:           Target size in pixels of the largest dimension, None to keep the
+                        original size
+        log:            Log toggle
+        percentiles:    Min-Max Percentile
+        byte_budget:    Maximum number of bytes of the base64 encoded image, None for no limit
+    Returns:
+        data_uri:       Base64 encoded image
+    """
+    if percentiles is None:
+        percentiles = [0, 100]
+    image_array = to_array(image)
+    if image_array.dtype == np.uint8 and not log and list(percentiles) == [0, 100]:
+        # 8-bit images without windowing are only resized
+        if size is not None:
+            image_array = np.rint(resize_array(image_array, size)).astype(np.uint8)
+    else:
+        image_array = window_array(resize_array(image_array, size), log, percentiles)
+    image_bytes = encode_array(image_array, codec, quality)
+
+    while byte_budget and 4 * len(image_bytes) // 3 > byte_budget:
+        if codec != "png" and quality > MIN_QUALITY:
+            quality = max(MIN_QUALITY, quality - QUALITY_STEP)
+        elif max(image_array.shape[:2]) // 2 >= MIN_SIZE:
+            image_array = np.asarray(
+                Image.fromarray(image_array).reduce(2), dtype=np.uint8
+            )
+        else:
+            break
+        image_bytes = encode_array(image_array, codec, quality)
+
+    base64_data = base64.b64encode(image_bytes).decode("utf-8")
+    return f"data:image/{codec};base64,{base64_data}"
@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dash.exceptions import PreventUpdate
+from dash.long_callback import DiskcacheLongCallbackManager
+
+# The status of the queued and running jobs is refreshed at this interval, and expires if the
+# worker that owns them dies
+JOB_HEARTBEAT_INTERVAL = 5
+JOB_STATUS_TIMEOUT = 3 * JOB_HEARTBEAT_INTERVAL
+JOB_CANCEL_TIMEOUT = 3600
+
+# Managers by id, such that the job processes find the manager and its registered callbacks
+managers = {}
+
+
+def _run_job(manager_id, fn_key, job, key, args, context):
+    """
+    This function runs a long callback in a job process
+    Args:
+        manager_id:     Id of the long callback manager
+        fn_key:         Key of the callback in the registry of the manager
+        job:            Job id
+        key:            Result key
+        args:           Arguments of the callback
+        context:        Callback context
+    """
+    manager = managers[manager_id]
+    if manager.is_cancelled(job):
+        return
+    manager._set_status(job, "running")
+    manager.current_job.id = job
+    manager.func_registry[fn_key](key, manager._make_progress_key(key), args, context)
+
+
+class PooledLongCallbackManager(DiskcacheLongCallbackManager):
+    """
+    Long callback manager that runs the jobs in a persistent pool of processes forked from each
+    gunicorn worker, instead of spawning a new process per job, such that exports neither pay
+    the process startup nor compete with the requests of the worker. The jobs are queued when
+    all the processes are busy, and their status, progress and cancellation are shared across
+    workers through the diskcache
+    """
+
+    def __init__(self, cache, max_workers=2, expire=None):
+        super().__init__(cache, expire=expire)
+        self.id = uuid.uuid4().hex
+        self.max_workers = max_workers
+        self.executor = None
+        self.executor_pid = None
+        self.executor_lock = threading.Lock()
+        self.local_jobs = set()
+        self.current_job = threading.local()
+        managers[self.id] = self
+
+    def _get_executor(self):
+        # The pool is forked on first use, once the callbacks are registered, such that each
+        # gunicorn worker has its own
+        with self.executor_lock:
+            if self.executor is None or self.executor_pid != os.getpid():
+                if self.executor_pid != os.getpid():
+                    self.local_jobs = set()
+                    threading.Thread(target=self._heartbeat, daemon=True).start()
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                )
+                self.executor_pid = os.getpid()
+        return self.executor
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            for job in list(self.local_jobs):
+                self.handle.touch(("job", job), expire=JOB_STATUS_TIMEOUT)
+
+    def _set_status(self, job, status):
+        self.handle.set(("job", job), status, expire=JOB_STATUS_TIMEOUT)
+
+    def is_cancelled(self, job):
+        return self.handle.get(("job-cancel", job)) is not None
+
+    def make_job_fn(self, fn, progress, key=None):
+        manager = self
+
+        def cancellable_fn(*args, **kwargs):
+            if progress:
+                set_progress = args[0]
+
+                def checked_set_progress(progress_value):
+                    # Cancelled jobs stop at their next progress update
+                    if manager.is_cancelled(manager.current_job.id):
+                        raise PreventUpdate
+                    set_progress(progress_value)
+
+                args = (checked_set_progress,) + args[1:]
+            return fn(*args, **kwargs)
+
+        return super().make_job_fn(cancellable_fn, progress, key)
+
+    def _finish_job(self, job, key, future):
+        """
+        Clear the status and the cancellation of a finished job, along with its result if it
+        was cancelled
+        """
+        self.local_jobs.discard(job)
+        with self.handle.transact():
+            self.handle.delete(("job", job))
+            cancelled = self.handle.pop(("job-cancel", job)) is not None
+        if cancelled:
+            self.clear_cache_entry(key)
+            self.clear_cache_entry(self._make_progress_key(key))
+        elif future.exception() is not None:
+            if isinstance(future.exception(), BrokenProcessPool):
+                with self.executor_lock:
+                    self.executor = None
+            self.handle.set(
+                key,
+                {"long_callback_error": {"msg": str(future.exception()), "tb": ""}},
+            )
+
+    def call_job_fn(self, key, job_fn, args, context):
+        # Job processes run the callbacks registered before they were forked
+        fn_key = next(
+            fn_key for fn_key, fn in self.func_registry.items() if fn is job_fn
+        )
+        executor = self._get_executor()
+        job = uuid.uuid4().hex
+        self._set_status(job, "queued")
+        self.local_jobs.add(job)
+        future = executor.submit(_run_job, self.id, fn_key, job, key, args, context)
+        future.add_done_callback(lambda future: self._finish_job(job, key, future))
+        return job
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        # Only queued and running jobs are cancelled, finished jobs leave no state behind
+        with self.handle.transact():
+            if self.handle.get(("job", job)) is not None:
+                self.handle.set(("job-cancel", job), True, expire=JOB_CANCEL_TIMEOUT)
+                self.handle.delete(("job", job))
+
+    def terminate_unhealthy_job(self, job):
+        return False
+
+    def job_running(self, job):
+        if job is None:
+            return False
+        return self.handle.get(("job", job)) is not None
@@ -1,6 +1,47 @@
 import glob
+import json
+import logging
+import os
+from importlib import metadata
 
-import pyFAI.detectors as detectors
+# The detector list of pyFAI is cached in CACHE_DIR, such that pyFAI is not imported at startup
+MASK_OPTIONS_CACHE = "mask_options.json"
+
+
+def get_pyfai_detectors(cache_path=None):
+    """
+    This function gets the names of the pyFAI detectors, from the cache file if it was created
+    with the installed version of pyFAI
+    Args:
+        cache_path:         Path of the cache file, MASK_OPTIONS_CACHE in CACHE_DIR if None
+    Returns:
+        detector_names:     List of pyFAI detector names
+    """
+    if cache_path is None:
+        # CACHE_DIR is read from the environment, as this module is imported by the layout
+        cache_path = os.path.join(os.getenv("CACHE_DIR", "./cache"), MASK_OPTIONS_CACHE)
+    try:
+        pyfai_version = metadata.version("pyFAI")
+    except metadata.PackageNotFoundError:
+        pyfai_version = None
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached["pyfai_version"] == pyfai_version:
+            return cached["detectors"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import pyFAI.detectors as detectors
+
+    detector_names = list(detectors.ALL_DETECTORS.keys())
+    try:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump({"pyfai_version": pyfai_version, "detectors": detector_names}, f)
+    except OSError as e:
+        logging.warning(f"Mask options could not be cached: {e}")
+    return detector_names
 
 
 def get_mask_options():
@@ -16,7 +57,7 @@ def get_mask_options():
         mask_options.append({"label": mask_file.split("/")[-1], "value": mask_file})
 
     # Get the pyFAI detector masks
-    pyfai_detectors = detectors.ALL_DETECTORS.keys()
+    pyfai_detectors = get_pyfai_detectors()
     mask_options = [
         {"label": detector, "value": detector} for detector in pyfai_detectors
     ]
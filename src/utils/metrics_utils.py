@@ -0,0 +1,318 @@
+import bisect
+import functools
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from src.app_layout import METRICS_DIR
+
+METRICS_PREFIX = "labelmaker"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+# Metric name: (type, help, buckets, scale used to store the sum as an integer)
+METRICS = {
+    "callback_duration_seconds": (
+        "histogram",
+        "Wall time of the Dash callbacks",
+        LATENCY_BUCKETS,
+        1e6,
+    ),
+    "callback_request_bytes": (
+        "histogram",
+        "Payload size of the Dash callback inputs",
+        BYTES_BUCKETS,
+        1,
+    ),
+    "callback_response_bytes": (
+        "histogram",
+        "Payload size of the Dash callback outputs",
+        BYTES_BUCKETS,
+        1,
+    ),
+    "callback_errors_total": (
+        "counter",
+        "Number of Dash callbacks that ended with a server error",
+        None,
+        1,
+    ),
+    "read_duration_seconds": (
+        "histogram",
+        "Wall time of the thumbnail, similarity and probability reads",
+        LATENCY_BUCKETS,
+        1e6,
+    ),
+    "cache_hits_total": ("counter", "Number of cache hits", None, 1),
+    "cache_misses_total": ("counter", "Number of cache misses", None, 1),
+    "cache_size_bytes": ("gauge", "Size of the cache namespaces", None, 1),
+    "cache_entries": ("gauge", "Number of entries of the cache namespaces", None, 1),
+}
+
+# Gauges are collected when the metrics are rendered, metric name: collect function
+GAUGES = {}
+
+# Seconds between the flushes of the metrics of each process to its file in METRICS_DIR
+METRICS_FLUSH_INTERVAL = 5
+# The files that were not flushed for this number of seconds belong to processes that exited,
+# and are removed
+METRICS_FILE_TIMEOUT = 6 * METRICS_FLUSH_INTERVAL
+
+# Metrics of this process, kept in memory and flushed to a file per process, such that
+# /metrics reports the whole app without a shared write per observation
+metrics_values = {}
+metrics_lock = threading.Lock()
+metrics_state = {"pid": None, "path": None}
+
+
+def _reset_lock():
+    # The lock may be held by a thread of the parent at the time of the fork (job processes)
+    global metrics_lock
+    metrics_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock)
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        flush_metrics()
+
+
+def _add(key, amount):
+    with metrics_lock:
+        if metrics_state["pid"] != os.getpid():
+            # Metrics inherited from the parent process are reported by the parent
+            metrics_values.clear()
+            metrics_state["pid"] = os.getpid()
+            metrics_state["path"] = os.path.join(
+                METRICS_DIR, f"{os.getpid()}-{uuid.uuid4().hex}.json"
+            )
+            threading.Thread(target=_flush_periodically, daemon=True).start()
+        metrics_values[key] = metrics_values.get(key, 0) + amount
+
+
+def flush_metrics():
+    """
+    This function writes the metrics of this process to its file in METRICS_DIR
+    """
+    with metrics_lock:
+        if metrics_state["pid"] != os.getpid():
+            return
+        path = metrics_state["path"]
+        series = [
+            [key[0], key[1], *key[2:], value] for key, value in metrics_values.items()
+        ]
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(series, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def observe(name, value, **labels):
+    """
+    This function records an observation in a histogram
+    Args:
+        name:       Metric name
+        value:      Observed value
+        labels:     Metric labels
+    """
+    _, _, buckets, scale = METRICS[name]
+    labels_key = _labels_key(labels)
+    bucket = bisect.bisect_left(buckets, value)
+    _add((name, labels_key, "bucket", bucket), 1)
+    _add((name, labels_key, "sum"), int(value * scale))
+    _add((name, labels_key, "count"), 1)
+
+
+def increment(name, amount=1, **labels):
+    """
+    This function increments a counter
+    Args:
+        name:       Metric name
+        amount:     Increment
+        labels:     Metric labels
+    """
+    if amount:
+        _add((name, _labels_key(labels), "count"), amount)
+
+
+def record_cache_access(cache_name, hits, misses):
+    """
+    This function records the number of hits and misses of a cache
+    Args:
+        cache_name:     Cache name
+        hits:           Number of hits
+        misses:         Number of misses
+    """
+    increment("cache_hits_total", hits, cache=cache_name)
+    increment("cache_misses_total", misses, cache=cache_name)
+
+
+def register_gauge(name, collect):
+    """
+    This function registers the function that collects the current values of a gauge
+    Args:
+        name:       Metric name
+        collect:    Function returning a list of (labels dictionary, value)
+    """
+    GAUGES[name] = collect
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    This context manager records the wall time of its block in a histogram
+    Args:
+        name:       Metric name
+        labels:     Metric labels
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels_key, **extra_labels):
+    labels = list(labels_key) + list(extra_labels.items())
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def render_metrics():
+    """
+    This function renders all the metrics in Prometheus text format, removing the files of the
+    processes that exited
+    Returns:
+        metrics_text:   Metrics in Prometheus text format
+    """
+    flush_metrics()
+    values = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        try:
+            if time.time() - os.path.getmtime(path) > METRICS_FILE_TIMEOUT:
+                os.remove(path)
+                continue
+            with open(path) as f:
+                series = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, *key, value in series:
+            labels_key = tuple(tuple(label) for label in labels)
+            metric = values.setdefault(name, {}).setdefault(labels_key, {})
+            metric[tuple(key)] = metric.get(tuple(key), 0) + value
+
+    lines = []
+    for name, (metric_type, help_text, buckets, scale) in METRICS.items():
+        full_name = f"{METRICS_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        if metric_type == "gauge":
+            for labels, value in GAUGES.get(name, lambda: [])():
+                lines.append(
+                    f"{full_name}{_format_labels(_labels_key(labels))} {value}"
+                )
+            continue
+        for labels_key, series in sorted(values.get(name, {}).items()):
+            count = series.get(("count",), 0)
+            if metric_type == "counter":
+                lines.append(f"{full_name}{_format_labels(labels_key)} {count}")
+                continue
+            cumulative = 0
+            for bucket, upper_bound in enumerate(buckets):
+                cumulative += series.get(("bucket", bucket), 0)
+                lines.append(
+                    f"{full_name}_bucket{_format_labels(labels_key, le=upper_bound)} "
+                    f"{cumulative}"
+                )
+            lines.append(
+                f'{full_name}_bucket{_format_labels(labels_key, le="+Inf")} {count}'
+            )
+            lines.append(
+                f"{full_name}_sum{_format_labels(labels_key)} "
+                f"{series.get(('sum',), 0) / scale}"
+            )
+            lines.append(f"{full_name}_count{_format_labels(labels_key)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def _instrument_callbacks(app):
+    """
+    This function wraps the Dash callbacks that are not instrumented yet, such that each
+    request records the name of the callback it dispatched
+    Args:
+        app:            Dash app
+    """
+    for entry in app.callback_map.values():
+        func = entry.get("callback")
+        # Clientside callbacks do not run in the server
+        if func is None or getattr(func, "_metrics_instrumented", False):
+            continue
+
+        def instrumented(*args, _func=func, **kwargs):
+            g.metrics_callback_name = _func.__name__
+            return _func(*args, **kwargs)
+
+        functools.update_wrapper(instrumented, func)
+        instrumented._metrics_instrumented = True
+        entry["callback"] = instrumented
+
+
+def init_metrics(app):
+    """
+    This function instruments every Dash callback of the app, recording its wall time and
+    payload sizes, and exposes all the metrics at /metrics
+    Args:
+        app:            Dash app
+    """
+    server = app.server
+    instrumented_callbacks = {"count": 0}
+
+    @server.before_request
+    def start_callback_timer():
+        if request.path.endswith("_dash-update-component"):
+            if len(app.callback_map) != instrumented_callbacks["count"]:
+                _instrument_callbacks(app)
+                instrumented_callbacks["count"] = len(app.callback_map)
+            g.metrics_start_time = time.perf_counter()
+
+    @server.after_request
+    def record_callback_metrics(response):
+        if "metrics_start_time" in g:
+            duration = time.perf_counter() - g.metrics_start_time
+            callback_name = g.get("metrics_callback_name", "unknown")
+            observe("callback_duration_seconds", duration, callback=callback_name)
+            observe(
+                "callback_request_bytes",
+                request.content_length or 0,
+                callback=callback_name,
+            )
+            observe(
+                "callback_response_bytes",
+                response.calculate_content_length() or 0,
+                callback=callback_name,
+            )
+            if response.status_code >= 500:
+                increment("callback_errors_total", callback=callback_name)
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,29 +1,115 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain
 
 import requests
 
-from src.app_layout import DATA_DIR, MLEX_COMPUTE_URL
+from src.app_layout import DATA_DIR, MLEX_COMPUTE_URL, logger
+from src.utils import cache_utils
+from src.utils.metrics_utils import record_cache_access, timer
 
+# Trained models are listed again in the background after this number of seconds, and
+# synchronously once the listing is older than the maximum age
+MODELS_CACHE_TIMEOUT = 30
+MODELS_MAX_AGE = 3600
+MODELS_REQUEST_TIMEOUT = 10
+# Number of concurrent checks of the model output files
+MODELS_PATH_WORKERS = 16
 
-def get_trained_models_list(user, app, similarity=True, correct_path=False):
+# Number of model outputs (feature vectors or probabilities) kept in memory per worker
+MODEL_OUTPUTS_CACHE_SIZE = 2
+
+# Thread pool of the background refreshes within this worker
+refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="models-refresh")
+
+# Model outputs of this worker, by file version, in least recently used order
+model_outputs = OrderedDict()
+model_outputs_lock = threading.Lock()
+model_outputs_pid = None
+
+
+def get_trained_models(user, apps, similarity=True, correct_path=False, refresh=False):
+    """
+    This function queries the results of multiple apps in parallel
+    Args:
+        user:               Username
+        apps:               List of apps (MLCoach and/or Data Clinic)
+        similarity:         [Bool] Retrieve f_vec vs probabilities
+        correct_path:       [Bool] Correct the path if the file is not found
+        refresh:            [Bool] Query the compute API instead of the cached listing
+    Returns:
+        trained_models:     List of options, in the order of the apps
+    """
+    with ThreadPoolExecutor(max_workers=len(apps)) as executor:
+        models_per_app = executor.map(
+            lambda app: get_trained_models_list(
+                user, app, similarity, correct_path, refresh
+            ),
+            apps,
+        )
+        return list(chain.from_iterable(models_per_app))
+
+
+def get_trained_models_list(
+    user, app, similarity=True, correct_path=False, refresh=False
+):
     """
-    This function queries the MLCoach or DataClinic results
+    This function queries the MLCoach or DataClinic results. The listing is cached and served
+    while it is refreshed in the background, such that only the first listing, or a listing
+    older than MODELS_MAX_AGE, waits for the compute API
     Args:
         user:               Username
         app:                Tab option (MLCoach vs Data Clinic)
         similarity:         [Bool] Retrieve f_vec vs probabilities
         correct_path:       [Bool] Correct the path if the file is not found
+        refresh:            [Bool] Query the compute API instead of the cached listing
     Returns:
         trained_models:     List of options
     """
+    key = (user, app, similarity, correct_path)
+    entry = cache_utils.get("models", key)
+    age = time.time() - entry["time"] if entry is not None else None
+    if refresh or age is None or age > MODELS_MAX_AGE:
+        try:
+            entry = _refresh_trained_models(key)
+        except requests.RequestException as e:
+            logger.error(f"Trained models of {app} could not be listed: {e}")
+            return entry["models"] if entry is not None else []
+    elif age > MODELS_CACHE_TIMEOUT:
+        token = cache_utils.acquire_lease("models", key)
+        if token is not None:
+            refresh_pool.submit(_refresh_trained_models_in_background, key, token)
+    return entry["models"]
+
+
+def _refresh_trained_models(key):
+    entry = {"models": _query_trained_models(*key), "time": time.time()}
+    cache_utils.store("models", key, entry)
+    return entry
+
+
+def _refresh_trained_models_in_background(key, token):
+    try:
+        _refresh_trained_models(key)
+    except Exception as e:
+        logger.error(f"Trained models of {key[1]} could not be refreshed: {e}")
+    finally:
+        cache_utils.release_lease("models", key, token)
+
+
+def _query_trained_models(user, app, similarity, correct_path):
     if similarity:
         filename = "/f_vectors.parquet"
     else:
         filename = "/results.parquet"
     model_list = requests.get(
-        f"{MLEX_COMPUTE_URL}/jobs?&user={user}&mlex_app={app}"
+        f"{MLEX_COMPUTE_URL}/jobs?&user={user}&mlex_app={app}",
+        timeout=MODELS_REQUEST_TIMEOUT,
     ).json()
-    trained_models = []
+    candidates = []
     for model in model_list:
         if model["job_kwargs"]["kwargs"]["job_type"] == "prediction_model":
             cmd = model["job_kwargs"]["cmd"].split(" ")
@@ -33,22 +119,68 @@ def get_trained_models_list(user, app, similarity=True, correct_path=False):
                 if not correct_path
                 else cmd[indx + 1].replace("/app/work/data", DATA_DIR)
             )
-            if os.path.exists(out_path + filename):  # check if the file exists
-                if model["description"]:
-                    trained_models.append(
-                        {
-                            "label": app + ": " + model["description"],
-                            "value": out_path + filename,
-                        }
-                    )
-                else:
-                    trained_models.append(
-                        {
-                            "label": app
-                            + ": "
-                            + model["job_kwargs"]["kwargs"]["job_type"],
-                            "value": out_path + filename,
-                        }
-                    )
+            candidates.append((model, out_path + filename))
+
+    # Check if the files exist
+    with ThreadPoolExecutor(max_workers=MODELS_PATH_WORKERS) as executor:
+        exists = list(executor.map(os.path.exists, [path for _, path in candidates]))
+
+    trained_models = []
+    for (model, model_path), model_exists in zip(candidates, exists):
+        if not model_exists:
+            continue
+        if model["description"]:
+            trained_models.append(
+                {"label": app + ": " + model["description"], "value": model_path}
+            )
+        else:
+            trained_models.append(
+                {
+                    "label": app + ": " + model["job_kwargs"]["kwargs"]["job_type"],
+                    "value": model_path,
+                }
+            )
     trained_models.reverse()
     return trained_models
+
+
+def load_model_output(model_path, source):
+    """
+    This function reads the feature vectors or probabilities of a trained model. They are
+    kept in memory by each worker until the file is modified, and concurrent requests of the
+    same file wait for a single read
+    Args:
+        model_path:         Path of the parquet file
+        source:             Name of the read in the metrics [similarity, probability]
+    Returns:
+        df_model:           Dataframe of the model output
+    """
+    global model_outputs_pid
+    stat = os.stat(model_path)
+    key = (model_path, stat.st_mtime_ns, stat.st_size)
+    with model_outputs_lock:
+        if model_outputs_pid != os.getpid():
+            model_outputs.clear()
+            model_outputs_pid = os.getpid()
+        future = model_outputs.get(key)
+        hit = future is not None
+        if hit:
+            model_outputs.move_to_end(key)
+        else:
+            future = Future()
+            model_outputs[key] = future
+            while len(model_outputs) > MODEL_OUTPUTS_CACHE_SIZE:
+                model_outputs.popitem(last=False)
+    record_cache_access("model_outputs", int(hit), int(not hit))
+    if not hit:
+        import pandas as pd
+
+        try:
+            with timer("read_duration_seconds", source=source):
+                future.set_result(pd.read_parquet(model_path, engine="pyarrow"))
+        except Exception as e:
+            with model_outputs_lock:
+                if model_outputs.get(key) is future:
+                    del model_outputs[key]
+            future.set_exception(e)
+    return future.result()
@@ -1,7 +1,7 @@
 import dash_bootstrap_components as dbc
-import plotly.express as px
 from dash import dcc, html
 from dash_extensions import EventListener
+from plotly.colors import qualitative
 
 
 def create_label_button(label_text, label_color, indx):
@@ -78,7 +78,7 @@ def create_label_button(label_text, label_color, indx):
 
 def create_label_component(
     label_list,
-    color_cycle=px.colors.qualitative.Light24,
+    color_cycle=qualitative.Light24,
     mlcoach=False,
 ):
     """
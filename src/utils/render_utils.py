@@ -0,0 +1,195 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from src.app_layout import (
+    RENDER_WORKERS,
+    THUMBNAIL_CODEC,
+    THUMBNAIL_PAGE_BUDGET,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_SIZE,
+    logger,
+)
+from src.utils import cache_utils
+from src.utils.image_utils import encode_image
+from src.utils.metrics_utils import record_cache_access, timer
+
+# Thread pool shared by all the thumbnail renders within this worker
+render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS)
+
+# Failed renders are cached for a short time to stop polling, then retried
+FAILED_RENDER_TIMEOUT = 60
+
+
+def get_project_hash(data_project_dict):
+    """
+    This function computes a stable hash of the data project information
+    Args:
+        data_project_dict:  Data project information
+    Returns:
+        project_hash:       Hexadecimal hash of the data project
+    """
+    project_str = json.dumps(data_project_dict, sort_keys=True, default=str)
+    return hashlib.sha1(project_str.encode("utf-8")).hexdigest()
+
+
+def get_thumbnail_encoding(num_imgs_per_page=1):
+    """
+    This function defines the thumbnail encoding according to the app settings
+    Args:
+        num_imgs_per_page:  Number of images per page, used to split the page byte budget
+    Returns:
+        encoding:           Thumbnail codec, quality, size and byte budget
+    """
+    byte_budget = None
+    if THUMBNAIL_PAGE_BUDGET > 0:
+        byte_budget = THUMBNAIL_PAGE_BUDGET // max(num_imgs_per_page, 1)
+    return {
+        "codec": THUMBNAIL_CODEC,
+        "quality": THUMBNAIL_QUALITY,
+        "size": THUMBNAIL_SIZE,
+        "byte_budget": byte_budget,
+    }
+
+
+def get_thumbnail_key(project_hash, index, log, percentiles, encoding):
+    """
+    This function defines the cache key of a thumbnail
+    Args:
+        project_hash:       Hash of the data project
+        index:              Index of the image in the data project
+        log:                Log toggle
+        percentiles:        Min-Max Percentile
+        encoding:           Thumbnail codec, quality, size and byte budget
+    Returns:
+        thumbnail_key:      Cache key of the thumbnail
+    """
+    return (
+        f"thumbnail-{project_hash}-{index}-{int(bool(log))}-"
+        f"{percentiles[0]}-{percentiles[1]}-{encoding['codec']}-"
+        f"{encoding['quality']}-{encoding['size']}-{encoding['byte_budget']}"
+    )
+
+
+def read_image(data_project, index, encoding, log, percentiles):
+    """
+    This function reads one image at its original bit depth and encodes it. Images encoded up
+    to the thumbnail size are read already resized by the data project, such that thumbnails do
+    not transfer the full resolution images
+    Args:
+        data_project:       Data project
+        index:              Index of the image in the data project
+        encoding:           Image codec, quality, size and byte budget
+        log:                Log toggle
+        percentiles:        Min-Max Percentile
+    Returns:
+        content:            Base64 encoded image
+        uri:                URI of the image
+    """
+    resize = encoding["size"] is not None and encoding["size"] <= THUMBNAIL_SIZE
+    imgs, uris = data_project.read_datasets([index], export="pillow", resize=resize)
+    content = encode_image(imgs[0], log=log, percentiles=percentiles, **encoding)
+    return content, uris[0]
+
+
+def render_thumbnail(
+    data_project, index, thumbnail_key, log, percentiles, encoding, lease_token
+):
+    """
+    This function renders one thumbnail and stores it in the cache
+    Args:
+        data_project:       Data project
+        index:              Index of the image in the data project
+        thumbnail_key:      Cache key of the thumbnail
+        log:                Log toggle
+        percentiles:        Min-Max Percentile
+        encoding:           Thumbnail codec, quality, size and byte budget
+        lease_token:        Lease of the thumbnail render, released once it is cached
+    """
+    try:
+        with timer("read_duration_seconds", source="thumbnail"):
+            content, _ = read_image(data_project, index, encoding, log, percentiles)
+        cache_utils.store("thumbnails", thumbnail_key, content)
+    except Exception as e:
+        logger.error(f"Thumbnail {index} could not be rendered: {e}")
+        cache_utils.store("thumbnails", thumbnail_key, "", expire=FAILED_RENDER_TIMEOUT)
+    finally:
+        cache_utils.release_lease("thumbnails", thumbnail_key, lease_token)
+
+
+def submit_thumbnails(
+    data_project, image_order, thumbnail_keys, log, percentiles, encoding
+):
+    """
+    This function submits the thumbnails that are not being rendered yet, by any worker, to
+    the render pool
+    Args:
+        data_project:       Data project
+        image_order:        Indexes of the images to be rendered
+        thumbnail_keys:     Cache keys of the thumbnails
+        log:                Log toggle
+        percentiles:        Min-Max Percentile
+        encoding:           Thumbnail codec, quality, size and byte budget
+    Returns:
+        futures:            Futures of the submitted renders
+    """
+    futures = []
+    for index, thumbnail_key in zip(image_order, thumbnail_keys):
+        lease_token = cache_utils.acquire_lease("thumbnails", thumbnail_key)
+        if lease_token is None:
+            continue
+        futures.append(
+            render_pool.submit(
+                render_thumbnail,
+                data_project,
+                int(index),
+                thumbnail_key,
+                log,
+                percentiles,
+                encoding,
+                lease_token,
+            )
+        )
+    return futures
+
+
+def get_thumbnails(thumbnail_keys):
+    """
+    This function retrieves the rendered thumbnails from the cache
+    Args:
+        thumbnail_keys:     Cache keys of the thumbnails
+    Returns:
+        contents:           List of thumbnails, None if the thumbnail has not been rendered yet
+    """
+    return cache_utils.get_many("thumbnails", thumbnail_keys)
+
+
+def render_page(data_project, image_order, thumbnail_keys, log, percentiles, encoding):
+    """
+    This function renders all the missing thumbnails in a page and waits for them to finish
+    Args:
+        data_project:       Data project
+        image_order:        Indexes of the images in the page
+        thumbnail_keys:     Cache keys of the thumbnails
+        log:                Log toggle
+        percentiles:        Min-Max Percentile
+        encoding:           Thumbnail codec, quality, size and byte budget
+    Returns:
+        contents:           List of thumbnails, None if the thumbnail is being rendered by
+                            another request
+    """
+    contents = get_thumbnails(thumbnail_keys)
+    missing = [i for i, content in enumerate(contents) if content is None]
+    record_cache_access("thumbnails", len(contents) - len(missing), len(missing))
+    if missing:
+        futures = submit_thumbnails(
+            data_project,
+            [image_order[i] for i in missing],
+            [thumbnail_keys[i] for i in missing],
+            log,
+            percentiles,
+            encoding,
+        )
+        wait(futures)
+        contents = get_thumbnails(thumbnail_keys)
+    return contents
@@ -0,0 +1,182 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+import requests
+
+from src.app_layout import SPLASH_URL
+from src.utils import cache_utils
+
+# Tagging events are listed again after this number of seconds
+EVENTS_CACHE_TIMEOUT = 30
+EVENTS_CACHE_KEY = "tagging-events"
+# Number of tagging events requested per splash-ml page, and seconds to wait for each page
+EVENTS_PAGE_SIZE = 1000
+EVENTS_REQUEST_TIMEOUT = 10
+# Checkpoints of failed uploads are kept for this number of seconds
+UPLOAD_CHECKPOINT_TIMEOUT = 7 * 24 * 3600
+# Sync states of inactive sessions are removed after this number of seconds
+SYNC_STATE_TIMEOUT = 7 * 24 * 3600
+
+
+def get_tagging_events():
+    """
+    This function retrieves the index of tagging events in splash-ml, sorted by run time in
+    descending order
+    Returns:
+        events:             List of tagging events, e.g. [{"uid": "uid", "tagger_id": "id",
+                            "date": "2024-01-31", "label": "Tagger ID: id, ..."}, ...]
+    """
+    return cache_utils.get_or_compute(
+        "events", EVENTS_CACHE_KEY, _query_tagging_events, expire=EVENTS_CACHE_TIMEOUT
+    )
+
+
+def clear_tagging_events():
+    """
+    This function clears the index of tagging events, such that new events are listed
+    """
+    cache_utils.delete("events", EVENTS_CACHE_KEY)
+
+
+def _query_tagging_events():
+    tagging_events = []
+    offset = 0
+    while True:
+        response = requests.get(
+            f"{SPLASH_URL}/events",
+            params={"page[offset]": offset, "page[limit]": EVENTS_PAGE_SIZE},
+            timeout=EVENTS_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        page = response.json()
+        tagging_events.extend(page)
+        if len(page) < EVENTS_PAGE_SIZE:
+            break
+        offset += EVENTS_PAGE_SIZE
+
+    # ISO formatted run times are sorted as strings
+    tagging_events.sort(key=lambda event: event["run_time"], reverse=True)
+    events = []
+    for tagging_event in tagging_events:
+        tagging_event_time = (
+            datetime.fromisoformat(tagging_event["run_time"])
+            .replace(tzinfo=timezone.utc)
+            .astimezone(tz=None)
+        )
+        tagger_id = tagging_event["tagger_id"]
+        modified = tagging_event_time.strftime("%d-%m-%Y %H:%M:%S")
+        events.append(
+            {
+                "uid": tagging_event["uid"],
+                "tagger_id": tagger_id,
+                "date": tagging_event_time.strftime("%Y-%m-%d"),
+                "label": f"Tagger ID: {tagger_id}, modified: {modified}",
+            }
+        )
+    return events
+
+
+def filter_tagging_events(events, tagger_id=None, start_date=None, end_date=None):
+    """
+    This function filters the tagging events by tagger ID and date
+    Args:
+        events:             List of tagging events
+        tagger_id:          Text contained in the tagger ID, case insensitive
+        start_date:         First date of the events, as YYYY-MM-DD
+        end_date:           Last date of the events, as YYYY-MM-DD
+    Returns:
+        events:             List of filtered tagging events
+    """
+    if tagger_id:
+        tagger_id = tagger_id.lower()
+        events = [
+            event for event in events if tagger_id in str(event["tagger_id"]).lower()
+        ]
+    if start_date:
+        events = [event for event in events if event["date"] >= start_date[:10]]
+    if end_date:
+        events = [event for event in events if event["date"] <= end_date[:10]]
+    return events
+
+
+def get_upload_key(project_id, tagger_id, event_id, uris, labels):
+    """
+    This function defines the key of an upload to splash-ml, such that retrying the same upload
+    resumes its checkpoint
+    Args:
+        project_id:         Data project_id
+        tagger_id:          Tagger id
+        event_id:           Tagging event of the upload, None if a new event is requested
+        uris:               List of URIs
+        labels:             List of labels per URI
+    Returns:
+        upload_key:         Hexadecimal hash of the upload
+    """
+    upload_str = json.dumps([project_id, tagger_id, event_id, uris, labels])
+    return hashlib.sha1(upload_str.encode("utf-8")).hexdigest()
+
+
+def get_upload_checkpoint(upload_key):
+    """
+    This function retrieves the checkpoint of an upload to splash-ml
+    Args:
+        upload_key:         Key of the upload
+    Returns:
+        checkpoint:         Tagging event and completed chunks, e.g.
+                            {"event_id": "uid", "completed": [0, 1]}, None if the upload has
+                            not been started
+    """
+    return cache_utils.checkpoints.get(upload_key)
+
+
+def store_upload_checkpoint(upload_key, checkpoint):
+    cache_utils.checkpoints.set(
+        upload_key, checkpoint, expire=UPLOAD_CHECKPOINT_TIMEOUT
+    )
+
+
+def clear_upload_checkpoint(upload_key):
+    cache_utils.checkpoints.delete(upload_key)
+
+
+def get_sync_state(session_id):
+    """
+    This function retrieves the sync state of the labels of a session with splash-ml
+    Args:
+        session_id:         Session of the labels
+    Returns:
+        sync_state:         Images changed since the last sync, {index: revision of the change},
+                            and tagging event, revision and time of the last sync, e.g.
+                            {"dirty": {"0": 3}, "event_id": "uid", "revision": 2,
+                            "time": "...", "created": True}. The tagging event was created by
+                            this session if created is True, and loaded otherwise
+    """
+    return cache_utils.sync_states.get(
+        session_id,
+        default={
+            "dirty": {},
+            "event_id": None,
+            "revision": None,
+            "time": None,
+            "created": False,
+        },
+    )
+
+
+def update_sync_state(session_id, update):
+    """
+    This function updates the sync state of the labels of a session, atomically across the
+    gunicorn workers and the job processes
+    Args:
+        session_id:         Session of the labels
+        update:             Function that modifies the sync state in place
+    """
+    with cache_utils.sync_states.transact():
+        sync_state = get_sync_state(session_id)
+        update(sync_state)
+        cache_utils.sync_states.set(session_id, sync_state, expire=SYNC_STATE_TIMEOUT)
+
+
+def clear_sync_state(session_id):
+    cache_utils.sync_states.delete(session_id)
@@ -0,0 +1,304 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+from src.utils.image_utils import encode_image, resize_array
+
+# Size of the resized images, the app passes its THUMBNAIL_SIZE
+DEFAULT_THUMBNAIL_SIZE = 200
+# Data types of the data projects read from local image stacks
+STACK_DATA_TYPES = ("hdf5", "zarr")
+# Maximum number of bytes of the blocks of frames read at once for single images, and number
+# of blocks kept per data project
+STACK_BLOCK_BYTES = 16 * 2**20
+STACK_BLOCK_CACHE_SIZE = 8
+# Size of the HDF5 chunk cache of each open file
+HDF5_CHUNK_CACHE_BYTES = 64 * 2**20
+
+
+class StackDataset:
+    def __init__(self, uri, cumulative_data_count):
+        self.uri = uri
+        self.cumulative_data_count = cumulative_data_count
+
+
+class LocalDataProject:
+    """
+    Data project of image stacks stored in a local HDF5 file or Zarr store, with the read
+    interface of file_manager data projects. Each dataset is an array of frames along its first
+    axis, such that pages are read as slices of the stacks without a Tiled server
+    """
+
+    def __init__(
+        self,
+        root_uri,
+        data_type,
+        datasets=None,
+        project_id=None,
+        thumbnail_size=DEFAULT_THUMBNAIL_SIZE,
+    ):
+        if data_type not in STACK_DATA_TYPES:
+            raise ValueError(f"Unsupported image stack type: {data_type}")
+        self.root_uri = root_uri
+        self.data_type = data_type
+        self.project_id = project_id if project_id is not None else root_uri
+        self.thumbnail_size = thumbnail_size
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()
+        self._root = self._open()
+        if not datasets:
+            datasets = self._find_stacks()
+        self._arrays = []
+        self.datasets = []
+        cumulative_data_count = 0
+        for uri in datasets:
+            array = self._get_array(uri)
+            cumulative_data_count += array.shape[0]
+            self._arrays.append(array)
+            self.datasets.append(StackDataset(uri, cumulative_data_count))
+        self._offsets = [0] + [
+            dataset.cumulative_data_count for dataset in self.datasets
+        ]
+
+    @classmethod
+    def from_dict(cls, data_project_dict, thumbnail_size=DEFAULT_THUMBNAIL_SIZE):
+        """
+        Create the data project of the given information
+        Args:
+            data_project_dict:  Data project information with the path of the file or store
+                                (root_uri), its type [hdf5, zarr] and the paths of the stacks
+                                within it (datasets), all the stacks if empty
+            thumbnail_size:     Size of the resized images
+        Returns:
+            data_project:       Data project
+        """
+        datasets = [
+            dataset["uri"] if isinstance(dataset, dict) else dataset
+            for dataset in data_project_dict.get("datasets", [])
+        ]
+        return cls(
+            data_project_dict["root_uri"],
+            data_project_dict["data_type"],
+            datasets,
+            data_project_dict.get("project_id"),
+            thumbnail_size,
+        )
+
+    def _open(self):
+        if self.data_type == "hdf5":
+            import h5py
+
+            return h5py.File(self.root_uri, "r", rdcc_nbytes=HDF5_CHUNK_CACHE_BYTES)
+        try:
+            import zarr
+        except ImportError as e:
+            raise ImportError(
+                "Zarr image stacks require the zarr package: pip install zarr"
+            ) from e
+        return zarr.open(self.root_uri, mode="r")
+
+    def _find_stacks(self):
+        """
+        Find the paths of all the arrays with frames (3 or more dimensions) in the file or store
+        """
+        if hasattr(self._root, "shape"):
+            return [""]
+        stacks = []
+
+        def visit(name, node):
+            if hasattr(node, "shape") and len(node.shape) >= 3:
+                stacks.append(name)
+
+        if hasattr(self._root, "visititems"):
+            self._root.visititems(visit)
+        else:
+            for name, node in self._root.members(max_depth=None):
+                visit(name, node)
+        return sorted(stacks)
+
+    def _get_array(self, uri):
+        """
+        Retrieve a stack by its path. Contiguous and uncompressed HDF5 stacks are memory-mapped,
+        such that frames are read without going through the HDF5 library
+        """
+        array = self._root if uri == "" else self._root[uri]
+        if self.data_type == "hdf5" and array.chunks is None:
+            offset = array.id.get_offset()
+            if offset is not None and array.size > 0:
+                return np.memmap(
+                    self.root_uri,
+                    dtype=array.dtype,
+                    mode="r",
+                    offset=offset,
+                    shape=array.shape,
+                )
+        return array
+
+    def _get_block_size(self, array):
+        """
+        Number of frames read at once for single images: the chunk length of the stack along
+        its first axis, bounded by STACK_BLOCK_BYTES
+        """
+        if isinstance(array, np.memmap):
+            return 1
+        frame_bytes = max(1, int(np.prod(array.shape[1:])) * array.dtype.itemsize)
+        chunk_length = array.chunks[0] if array.chunks else 1
+        return max(1, min(chunk_length, STACK_BLOCK_BYTES // frame_bytes))
+
+    def _locate(self, index):
+        """
+        Find the stack of an image and its index within the stack
+        """
+        if index < 0 or index >= self._offsets[-1]:
+            raise IndexError(f"Image {index} is out of range")
+        dataset_index = bisect.bisect_right(self._offsets, index) - 1
+        return dataset_index, index - self._offsets[dataset_index]
+
+    def get_uri(self, index):
+        dataset_index, local_index = self._locate(index)
+        uri = self.datasets[dataset_index].uri
+        return (
+            f"{self.root_uri}/{uri}/{local_index}"
+            if uri
+            else f"{self.root_uri}/{local_index}"
+        )
+
+    def _read_block(self, dataset_index, block_index):
+        """
+        Read a block of frames, shared by concurrent reads of the images within it
+        """
+        key = (dataset_index, block_index)
+        with self._lock:
+            future = self._blocks.get(key)
+            if future is not None:
+                self._blocks.move_to_end(key)
+                owner = False
+            else:
+                future = Future()
+                self._blocks[key] = future
+                while len(self._blocks) > STACK_BLOCK_CACHE_SIZE:
+                    self._blocks.popitem(last=False)
+                owner = True
+        if owner:
+            array = self._arrays[dataset_index]
+            block_size = self._get_block_size(array)
+            try:
+                future.set_result(
+                    np.asarray(
+                        array[block_index * block_size : (block_index + 1) * block_size]
+                    )
+                )
+            except Exception as e:
+                with self._lock:
+                    self._blocks.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def _read_frame(self, index):
+        dataset_index, local_index = self._locate(index)
+        array = self._arrays[dataset_index]
+        if isinstance(array, np.memmap):
+            return np.array(array[local_index])
+        block_size = self._get_block_size(array)
+        block = self._read_block(dataset_index, local_index // block_size)
+        return block[local_index % block_size]
+
+    def _read_frames(self, indices):
+        """
+        Read multiple frames with one slice per run of consecutive images in each stack
+        """
+        frames = {}
+        located = sorted(set(self._locate(index) for index in indices))
+        start = 0
+        while start < len(located):
+            dataset_index, first = located[start]
+            stop = start + 1
+            while (
+                stop < len(located)
+                and located[stop][0] == dataset_index
+                and located[stop][1] == first + stop - start
+            ):
+                stop += 1
+            run = np.asarray(self._arrays[dataset_index][first : first + stop - start])
+            for i in range(stop - start):
+                frames[(dataset_index, first + i)] = run[i]
+            start = stop
+        return [frames[self._locate(index)] for index in indices]
+
+    def read_datasets(
+        self, indices, export="base64", resize=True, just_uri=False, **kwargs
+    ):
+        """
+        Read the images at the given indexes
+        Args:
+            indices:        Indexes of the images in the data project
+            export:         Format of the images [base64, pillow, numpy]
+            resize:         [Bool] Downscale the images to the thumbnail size
+            just_uri:       [Bool] Only retrieve the URIs of the images
+        Returns:
+            imgs:           List of images, omitted if just_uri
+            uris:           List of URIs
+        """
+        indices = [int(index) for index in indices]
+        uris = [self.get_uri(index) for index in indices]
+        if just_uri:
+            return uris
+        if len(indices) == 1:
+            frames = [self._read_frame(indices[0])]
+        else:
+            frames = self._read_frames(indices)
+        size = self.thumbnail_size if resize else None
+        if export == "base64":
+            imgs = [encode_image(frame, size=size) for frame in frames]
+        elif export == "pillow":
+            if size is not None:
+                # Frames are resized as arrays, since Pillow cannot resize 16-bit images,
+                # keeping the bit depth of the frames for the windowing of the thumbnails
+                frames = [
+                    (
+                        np.rint(resize_array(frame, size)).astype(np.uint8)
+                        if frame.dtype == np.uint8
+                        else resize_array(frame, size)
+                    )
+                    for frame in frames
+                ]
+            imgs = [Image.fromarray(frame) for frame in frames]
+        elif export == "numpy":
+            imgs = frames
+        else:
+            raise ValueError(f"Unsupported image export: {export}")
+        return imgs, uris
+
+
+def is_stack_project(data_project_dict):
+    """
+    This function checks if the data project is read from a local image stack
+    Args:
+        data_project_dict:  Data project information
+    Returns:
+        [Bool] The data project is an HDF5 or Zarr image stack
+    """
+    return data_project_dict.get("data_type") in STACK_DATA_TYPES
+
+
+def get_stack_project_dict(path, datasets=None):
+    """
+    This function defines the data project information of a local image stack
+    Args:
+        path:               Path of the HDF5 file (.h5, .hdf5, .nxs) or the Zarr store
+        datasets:           Paths of the stacks within the file, all the stacks if None
+    Returns:
+        data_project_dict:  Data project information
+    """
+    data_type = "zarr" if os.path.isdir(path) or path.endswith(".zarr") else "hdf5"
+    return {
+        "root_uri": os.path.abspath(path),
+        "data_type": data_type,
+        "datasets": [{"uri": dataset} for dataset in datasets or []],
+        "project_id": os.path.abspath(path),
+    }